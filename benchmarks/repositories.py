@@ -0,0 +1,297 @@
+"""
+Micro-benchmarks dos caminhos quentes dos repositórios contra um mongod local, em bases
+geradas com semente fixa (dados e ids) em escalas de 1k, 100k e 1M ordens (banco "oficina_bench_<escala>").
+Os tempos são medidos com os caches da aplicação aquecidos, como em produção. "conclude" e
+"add_peca" alteram a base: para comparar builds, rode os dois sobre a mesma base recém-gerada.
+
+Uso (na raiz do projeto):
+  python -m benchmarks.repositories seed --escala 100k
+  python -m benchmarks.repositories run --escala 100k [--repeticoes 100] [--saida arquivo.json]
+  python -m benchmarks.repositories compare base.json novo.json [--limite 10]
+
+MONGO_BENCH_URI (padrão mongodb://localhost:27017) aponta o mongod usado.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from beanie import init_beanie
+from bson import DBRef, ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from db import db
+from models.models import Cliente, Mecanico, OrdemServico, Peca, Servico
+from repositories import mecanico_stats, referencias
+from repositories.cliente_repository import ClienteRepository
+from repositories.mecanico_repository import MecanicoRepository
+from repositories.ordem_servico_repository import OrdemServicoRepository
+from repositories.peca_repository import PecaRepository
+from repositories.servico_repository import ServicoRepository
+from schemas.ordem_servico_schema import OrdemServicoPecaCreate
+from utils.text import nome_completo_busca, normalize_nome
+
+MONGO_BENCH_URI = os.getenv("MONGO_BENCH_URI", "mongodb://localhost:27017")
+ESCALAS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+SEMENTE = 42
+# Datas fixas para que as janelas do relatório e dos filtros caiam sempre sobre os mesmos dados
+DATA_REFERENCIA = datetime(2025, 1, 1)
+LOTE_INSERCAO = 10_000
+RESULTADOS = Path(__file__).parent / "results"
+
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Hugo", "Íris", "João", "Larissa", "Márcio", "Natália", "Otávio", "Paula", "Renato", "Sílvia", "Tiago", "Vânia", "Wagner"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento"]
+CATEGORIAS = ["Manutenção", "Pneu", "Relação", "Suspensão", "BikeFit", "Limpeza"]
+
+# Tipo de documento gravado no _id (ver gerar_id)
+CLIENTE, MECANICO, PECA, SERVICO, ORDEM = range(1, 6)
+
+def gerar_id(tipo: int, indice: int, momento: datetime) -> ObjectId:
+  """
+  ObjectId determinístico, no mesmo formato de init_service/init.py: segundos de "momento" (UTC),
+  tipo do documento e posição. A mesma escala gera sempre os mesmos ids, e os casos, as mesmas entradas.
+  """
+  segundos = int(momento.replace(tzinfo=timezone.utc).timestamp())
+  return ObjectId(segundos.to_bytes(4, "big") + bytes([tipo]) + indice.to_bytes(7, "big"))
+
+def nome_banco(escala: str) -> str:
+  return f"oficina_bench_{escala}"
+
+async def conectar(escala: str):
+  client = AsyncIOMotorClient(MONGO_BENCH_URI)
+  database = client[nome_banco(escala)]
+  await init_beanie(database=database, document_models=db.DOCUMENT_MODELS)
+  return database
+
+def _tamanhos(ordens: int) -> dict:
+  return {
+    "clientes": max(100, ordens // 20),
+    "mecanicos": max(10, min(200, ordens // 1000)),
+    "pecas": 500,
+    "servicos": 100,
+  }
+
+async def _inserir(model, documentos: list):
+  for inicio in range(0, len(documentos), LOTE_INSERCAO):
+    await model.get_motor_collection().insert_many(documentos[inicio:inicio + LOTE_INSERCAO], ordered=False)
+
+async def seed(escala: str):
+  ordens = ESCALAS[escala]
+  tamanhos = _tamanhos(ordens)
+  aleatorio = random.Random(SEMENTE)
+  database = await conectar(escala)
+
+  for model in db.DOCUMENT_MODELS:
+    await model.get_motor_collection().delete_many({})
+
+  def pessoa(tipo: int, indice: int):
+    return {"_id": gerar_id(tipo, indice, DATA_REFERENCIA), "nome": aleatorio.choice(NOMES), "sobrenome": aleatorio.choice(SOBRENOMES), "telefone": "(85) 99999-0000"}
+
+  clientes = [
+    {**pessoa(CLIENTE, i), "endereco": {"cidade": "Fortaleza", "bairro": "Centro", "logradouro": f"Rua {i}"}, "ordens_count": 0}
+    for i in range(tamanhos["clientes"])
+  ]
+  mecanicos = [{**pessoa(MECANICO, i), "email": None, "ordens_count": 0} for i in range(tamanhos["mecanicos"])]
+  pecas = [
+    {"_id": gerar_id(PECA, i, DATA_REFERENCIA), "nome": f"Peça {i}", "marca": f"Marca {i % 20}", "modelo": f"M{i}", "valor": round(aleatorio.uniform(5, 500), 2), "ordens_count": 0}
+    for i in range(tamanhos["pecas"])
+  ]
+  servicos = [
+    {"_id": gerar_id(SERVICO, i, DATA_REFERENCIA), "nome": f"Serviço {i}", "valor": round(aleatorio.uniform(20, 300), 2), "ativo": True, "categoria": aleatorio.choice(CATEGORIAS), "ordens_count": 0}
+    for i in range(tamanhos["servicos"])
+  ]
+  for model, documentos in [(Cliente, clientes), (Mecanico, mecanicos), (Peca, pecas), (Servico, servicos)]:
+    await _inserir(model, documentos)
+
+  colecao_clientes, colecao_mecanicos, colecao_servicos = Cliente.get_settings().name, Mecanico.get_settings().name, Servico.get_settings().name
+  for inicio in range(0, ordens, LOTE_INSERCAO):
+    lote = []
+    for indice in range(inicio, min(inicio + LOTE_INSERCAO, ordens)):
+      cliente, mecanico = aleatorio.choice(clientes), aleatorio.choice(mecanicos)
+      servicos_ordem = aleatorio.sample(servicos, aleatorio.randint(1, 3))
+      pecas_ordem = [
+        {"peca_id": peca["_id"], "nome": peca["nome"], "marca": peca["marca"], "modelo": peca["modelo"], "valor": peca["valor"], "quantidade": aleatorio.randint(1, 5)}
+        for peca in aleatorio.sample(pecas, aleatorio.randint(0, 3))
+      ]
+      subtotal_servicos = sum(servico["valor"] for servico in servicos_ordem)
+      subtotal_pecas = sum(item["valor"] * item["quantidade"] for item in pecas_ordem)
+      data_abertura = DATA_REFERENCIA - timedelta(seconds=aleatorio.randint(0, 365 * 24 * 3600))
+      concluida = aleatorio.random() < 0.75
+      lote.append({
+        "_id": gerar_id(ORDEM, indice, data_abertura),
+        "cliente": DBRef(colecao_clientes, cliente["_id"]),
+        "mecanico": DBRef(colecao_mecanicos, mecanico["_id"]),
+        "servicos": [DBRef(colecao_servicos, servico["_id"]) for servico in servicos_ordem],
+        "servicos_itens": [{"servico_id": servico["_id"], "valor": servico["valor"]} for servico in servicos_ordem],
+        "pecas": pecas_ordem,
+        "data_abertura": data_abertura,
+        "data_conclusao": data_abertura + timedelta(days=aleatorio.randint(1, 10)) if concluida else None,
+        "situacao": "concluida" if concluida else "pendente",
+        "valor": round(subtotal_servicos + subtotal_pecas, 2) if concluida else None,
+        "subtotal_servicos": subtotal_servicos,
+        "subtotal_pecas": subtotal_pecas,
+        "subtotal": subtotal_servicos + subtotal_pecas,
+        "cliente_nome_busca": nome_completo_busca(cliente["nome"], cliente["sobrenome"]),
+        "mecanico_nome_busca": nome_completo_busca(mecanico["nome"], mecanico["sobrenome"]),
+      })
+    await OrdemServico.get_motor_collection().insert_many(lote, ordered=False)
+    print(f"{inicio + len(lote)}/{ordens} ordens")
+
+  # Contadores e buckets diários calculados pelo próprio código da aplicação
+  await referencias.recontar(corrigir=True)
+  buckets = await mecanico_stats.reconstruir()
+  print(f"Base {database.name} pronta: {ordens} ordens, {buckets} buckets diários.")
+
+async def _amostra(model, filtro: dict, tamanho: int, nome: str) -> list:
+  """Escolha com semente fixa sobre os ids ordenados: a mesma base gera sempre a mesma amostra."""
+  documentos = await model.get_motor_collection().find(filtro, projection={"_id": 1}).sort("_id", 1).to_list(None)
+  ids = [str(documento["_id"]) for documento in documentos]
+  return random.Random(f"{SEMENTE}-{nome}").sample(ids, min(tamanho, len(ids)))
+
+async def _casos(repeticoes: int) -> dict:
+  """Cada caso é uma função sem argumentos que executa uma chamada do repositório."""
+  ordens_repo, mecanico_repo = OrdemServicoRepository(), MecanicoRepository()
+  cliente_repo, peca_repo, servico_repo = ClienteRepository(), PecaRepository(), ServicoRepository()
+
+  aleatorio = random.Random(SEMENTE)
+  ordens = await _amostra(OrdemServico, {}, 1000, "ordens")
+  # add_peca só aceita ordens pendentes; cada conclude consome uma pendente diferente das usadas no add_peca
+  pendentes = await _amostra(OrdemServico, {"situacao": "pendente"}, repeticoes + 100, "pendentes")
+  abertas, pendentes = pendentes[:100], pendentes[100:]
+  mecanicos = await _amostra(Mecanico, {}, 100, "mecanicos")
+  pecas = await _amostra(Peca, {}, 100, "pecas")
+  prefixo = normalize_nome(NOMES[0])
+  fim = DATA_REFERENCIA
+  inicio = fim - timedelta(days=30)
+  segunda_pagina = (await ordens_repo.list(size=20, include_total=False)).pagination.next_cursor
+
+  return {
+    "ordens.get": lambda: ordens_repo.get(aleatorio.choice(ordens)),
+    "ordens.list": lambda: ordens_repo.list(size=20),
+    "ordens.list cursor": lambda: ordens_repo.list(size=20, cursor=segunda_pagina),
+    "ordens.list mecanico_id": lambda: ordens_repo.list(size=20, mecanico_id=aleatorio.choice(mecanicos)),
+    "ordens.list nome_cliente": lambda: ordens_repo.list(size=20, nome_cliente=prefixo),
+    "ordens.list data_abertura": lambda: ordens_repo.list(size=20, data_abertura_inicio=inicio, data_abertura_fim=fim),
+    "ordens.conclude": lambda: ordens_repo.conclude(pendentes.pop()),
+    "ordens.add_peca": lambda: ordens_repo.add_peca(aleatorio.choice(abertas), OrdemServicoPecaCreate(peca_id=aleatorio.choice(pecas), quantidade=1)),
+    "clientes.list_clientes": lambda: cliente_repo.list_clientes(size=20),
+    "mecanicos.list_mecanicos": lambda: mecanico_repo.list_mecanicos(size=20),
+    "pecas.list_pecas": lambda: peca_repo.list_pecas(size=20),
+    "servicos.list_servicos": lambda: servico_repo.list_servicos(size=20),
+    "mecanicos.report 30d": lambda: mecanico_repo.report(inicio, fim),
+    "mecanicos.report 365d": lambda: mecanico_repo.report(fim - timedelta(days=365), fim),
+  }
+
+def _percentil(tempos: list, p: int) -> float:
+  return statistics.quantiles(tempos, n=100, method="inclusive")[p - 1]
+
+async def medir(caso, repeticoes: int, aquecimento: int) -> dict:
+  for _ in range(aquecimento):
+    await caso()
+  tempos = []
+  for _ in range(repeticoes):
+    inicio = time.perf_counter()
+    await caso()
+    tempos.append((time.perf_counter() - inicio) * 1000)
+  return {
+    "repeticoes": repeticoes,
+    "media_ms": round(statistics.fmean(tempos), 3),
+    "min_ms": round(min(tempos), 3),
+    "p50_ms": round(statistics.median(tempos), 3),
+    "p95_ms": round(_percentil(tempos, 95), 3),
+    "p99_ms": round(_percentil(tempos, 99), 3),
+  }
+
+def _commit() -> str:
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return "desconhecido"
+
+async def run(escala: str, repeticoes: int, aquecimento: int, filtro: str, saida: str):
+  await conectar(escala)
+  total = await OrdemServico.get_motor_collection().estimated_document_count()
+  if not total:
+    print(f"Base {nome_banco(escala)} vazia: rode antes 'seed --escala {escala}'.")
+    return 2
+
+  casos = await _casos(repeticoes + aquecimento)
+  resultado = {
+    "escala": escala,
+    "ordens": total,
+    "commit": _commit(),
+    "data": datetime.now().isoformat(timespec="seconds"),
+    "python": sys.version.split()[0],
+    "casos": {},
+  }
+  print(f"{'caso':<28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+  for nome, caso in casos.items():
+    if filtro and filtro not in nome:
+      continue
+    medida = await medir(caso, repeticoes, aquecimento)
+    resultado["casos"][nome] = medida
+    print(f"{nome:<28} {medida['p50_ms']:>9.3f} {medida['p95_ms']:>9.3f} {medida['p99_ms']:>9.3f}")
+
+  caminho = Path(saida) if saida else RESULTADOS / f"{escala}-{resultado['commit']}.json"
+  caminho.parent.mkdir(parents=True, exist_ok=True)
+  caminho.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+  print(f"\nResultados em {caminho}")
+  return 0
+
+def compare(base: str, novo: str, limite: float, metrica: str, minimo_ms: float) -> int:
+  """Aponta os casos em que a métrica piorou mais que "limite"% (e mais que minimo_ms, para ignorar ruído)."""
+  anterior = json.loads(Path(base).read_text())
+  atual = json.loads(Path(novo).read_text())
+  if anterior["escala"] != atual["escala"]:
+    print(f"Aviso: escalas diferentes ({anterior['escala']} x {atual['escala']}).")
+
+  regressoes = 0
+  print(f"{'caso':<28} {anterior['commit']:>10} {atual['commit']:>10} {'variação':>9}")
+  for nome, medida in atual["casos"].items():
+    if nome not in anterior["casos"]:
+      print(f"{nome:<28} {'-':>10} {medida[metrica]:>10.3f}")
+      continue
+    antes, depois = anterior["casos"][nome][metrica], medida[metrica]
+    variacao = (depois - antes) / antes * 100 if antes else 0.0
+    regressao = variacao > limite and depois - antes > minimo_ms
+    regressoes += regressao
+    print(f"{nome:<28} {antes:>10.3f} {depois:>10.3f} {variacao:>+8.1f}%{'  REGRESSÃO' if regressao else ''}")
+
+  print(f"\n{regressoes} regressão(ões) acima de {limite}% em {metrica}.")
+  return 1 if regressoes else 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  comandos = parser.add_subparsers(dest="comando", required=True)
+
+  parser_seed = comandos.add_parser("seed", help="gera a base da escala (apaga a anterior)")
+  parser_seed.add_argument("--escala", choices=ESCALAS, default="1k")
+
+  parser_run = comandos.add_parser("run", help="mede os casos e grava o JSON de resultados")
+  parser_run.add_argument("--escala", choices=ESCALAS, default="1k")
+  parser_run.add_argument("--repeticoes", type=int, default=100)
+  parser_run.add_argument("--aquecimento", type=int, default=20)
+  parser_run.add_argument("--filtro", default="", help="só os casos cujo nome contém o texto")
+  parser_run.add_argument("--saida", help=f"arquivo de saída (padrão {RESULTADOS.name}/<escala>-<commit>.json)")
+
+  parser_compare = comandos.add_parser("compare", help="compara dois resultados e aponta regressões")
+  parser_compare.add_argument("base")
+  parser_compare.add_argument("novo")
+  parser_compare.add_argument("--limite", type=float, default=10.0, help="piora máxima aceita, em %% (padrão 10)")
+  parser_compare.add_argument("--metrica", choices=["p50_ms", "p95_ms", "p99_ms", "media_ms"], default="p50_ms")
+  parser_compare.add_argument("--minimo-ms", type=float, default=0.1, help="diferença absoluta mínima para contar como regressão")
+
+  args = parser.parse_args()
+  if args.comando == "seed":
+    asyncio.run(seed(args.escala))
+  elif args.comando == "run":
+    sys.exit(asyncio.run(run(args.escala, args.repeticoes, args.aquecimento, args.filtro, args.saida)))
+  else:
+    sys.exit(compare(args.base, args.novo, args.limite, args.metrica, args.minimo_ms))
@@ -0,0 +1,100 @@
+"""
+Compara o custo de montar o corpo das respostas de leitura no caminho padrão do FastAPI
+(validação pelo response_model + jsonable_encoder + json da stdlib) com o modo rápido
+(FAST_RESPONSES: model_dump_json do pydantic-core / orjson), sem banco nem rede.
+
+Uso (na raiz do projeto):
+  python -m benchmarks.serialization [--repeticoes 2000]
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from schemas.cliente_schema import ClienteResponse
+from schemas.mecanico_schema import MecanicoResponse
+from schemas.ordem_servico_schema import OrdemServicoFullResponse, OrdemServicoPaginatedResponse, OrdemServicoPartialResponse, OrdemServicoPecaResponse, OrdemServicoServicoResponse
+from schemas.peca_schema import PecaPaginatedResponse
+from schemas.util_schema import Pagination
+
+def _cliente():
+  return ClienteResponse(
+    id=str(ObjectId()), nome="João", sobrenome="da Silva", telefone="(85) 99999-0000",
+    endereco={"cidade": "Fortaleza", "bairro": "Centro", "logradouro": "Rua Barão do Rio Branco, 1000"}
+  )
+
+def _mecanico():
+  return MecanicoResponse(id=str(ObjectId()), nome="Maria", sobrenome="Souza", telefone="(85) 98888-0000", email="maria@oficina.com")
+
+def ordem_completa(servicos: int = 10, pecas: int = 15):
+  """Mesmo formato de GET /ordens_servicos/{id} para uma ordem típica."""
+  return OrdemServicoFullResponse(
+    id=str(ObjectId()),
+    data_abertura=datetime.now(timezone.utc),
+    situacao="pendente",
+    cliente=_cliente(),
+    mecanico=_mecanico(),
+    servicos=[OrdemServicoServicoResponse(id=str(ObjectId()), nome=f"Serviço {i}", valor=100.0 + i, categoria="Motor") for i in range(servicos)],
+    pecas=[OrdemServicoPecaResponse(id=str(ObjectId()), nome=f"Peça {i}", marca="Bosch", modelo="X1", valor=35.9, quantidade=2) for i in range(pecas)]
+  )
+
+def ordens_pagina(size: int = 50):
+  """Mesmo formato de GET /ordens_servicos/."""
+  return OrdemServicoPaginatedResponse(
+    pagination=Pagination(page=1, size=size, total=100000),
+    ordens_servicos=[OrdemServicoPartialResponse(
+      id=str(ObjectId()), data_abertura=datetime.now(timezone.utc), situacao="concluida", valor=523.4,
+      cliente=_cliente(), mecanico=_mecanico()
+    ) for _ in range(size)]
+  )
+
+def pecas_pagina(size: int = 50):
+  """Mesmo formato de GET /pecas/ (os itens vêm do to_dict dos documentos)."""
+  return PecaPaginatedResponse(
+    pagination=Pagination(page=1, size=size, total=100000),
+    pecas=[{"id": str(ObjectId()), "nome": f"Peça {i}", "marca": "Bosch", "modelo": "X1", "valor": 35.9} for i in range(size)]
+  )
+
+async def padrao(field, conteudo):
+  # O que o FastAPI faz com o retorno do endpoint quando há response_model
+  return JSONResponse(await serialize_response(field=field, response_content=conteudo)).body
+
+async def rapido(field, conteudo):
+  return Response(conteudo.model_dump_json(), media_type="application/json").body
+
+async def medir(funcao, field, conteudo, repeticoes: int) -> float:
+  await funcao(field, conteudo)
+  inicio = time.perf_counter()
+  for _ in range(repeticoes):
+    await funcao(field, conteudo)
+  return (time.perf_counter() - inicio) / repeticoes * 1_000_000
+
+async def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--repeticoes", type=int, default=2000)
+  args = parser.parse_args()
+
+  cenarios = [
+    ("GET /ordens_servicos/{id}", ordem_completa()),
+    ("GET /ordens_servicos/ (50)", ordens_pagina()),
+    ("GET /pecas/ (50)", pecas_pagina()),
+  ]
+
+  print(f"{'endpoint':<28} {'padrão (µs)':>12} {'rápido (µs)':>12} {'ganho':>7}")
+  for nome, conteudo in cenarios:
+    field = create_model_field(name="Response", type_=type(conteudo), mode="serialization")
+    # Os dois caminhos precisam gerar o mesmo JSON
+    assert json.loads(await padrao(field, conteudo)) == json.loads(await rapido(field, conteudo))
+
+    tempo_padrao = await medir(padrao, field, conteudo, args.repeticoes)
+    tempo_rapido = await medir(rapido, field, conteudo, args.repeticoes)
+    print(f"{nome:<28} {tempo_padrao:>12.1f} {tempo_rapido:>12.1f} {tempo_padrao / tempo_rapido:>6.1f}x")
+
+if __name__ == "__main__":
+  asyncio.run(main())
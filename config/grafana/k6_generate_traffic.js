@@ -1,84 +1,302 @@
 import http from 'k6/http';
-import { sleep } from 'k6';
+import { check } from 'k6';
+import { Counter, Rate, Trend } from 'k6/metrics';
+
+// Carga da API da oficina: ciclo de vida das ordens, listagens com filtros, relatório de
+// mecânicos e CRUD do catálogo, sorteados por peso. Ao final grava um resumo com p50/p95/p99
+// e vazão por endpoint em RESULTS_DIR/summary-<BUILD>.json, comparável entre builds.
+//
+//   docker compose --profile loadtest run --rm k6
+//   BUILD=minha-branch BASELINE=/results/summary-main.json docker compose --profile loadtest run --rm k6
+
+const BASE_URL = __ENV.BASE_URL || 'http://api_oficina:8000';
+const BUILD = __ENV.BUILD || 'local';
+const RESULTS_DIR = __ENV.RESULTS_DIR || '/results';
+// Resumo de outro build para comparar no fim do teste (lido no contexto de inicialização)
+const BASELINE = __ENV.BASELINE ? JSON.parse(open(__ENV.BASELINE)) : null;
+
+// Rampa padrão: aquece, sobe até o pico, mantém e desce. STAGES="30s:5,2m:20,1m:0" substitui.
+function stages() {
+  if (!__ENV.STAGES) {
+    return [
+      { duration: '30s', target: 5 },
+      { duration: '2m', target: 20 },
+      { duration: '3m', target: 20 },
+      { duration: '30s', target: 0 },
+    ];
+  }
+  return __ENV.STAGES.split(',').map((etapa) => {
+    const [duration, target] = etapa.split(':');
+    return { duration, target: parseInt(target, 10) };
+  });
+}
 
-// Configurações do teste
 export const options = {
-  stages: [
-    { duration: '0s', target: 5 },    // Começa com 5 usuários
-    { duration: '5m', target: 20 },   // Aumenta para 20 usuários ao longo de 5 minutos
-    { duration: '5m', target: 30 },   // Aumenta para 30 usuários ao longo de 5 minutos
-  ],
+  stages: stages(),
+  summaryTrendStats: ['avg', 'min', 'med', 'p(95)', 'p(99)', 'max', 'count'],
+  thresholds: {
+    erros: ['rate<0.01'],
+  },
 };
 
-// Endpoint base
-const BASE_URL = 'http://app:8000/pokemon';
+// Peso de cada fluxo no sorteio de cada iteração
+const MIX = [
+  { peso: 30, fluxo: cicloOrdem },
+  { peso: 30, fluxo: listarOrdens },
+  { peso: 20, fluxo: lerCatalogo },
+  { peso: 12, fluxo: crudCatalogo },
+  { peso: 8, fluxo: relatorioMecanicos },
+];
 
-// Lista de nomes de Pokémon
-const POKEMONS = ["Bulbasaur", "Ivysaur", "Venusaur", "Charmander", "Charmeleon", "Charizard", "Squirtle", "Wartortle", "Blastoise", "Caterpie", "Metapod", "Butterfree", "Weedle", "Kakuna", "Beedrill", "Pidgey", "Pidgeotto", "Pidgeot", "Rattata", "Raticate", "Spearow", "Fearow", "Ekans", "Arbok", "Pikachu", "Raichu", "Sandshrew", "Sandslash", "Nidoran♀", "Nidorina", "Nidoqueen", "Nidoran♂", "Nidorino", "Nidoking", "Clefairy", "Clefable", "Vulpix", "Ninetales", "Jigglypuff", "Wigglytuff", "Zubat", "Golbat", "Oddish", "Gloom", "Vileplume", "Paras", "Parasect", "Venonat", "Venomoth", "Diglett", "Dugtrio", "Meowth", "Persian", "Psyduck", "Golduck", "Machop", "Machoke", "Machamp", "Bellsprout", "Weepinbell", "Victreebel", "Tentacool", "Tentacruel", "Geodude", "Graveler", "Golem", "Ponyta", "Rapidash", "Slowpoke", "Slowbro", "Magnemite", "Magneton", "Farfetch’d", "Doduo", "Dodrio", "Seel", "Dewgong", "Grimer", "Muk", "Shellder", "Cloyster", "Gastly", "Haunter", "Gengar", "Onix", "Drowzee", "Hypno", "Krabby", "Kingler", "Exeggcute", "Exeggutor", "Cubone", "Marowak", "Hitmonlee", "Hitmonchan", "Lickitung", "Lickilicky", "Koffing", "Weezing", "Rhyhorn"];
+const ENDPOINTS = {};
+const erros = new Rate('erros');
 
-// Função para obter um nome aleatório da lista
-function getRandomName(list) {
-  return list[Math.floor(Math.random() * list.length)];
+// Uma Trend e um Counter por endpoint (template da rota), para o resumo por endpoint
+function metricas(nome) {
+  if (!ENDPOINTS[nome]) {
+    const chave = nome.replace(/[^A-Za-z0-9_]+/g, '_');
+    ENDPOINTS[nome] = {
+      latencia: new Trend(`lat_${chave}`, true),
+      requisicoes: new Counter(`req_${chave}`),
+    };
+  }
+  return ENDPOINTS[nome];
 }
 
-// Função para buscar Pokémon na API externa
-function fetchPokemon() {
-  const pokemonName = getRandomName(POKEMONS);
-  const response = http.get(`${BASE_URL}/fetch/${pokemonName}`);
-  console.log(`Fetched Pokemon: ${pokemonName}, Status: ${response.status}`);
+// As métricas precisam existir no contexto de inicialização para entrar no resumo
+const ROTAS = [
+  'POST /ordens_servicos/',
+  'POST /ordens_servicos/{id}/pecas',
+  'POST /ordens_servicos/{id}/servicos',
+  'GET /ordens_servicos/{id}',
+  'PATCH /ordens_servicos/{id}/concluir',
+  'GET /ordens_servicos/',
+  'GET /ordens_servicos/?mecanico_id',
+  'GET /ordens_servicos/?nome_cliente',
+  'GET /ordens_servicos/?data_abertura',
+  'GET /pecas/',
+  'GET /servicos/',
+  'GET /clientes/{id}',
+  'GET /mecanicos/{id}',
+  'POST /pecas/',
+  'GET /pecas/{id}',
+  'PUT /pecas/{id}',
+  'DELETE /pecas/{id}',
+  'GET /mecanicos/report',
+];
+ROTAS.forEach(metricas);
+
+const JSON_HEADERS = { headers: { 'Content-Type': 'application/json' } };
+
+function requisicao(metodo, nome, caminho, corpo) {
+  const params = { ...JSON_HEADERS, tags: { name: nome } };
+  const url = `${BASE_URL}${caminho}`;
+  const response = http.request(metodo, url, corpo === undefined ? null : JSON.stringify(corpo), params);
+
+  const m = metricas(nome);
+  m.latencia.add(response.timings.duration);
+  m.requisicoes.add(1);
+  const ok = check(response, { [`${nome} 2xx`]: (r) => r.status >= 200 && r.status < 300 });
+  erros.add(!ok);
+  return response;
+}
+
+function sortear(lista) {
+  return lista[Math.floor(Math.random() * lista.length)];
 }
 
-// Função para listar um Pokémon salvo
-function getPokemonByName() {
-  const pokemonName = getRandomName(POKEMONS);
-  const response = http.get(`${BASE_URL}/${pokemonName}`);
-  console.log(`Get Pokemon by Name: ${pokemonName}, Status: ${response.status}`);
+function dataBr(data) {
+  const dia = String(data.getDate()).padStart(2, '0');
+  const mes = String(data.getMonth() + 1).padStart(2, '0');
+  return `${dia}/${mes}/${data.getFullYear()}`;
 }
 
-// Função para listar todos os Pokémon salvos
-function listAllPokemons() {
-  const response = http.get(BASE_URL);
-  console.log(`List all Pokemons, Status: ${response.status}`);
+// Garante um catálogo mínimo e devolve os ids usados pelos fluxos
+export function setup() {
+  const listar = (entidade, campo) => {
+    const response = http.get(`${BASE_URL}/${entidade}/?size=100&include_total=false`);
+    return response.status === 200 ? response.json(campo).map((item) => item.id) : [];
+  };
+  const garantir = (entidade, campo, gerar) => {
+    let ids = listar(entidade, campo);
+    if (ids.length < 10) {
+      const itens = Array.from({ length: 20 }, (_, i) => gerar(i));
+      http.post(`${BASE_URL}/${entidade}/bulk`, JSON.stringify(itens), JSON_HEADERS);
+      ids = listar(entidade, campo);
+    }
+    return ids;
+  };
+
+  const dados = {
+    clientes: garantir('clientes', 'clientes', (i) => ({
+      nome: `Cliente${i}`, sobrenome: 'Carga', telefone: '11999990000',
+      endereco: { cidade: 'São Paulo', bairro: 'Centro', logradouro: `Rua ${i}` },
+    })),
+    mecanicos: garantir('mecanicos', 'mecanicos', (i) => ({
+      nome: `Mecanico${i}`, sobrenome: 'Carga', telefone: '11999990000',
+    })),
+    pecas: garantir('pecas', 'pecas', (i) => ({
+      nome: `Peça ${i}`, marca: 'Marca', modelo: `M${i}`, valor: 10 + i,
+    })),
+    servicos: garantir('servicos', 'servicos', (i) => ({
+      nome: `Serviço ${i}`, valor: 50 + i, categoria: 'Revisão', ativo: true,
+    })),
+  };
+  dados.nomes_clientes = http.get(`${BASE_URL}/clientes/?size=20&include_total=false`).json('clientes').map((c) => c.nome);
+  return dados;
 }
 
-// Função para adicionar um Pokémon com nome aleatório
-function addPokemonRandom() {
-  const randomName = getRandomName(POKEMONS);
-  const payload = JSON.stringify({
-    name: randomName,
-    height: (Math.random() * 2).toFixed(2), // Altura aleatória
-    weight: (Math.random() * 100).toFixed(2), // Peso aleatório
-    abilities: ['Run', 'Jump'],
-    types: ['Normal'],
+// create → peças/serviços → get → concluir
+function cicloOrdem(dados) {
+  const criada = requisicao('POST', 'POST /ordens_servicos/', '/ordens_servicos/', {
+    cliente_id: sortear(dados.clientes),
+    mecanico_id: sortear(dados.mecanicos),
   });
+  if (criada.status !== 200) {
+    return;
+  }
+  const id = criada.json('id');
+
+  const pecas = 1 + Math.floor(Math.random() * 3);
+  for (let i = 0; i < pecas; i++) {
+    requisicao('POST', 'POST /ordens_servicos/{id}/pecas', `/ordens_servicos/${id}/pecas`, {
+      peca_id: sortear(dados.pecas),
+      quantidade: 1 + Math.floor(Math.random() * 4),
+    });
+  }
+  requisicao('POST', 'POST /ordens_servicos/{id}/servicos', `/ordens_servicos/${id}/servicos?servico_id=${sortear(dados.servicos)}`);
+  requisicao('GET', 'GET /ordens_servicos/{id}', `/ordens_servicos/${id}`);
+  requisicao('PATCH', 'PATCH /ordens_servicos/{id}/concluir', `/ordens_servicos/${id}/concluir`);
+}
 
-  const headers = { 'Content-Type': 'application/json' };
-  const response = http.post(BASE_URL, payload, { headers });
-  console.log(`Added Pokemon: ${randomName}, Status: ${response.status}`);
+function listarOrdens(dados) {
+  const filtro = Math.random();
+  if (filtro < 0.3) {
+    requisicao('GET', 'GET /ordens_servicos/', '/ordens_servicos/?size=20');
+  } else if (filtro < 0.6) {
+    requisicao('GET', 'GET /ordens_servicos/?mecanico_id', `/ordens_servicos/?size=20&mecanico_id=${sortear(dados.mecanicos)}`);
+  } else if (filtro < 0.8) {
+    const nome = encodeURIComponent(sortear(dados.nomes_clientes).slice(0, 4));
+    requisicao('GET', 'GET /ordens_servicos/?nome_cliente', `/ordens_servicos/?size=20&nome_cliente=${nome}`);
+  } else {
+    const fim = new Date();
+    const inicio = new Date(fim.getTime() - 7 * 24 * 3600 * 1000);
+    requisicao('GET', 'GET /ordens_servicos/?data_abertura',
+      `/ordens_servicos/?size=20&data_abertura_inicio=${inicio.toISOString()}&data_abertura_fim=${fim.toISOString()}`);
+  }
 }
 
-// Função para deletar um Pokémon salvo
-function deletePokemonByName() {
-  const pokemonName = getRandomName(POKEMONS);
-  const response = http.del(`${BASE_URL}/${pokemonName}`);
-  console.log(`Deleted Pokemon: ${pokemonName}, Status: ${response.status}`);
+function lerCatalogo(dados) {
+  const leitura = sortear(['pecas', 'servicos', 'cliente', 'mecanico']);
+  if (leitura === 'pecas') {
+    requisicao('GET', 'GET /pecas/', '/pecas/?size=20');
+  } else if (leitura === 'servicos') {
+    requisicao('GET', 'GET /servicos/', '/servicos/?size=20');
+  } else if (leitura === 'cliente') {
+    requisicao('GET', 'GET /clientes/{id}', `/clientes/${sortear(dados.clientes)}`);
+  } else {
+    requisicao('GET', 'GET /mecanicos/{id}', `/mecanicos/${sortear(dados.mecanicos)}`);
+  }
 }
 
-// Função principal
-export default function () {
-  // Define os métodos disponíveis para o teste
-  const actions = [
-    () => fetchPokemon(),        // GET /fetch/{name}
-    () => getPokemonByName(),    // GET /{name}
-    () => listAllPokemons(),     // GET /
-    () => addPokemonRandom(),    // POST /
-    // () => deletePokemonByName(), // DELETE /{name}
-  ];
+// create → get → update → delete de uma peça criada só para o teste
+function crudCatalogo() {
+  const peca = { nome: `Peça carga ${__VU}-${__ITER}`, marca: 'Carga', modelo: 'K6', valor: 99.9 };
+  const criada = requisicao('POST', 'POST /pecas/', '/pecas/', peca);
+  if (criada.status !== 200) {
+    return;
+  }
+  const id = criada.json('id');
+  requisicao('GET', 'GET /pecas/{id}', `/pecas/${id}`);
+  requisicao('PUT', 'PUT /pecas/{id}', `/pecas/${id}`, { ...peca, valor: 120.0 });
+  requisicao('DELETE', 'DELETE /pecas/{id}', `/pecas/${id}`);
+}
+
+function relatorioMecanicos() {
+  const fim = new Date();
+  const inicio = new Date(fim.getTime() - 30 * 24 * 3600 * 1000);
+  requisicao('GET', 'GET /mecanicos/report', `/mecanicos/report?data_inicio=${dataBr(inicio)}&data_fim=${dataBr(fim)}`);
+}
+
+const PESO_TOTAL = MIX.reduce((total, item) => total + item.peso, 0);
 
-  // Escolhe aleatoriamente uma ação
-  const action = actions[Math.floor(Math.random() * actions.length)];
-  action();
+export default function (dados) {
+  let sorteio = Math.random() * PESO_TOTAL;
+  for (const item of MIX) {
+    sorteio -= item.peso;
+    if (sorteio < 0) {
+      item.fluxo(dados);
+      return;
+    }
+  }
+}
+
+function arredondar(valor) {
+  return valor === undefined ? null : Math.round(valor * 100) / 100;
+}
+
+function resumo(data) {
+  const duracaoS = data.state.testRunDurationMs / 1000;
+  const endpoints = {};
+  for (const nome of Object.keys(ENDPOINTS)) {
+    const chave = nome.replace(/[^A-Za-z0-9_]+/g, '_');
+    const latencia = data.metrics[`lat_${chave}`];
+    const requisicoes = data.metrics[`req_${chave}`];
+    if (!latencia || !requisicoes || !requisicoes.values.count) {
+      continue;
+    }
+    endpoints[nome] = {
+      requisicoes: requisicoes.values.count,
+      rps: arredondar(requisicoes.values.count / duracaoS),
+      p50: arredondar(latencia.values.med),
+      p95: arredondar(latencia.values['p(95)']),
+      p99: arredondar(latencia.values['p(99)']),
+      max: arredondar(latencia.values.max),
+    };
+  }
+  return {
+    build: BUILD,
+    base_url: BASE_URL,
+    data: new Date().toISOString(),
+    duracao_s: arredondar(duracaoS),
+    requisicoes: data.metrics.http_reqs.values.count,
+    rps: arredondar(data.metrics.http_reqs.values.rate),
+    taxa_erros: arredondar(data.metrics.erros ? data.metrics.erros.values.rate : 0),
+    endpoints,
+  };
+}
+
+function variacao(atual, anterior) {
+  if (anterior === null || anterior === undefined || anterior === 0 || atual === null) {
+    return '';
+  }
+  const pct = ((atual - anterior) / anterior) * 100;
+  return ` (${pct >= 0 ? '+' : ''}${pct.toFixed(1)}%)`;
+}
+
+function tabela(resultado) {
+  const linhas = [`Build ${resultado.build}: ${resultado.requisicoes} requisições, ${resultado.rps} req/s, erros ${(resultado.taxa_erros * 100).toFixed(2)}%`];
+  if (BASELINE) {
+    linhas.push(`Comparado com ${BASELINE.build} (${BASELINE.data})`);
+  }
+  linhas.push('endpoint | req/s | p50 ms | p95 ms | p99 ms');
+  for (const [nome, atual] of Object.entries(resultado.endpoints)) {
+    const anterior = (BASELINE && BASELINE.endpoints[nome]) || {};
+    linhas.push([
+      nome,
+      `${atual.rps}${variacao(atual.rps, anterior.rps)}`,
+      `${atual.p50}${variacao(atual.p50, anterior.p50)}`,
+      `${atual.p95}${variacao(atual.p95, anterior.p95)}`,
+      `${atual.p99}${variacao(atual.p99, anterior.p99)}`,
+    ].join(' | '));
+  }
+  return linhas.join('\n') + '\n';
+}
 
-  // Dorme antes da próxima iteração
-  sleep(0.5);
+export function handleSummary(data) {
+  const resultado = resumo(data);
+  return {
+    stdout: tabela(resultado),
+    [`${RESULTS_DIR}/summary-${BUILD}.json`]: JSON.stringify(resultado, null, 2),
+  };
 }
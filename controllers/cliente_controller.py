@@ -1,22 +1,34 @@
-from fastapi import APIRouter, Query
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Body, Query
 
 from repositories.cliente_repository import ClienteRepository
 from schemas.cliente_schema import ClienteCreate, ClienteCreateResponse, ClientePaginatedResponse, ClienteResponse, ClienteUpdate
+from schemas.util_schema import BulkResponse
+from utils.responses import resposta
 
 router = APIRouter(prefix="/clientes", tags=["Clientes"])
 cliente_repo = ClienteRepository()
 
 @router.get("/", response_model=ClientePaginatedResponse)
-async def list_clientes(page: int = Query(1, alias="page"), size: int = Query(10, alias="size")):
-  return await cliente_repo.list_clientes(page, size)
+async def list_clientes(
+  page: int = Query(1, alias="page"), 
+  size: int = Query(10, alias="size"),
+  cursor: Optional[str] = Query(None, alias="cursor"),
+  include_total: bool = Query(True, alias="include_total")
+):
+  return resposta(await cliente_repo.list_clientes(page, size, cursor, include_total))
 
 @router.post("/", response_model=ClienteCreateResponse)
 async def create_cliente(cliente: ClienteCreate):
   return await cliente_repo.create_cliente(cliente)
 
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_clientes(itens: List[Dict[str, Any]] = Body(...)):
+  return await cliente_repo.bulk_clientes(itens)
+
 @router.get("/{id}", response_model=ClienteResponse)
 async def get(id: str):
-  return await cliente_repo.get(id)
+  return resposta(await cliente_repo.get(id))
   
 @router.put("/{cliente_id}", response_model=ClienteResponse)
 async def update(id: str, cliente: ClienteUpdate):
@@ -0,0 +1,46 @@
+from typing import Literal
+
+from fastapi import APIRouter, Query
+
+from db import db
+
+from relatorios.jobs import report_jobs
+from repositories import catalogo_cache, contagem
+from utils import access_log
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+@router.get("/cache")
+async def cache_stats():
+  return {**catalogo_cache.estatisticas(), "contagens": contagem.estatisticas()}
+
+@router.get("/loaders")
+async def loader_stats():
+  return catalogo_cache.estatisticas_loaders()
+
+@router.get("/reports")
+async def report_stats():
+  return report_jobs.stats()
+
+@router.get("/pool")
+async def pool_stats():
+  return {
+    "opcoes": db.CLIENT_OPTIONS,
+    "leitura_secundaria": db.READ_SECONDARY,
+    "max_staleness_seconds": db.MAX_STALENESS_SECONDS if db.READ_SECONDARY else None,
+    **db.pool_metrics.stats()
+  }
+
+@router.get("/access-log")
+async def access_log_stats():
+  return access_log.estatisticas()
+
+@router.get("/slow-queries")
+async def slow_queries(
+  limit: int = Query(50, ge=1, le=1000),
+  fonte: Literal["memoria", "banco"] = Query("memoria", description="memoria: anel da instância; banco: coleção limitada, com as capturas de todas as instâncias")
+):
+  return {
+    **db.slow_queries.stats(),
+    "consultas": await db.slow_queries.listar(limit, db.db if fonte == "banco" else None)
+  }
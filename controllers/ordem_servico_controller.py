@@ -1,8 +1,12 @@
 from typing import Optional
 from fastapi import APIRouter, Depends, Query
-from repositories.ordem_servico_repository import OrdemServicoRepository
-from schemas.ordem_servico_schema import OrdemServicoCreate, OrdemServicoFullResponse, OrdemServicoPaginatedResponse, OrdemServicoPecaCreate, OrdemServicoResponse, OrdemServicoUpdate
+from fastapi.responses import StreamingResponse
+from exceptions.exceptions import BadRequestException
+from repositories.ordem_servico_repository import EXPORT_CAMPOS, OrdemServicoRepository
+from schemas.ordem_servico_schema import OrdemServicoCreate, OrdemServicoFullResponse, OrdemServicoItensBatch, OrdemServicoPaginatedResponse, OrdemServicoPecaCreate, OrdemServicoResponse, OrdemServicoUpdate
 from datetime import datetime
+from utils import export
+from utils.responses import resposta
 
 router = APIRouter(prefix="/ordens_servicos", tags=["Ordens de Serviços"])
 ordem_servico_repo = OrdemServicoRepository()
@@ -20,12 +24,41 @@ async def list(
   nome_mecanico: Optional[str] = Query(None, alias="nome_mecanico"),
   nome_cliente: Optional[str] = Query(None, alias="nome_cliente"),
   data_abertura_inicio: Optional[datetime] = Query(None, alias="data_abertura_inicio"),
-  data_abertura_fim: Optional[datetime] = Query(None, alias="data_abertura_fim") 
+  data_abertura_fim: Optional[datetime] = Query(None, alias="data_abertura_fim"),
+  cursor: Optional[str] = Query(None, alias="cursor"),
+  include_total: bool = Query(True, alias="include_total")
 ):
   
   ordens_servicos = await ordem_servico_repo.list(
     page=page, 
     size=size, 
+    mecanico_id=mecanico_id, 
+    cliente_id=cliente_id, 
+    nome_mecanico=nome_mecanico, 
+    nome_cliente=nome_cliente, 
+    data_abertura_inicio=data_abertura_inicio, 
+    data_abertura_fim=data_abertura_fim,
+    cursor=cursor,
+    include_total=include_total
+  )
+
+  return resposta(ordens_servicos)
+
+@router.get("/export")
+async def export_ordens(
+  formato: str = Query("ndjson", alias="formato"),
+  mecanico_id: Optional[str] = Query(None, alias="mecanico_id"),
+  cliente_id: Optional[str] = Query(None, alias="cliente_id"),
+  nome_mecanico: Optional[str] = Query(None, alias="nome_mecanico"),
+  nome_cliente: Optional[str] = Query(None, alias="nome_cliente"),
+  data_abertura_inicio: Optional[datetime] = Query(None, alias="data_abertura_inicio"),
+  data_abertura_fim: Optional[datetime] = Query(None, alias="data_abertura_fim")
+):
+  if formato not in ("ndjson", "csv"):
+    raise BadRequestException("Formato deve ser ndjson ou csv.")
+
+  # O filtro é montado (e validado) antes do StreamingResponse: depois dele o 200 já foi enviado
+  match = ordem_servico_repo.list_match(
     mecanico_id=mecanico_id, 
     cliente_id=cliente_id, 
     nome_mecanico=nome_mecanico, 
@@ -33,12 +66,22 @@ async def list(
     data_abertura_inicio=data_abertura_inicio, 
     data_abertura_fim=data_abertura_fim
   )
+  linhas = ordem_servico_repo.export(match)
+
+  if formato == "csv":
+    conteudo, media_type = export.csv_(linhas, EXPORT_CAMPOS), "text/csv; charset=utf-8"
+  else:
+    conteudo, media_type = export.ndjson(linhas), "application/x-ndjson"
 
-  return ordens_servicos
+  return StreamingResponse(
+    conteudo,
+    media_type=media_type,
+    headers={"Content-Disposition": f"attachment; filename=ordens_servico.{formato}"}
+  )
 
 @router.get("/{id}", response_model=OrdemServicoFullResponse)
 async def get(id: str):
-  return await ordem_servico_repo.get(id)
+  return resposta(await ordem_servico_repo.get(id))
   
 @router.put("/{id}", response_model=OrdemServicoResponse)
 async def update(id: str, ordem_servico: OrdemServicoUpdate):
@@ -66,4 +109,8 @@ async def add_peca(id: str, peca: OrdemServicoPecaCreate):
 
 @router.post("/{id}/servicos")
 async def add_servico(id: str, servico_id: str):
-  return await ordem_servico_repo.add_servico(id, servico_id)
\ No newline at end of file
+  return await ordem_servico_repo.add_servico(id, servico_id)
+
+@router.post("/{id}/itens")
+async def aplicar_itens(id: str, itens: OrdemServicoItensBatch):
+  return await ordem_servico_repo.aplicar_itens(id, itens)
@@ -1,22 +1,34 @@
-from fastapi import APIRouter, Query
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Body, Query
 
 from repositories.peca_repository import PecaRepository
 from schemas.peca_schema import PecaCreate, PecaResponse, PecaPaginatedResponse, PecaResponse, PecaUpdate
+from schemas.util_schema import BulkResponse
+from utils.responses import resposta
 
 router = APIRouter(prefix="/pecas", tags=["Peças"])
 peca_repo = PecaRepository()
 
 @router.get("/", response_model=PecaPaginatedResponse)
-async def list_pecas(page: int = Query(1, alias="page"), size: int = Query(10, alias="size")):
-  return await peca_repo.list_pecas(page, size)
+async def list_pecas(
+  page: int = Query(1, alias="page"), 
+  size: int = Query(10, alias="size"),
+  cursor: Optional[str] = Query(None, alias="cursor"),
+  include_total: bool = Query(True, alias="include_total")
+):
+  return resposta(await peca_repo.list_pecas(page, size, cursor, include_total))
 
 @router.post("/", response_model=PecaResponse)
 async def create_peca(peca: PecaCreate):
   return await peca_repo.create_peca(peca)
 
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_pecas(itens: List[Dict[str, Any]] = Body(...)):
+  return await peca_repo.bulk_pecas(itens)
+
 @router.get("/{id}", response_model=PecaResponse)
 async def get(id: str):
-  return await peca_repo.get(id)
+  return resposta(await peca_repo.get(id))
   
 @router.put("/{id}", response_model=PecaResponse)
 async def update(id: str, peca: PecaUpdate):
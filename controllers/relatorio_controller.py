@@ -0,0 +1,32 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Query
+
+from exceptions.exceptions import BadRequestException
+from relatorios import analytics
+from relatorios.periodo import periodo
+from utils.responses import resposta
+
+router = APIRouter(prefix="/relatorios", tags=["Relatórios"])
+
+@router.get("/")
+async def relatorios(
+  data_inicio: str,
+  data_fim: str,
+  relatorio: Optional[List[str]] = Query(None, alias="relatorio", description=f"Um ou mais de: {', '.join(analytics.RELATORIOS)}. Sem o parâmetro, todos."),
+  recalcular: bool = Query(False, alias="recalcular")
+):
+  nomes = relatorio or list(analytics.RELATORIOS)
+  desconhecidos = [nome for nome in nomes if nome not in analytics.RELATORIOS]
+  if desconhecidos:
+    raise BadRequestException(f"Relatório(s) inexistente(s): {', '.join(desconhecidos)}. Disponíveis: {', '.join(analytics.RELATORIOS)}.")
+
+  data_inicio_datetime, data_fim_datetime = periodo(data_inicio, data_fim)
+  resultados, em_cache = await analytics.obter(nomes, data_inicio_datetime, data_fim_datetime, recalcular)
+
+  return resposta({
+    "periodo": {"inicio": data_inicio_datetime, "fim": data_fim_datetime},
+    "em_cache": em_cache,
+    "gerado_em": min((resultado["gerado_em"] for resultado in resultados.values()), default=None),
+    "relatorios": {nome: resultados[nome]["dados"] for nome in nomes if nome in resultados}
+  })
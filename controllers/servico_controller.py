@@ -1,22 +1,34 @@
-from fastapi import APIRouter, Query
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Body, Query
 
 from repositories.servico_repository import ServicoRepository
 from schemas.servico_schema import ServicoCreate, ServicoResponse, ServicoPaginatedResponse, ServicoResponse, ServicoUpdate
+from schemas.util_schema import BulkResponse
+from utils.responses import resposta
 
 router = APIRouter(prefix="/servicos", tags=["Serviços"])
 servico_repo = ServicoRepository()
 
 @router.get("/", response_model=ServicoPaginatedResponse)
-async def list_servicos(page: int = Query(1, alias="page"), size: int = Query(10, alias="size")):
-  return await servico_repo.list_servicos(page, size)
+async def list_servicos(
+  page: int = Query(1, alias="page"), 
+  size: int = Query(10, alias="size"),
+  cursor: Optional[str] = Query(None, alias="cursor"),
+  include_total: bool = Query(True, alias="include_total")
+):
+  return resposta(await servico_repo.list_servicos(page, size, cursor, include_total))
 
 @router.post("/", response_model=ServicoResponse)
 async def create_servico(servico: ServicoCreate):
   return await servico_repo.create_servico(servico)
 
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_servicos(itens: List[Dict[str, Any]] = Body(...)):
+  return await servico_repo.bulk_servicos(itens)
+
 @router.get("/{id}", response_model=ServicoResponse)
 async def get(id: str):
-  return await servico_repo.get(id)
+  return resposta(await servico_repo.get(id))
   
 @router.put("/{id}", response_model=ServicoResponse)
 async def update(id: str, servico: ServicoUpdate):
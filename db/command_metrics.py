@@ -0,0 +1,84 @@
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+import bson
+from opentelemetry import metrics
+from pymongo import monitoring
+
+# Escopo ASGI da requisição em andamento. O middleware de main.py define no início da requisição;
+# o Motor copia o contexto para a thread que executa o comando, então o listener enxerga a rota.
+requisicao_atual: ContextVar[Optional[dict]] = ContextVar("requisicao_atual", default=None)
+
+# Tamanho da resposta exige reserializar o BSON de cada resposta: MONGO_COMMAND_METRICS_BYTES=false desliga
+MEDIR_BYTES = os.getenv("MONGO_COMMAND_METRICS_BYTES", "true").lower() in ("1", "true", "yes")
+
+SEM_VALOR = "-"
+
+def rota_atual() -> str:
+  """Template da rota da requisição atual (ex.: /ordens_servicos/{id}); "-" fora de requisições."""
+  escopo = requisicao_atual.get()
+  if escopo is None:
+    return SEM_VALOR
+  route = escopo.get("route")
+  return route.path if route is not None else SEM_VALOR
+
+def _colecao(nome_comando: str, comando: dict) -> str:
+  if nome_comando == "getMore":
+    return comando.get("collection", SEM_VALOR)
+  alvo = comando.get(nome_comando)
+  # Comandos de banco (ping, endSessions, aggregate: 1...) não têm coleção
+  return alvo if isinstance(alvo, str) else SEM_VALOR
+
+def _documentos(reply: dict) -> int:
+  """Documentos devolvidos (lote do cursor) ou afetados (n) pelo comando."""
+  cursor = reply.get("cursor")
+  if isinstance(cursor, dict):
+    return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+  if "value" in reply:
+    return 1 if reply["value"] is not None else 0
+  n = reply.get("n")
+  return n if isinstance(n, int) else 0
+
+class CommandMetrics(monitoring.CommandListener):
+  """
+  Exporta por OpenTelemetry a duração, os documentos e o tamanho da resposta de cada comando
+  do Mongo, com os atributos collection, command, route e status.
+  """
+
+  def __init__(self):
+    meter = metrics.get_meter("oficina.mongodb")
+    self.duracao = meter.create_histogram(
+      "mongodb.command.duration", unit="ms", description="Duração dos comandos do MongoDB"
+    )
+    self.documentos = meter.create_histogram(
+      "mongodb.command.documents", unit="{document}", description="Documentos devolvidos ou afetados por comando"
+    )
+    self.bytes = meter.create_histogram(
+      "mongodb.command.reply.size", unit="By", description="Tamanho em BSON da resposta do comando"
+    )
+    # Atributos guardados no início de cada comando até o evento de fim (mesmo request_id e conexão)
+    self._em_andamento = {}
+
+  def started(self, event: monitoring.CommandStartedEvent):
+    self._em_andamento[(event.request_id, event.connection_id)] = {
+      "collection": _colecao(event.command_name, event.command),
+      "command": event.command_name,
+      "route": rota_atual(),
+    }
+
+  def _atributos(self, event, status: str) -> dict:
+    atributos = self._em_andamento.pop((event.request_id, event.connection_id), None)
+    if atributos is None:
+      atributos = {"collection": SEM_VALOR, "command": event.command_name, "route": SEM_VALOR}
+    return {**atributos, "status": status}
+
+  def succeeded(self, event: monitoring.CommandSucceededEvent):
+    atributos = self._atributos(event, "ok")
+    self.duracao.record(event.duration_micros / 1000, atributos)
+    self.documentos.record(_documentos(event.reply), atributos)
+    if MEDIR_BYTES and event.reply:
+      self.bytes.record(len(bson.encode(event.reply)), atributos)
+
+  def failed(self, event: monitoring.CommandFailedEvent):
+    self.duracao.record(event.duration_micros / 1000, self._atributos(event, "erro"))
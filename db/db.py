@@ -1,10 +1,66 @@
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from pymongo import ReadPreference
+from pymongo.read_preferences import SecondaryPreferred
+
+from db.command_metrics import CommandMetrics
+from db.pool_metrics import PoolMetrics
+from db.slow_queries import SlowQueryCapture
+from models.models import MecanicoEstatisticaDiaria, Peca, ResultadoRelatorio, Servico, Mecanico, Cliente, OrdemServico
 
 host = os.getenv("MONGO_HOST")
 if not host:
   host = "oficina-mongodb"
 
-MONGO_URI = f"mongodb://{host}:27017/oficina"
-client = AsyncIOMotorClient(MONGO_URI)
-db = client.get_database()
\ No newline at end of file
+# MONGO_URI substitui o endereço montado a partir do MONGO_HOST (ex.: para informar o replicaSet)
+MONGO_URI = os.getenv("MONGO_URI") or f"mongodb://{host}:27017/oficina"
+
+def _int_env(nome: str, padrao=None):
+  valor = os.getenv(nome)
+  return int(valor) if valor else padrao
+
+# Pool e timeouts do cliente; sem a variável vale o padrão do driver
+CLIENT_OPTIONS = {
+  "maxPoolSize": _int_env("MONGO_MAX_POOL_SIZE", 100),
+  "minPoolSize": _int_env("MONGO_MIN_POOL_SIZE", 0),
+  "maxIdleTimeMS": _int_env("MONGO_MAX_IDLE_TIME_MS"),
+  "waitQueueTimeoutMS": _int_env("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+  "connectTimeoutMS": _int_env("MONGO_CONNECT_TIMEOUT_MS"),
+  "serverSelectionTimeoutMS": _int_env("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+  "socketTimeoutMS": _int_env("MONGO_SOCKET_TIMEOUT_MS"),
+  # Ex.: "zstd,snappy,zlib" (zstd e snappy precisam dos pacotes zstandard/python-snappy)
+  "compressors": os.getenv("MONGO_COMPRESSORS"),
+}
+CLIENT_OPTIONS = {opcao: valor for opcao, valor in CLIENT_OPTIONS.items() if valor is not None}
+
+# Leituras pesadas (relatório, listagens, exportação) podem ir para secundários com atraso limitado
+READ_SECONDARY = os.getenv("MONGO_READ_SECONDARY", "false").lower() in ("1", "true", "yes")
+# O driver exige no mínimo 90 segundos
+MAX_STALENESS_SECONDS = max(_int_env("MONGO_MAX_STALENESS_SECONDS", 90), 90)
+
+pool_metrics = PoolMetrics()
+command_metrics = CommandMetrics()
+slow_queries = SlowQueryCapture()
+
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=[pool_metrics, command_metrics, slow_queries], **CLIENT_OPTIONS)
+db = client.get_database()
+
+DOCUMENT_MODELS = [Peca, Servico, Mecanico, Cliente, OrdemServico, MecanicoEstatisticaDiaria, ResultadoRelatorio]
+
+def read_preference():
+  if READ_SECONDARY:
+    return SecondaryPreferred(max_staleness=MAX_STALENESS_SECONDS)
+  return ReadPreference.PRIMARY
+
+def leitura(model):
+  """
+  Coleção do model para as leituras que toleram dados um pouco defasados.
+  Escritas e leituras que precisam ver a última escrita continuam usando get_motor_collection().
+  """
+  return model.get_motor_collection().with_options(read_preference=read_preference())
+
+async def init_db():
+  # O init_beanie cria os índices declarados em Settings.indexes que ainda não existem
+  await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+  await slow_queries.iniciar(client, db)
@@ -0,0 +1,83 @@
+from pymongo import monitoring
+
+# Limites (ms) das faixas do histograma de espera para obter uma conexão do pool
+FAIXAS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+  """Acompanha o pool de conexões do Motor: conexões em uso e tempo de espera no checkout."""
+
+  def __init__(self):
+    self.checkouts = 0
+    self.falhas = 0
+    self.em_uso = 0
+    self.maximo_em_uso = 0
+    self.conexoes_criadas = 0
+    self.conexoes_fechadas = 0
+    self.pool_limpo = 0
+    self.espera_total_ms = 0.0
+    self.espera_maxima_ms = 0.0
+    self.histograma = [0] * (len(FAIXAS_MS) + 1)
+
+  def _registrar_espera(self, duracao_s: float):
+    ms = duracao_s * 1000
+    self.espera_total_ms += ms
+    self.espera_maxima_ms = max(self.espera_maxima_ms, ms)
+    for indice, limite in enumerate(FAIXAS_MS):
+      if ms <= limite:
+        self.histograma[indice] += 1
+        return
+    self.histograma[-1] += 1
+
+  def connection_checked_out(self, event):
+    self.checkouts += 1
+    self.em_uso += 1
+    self.maximo_em_uso = max(self.maximo_em_uso, self.em_uso)
+    self._registrar_espera(event.duration)
+
+  def connection_check_out_failed(self, event):
+    self.falhas += 1
+    self._registrar_espera(event.duration)
+
+  def connection_checked_in(self, event):
+    self.em_uso -= 1
+
+  def connection_created(self, event):
+    self.conexoes_criadas += 1
+
+  def connection_closed(self, event):
+    self.conexoes_fechadas += 1
+
+  def pool_cleared(self, event):
+    self.pool_limpo += 1
+
+  # Eventos sem métrica associada
+  def pool_created(self, event):
+    pass
+
+  def pool_ready(self, event):
+    pass
+
+  def pool_closed(self, event):
+    pass
+
+  def connection_ready(self, event):
+    pass
+
+  def connection_check_out_started(self, event):
+    pass
+
+  def stats(self) -> dict:
+    esperas = self.checkouts + self.falhas
+    faixas = [f"<={limite}ms" for limite in FAIXAS_MS] + [f">{FAIXAS_MS[-1]}ms"]
+    return {
+      "checkouts": self.checkouts,
+      "falhas_checkout": self.falhas,
+      "em_uso": self.em_uso,
+      "maximo_em_uso": self.maximo_em_uso,
+      "conexoes_criadas": self.conexoes_criadas,
+      "conexoes_fechadas": self.conexoes_fechadas,
+      "pool_limpo": self.pool_limpo,
+      "espera_media_ms": round(self.espera_total_ms / esperas, 3) if esperas else None,
+      "espera_maxima_ms": round(self.espera_maxima_ms, 3),
+      "espera_histograma": dict(zip(faixas, self.histograma)),
+    }
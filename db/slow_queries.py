@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pymongo import monitoring
+
+from db.command_metrics import rota_atual
+
+logger = logging.getLogger(__name__)
+
+# Captura de consultas lentas: todo find/aggregate acima de SLOW_QUERY_MS tem a forma
+# (filtro/pipeline com os literais trocados por "?") e o plano vencedor do explain guardados
+# em um anel em memória e na coleção limitada (capped) "slow_queries".
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_RING_SIZE = int(os.getenv("SLOW_QUERY_RING_SIZE", "100"))
+SLOW_QUERY_CAPPED_BYTES = int(os.getenv("SLOW_QUERY_CAPPED_BYTES", str(16 * 1024 * 1024)))
+SLOW_QUERY_CAPPED_MAX = int(os.getenv("SLOW_QUERY_CAPPED_MAX", "5000"))
+# A mesma forma de consulta só é explicada de novo depois desse intervalo; até lá reaproveita o plano
+SLOW_QUERY_EXPLAIN_INTERVAL_S = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL_S", "300"))
+
+SLOW_QUERY_COLLECTION = "slow_queries"
+COMANDOS = ("find", "aggregate")
+
+REDIGIDO = "?"
+# Valores estruturais mantidos na forma: nomes de coleções/campos dos estágios e estágios sem literais sensíveis
+CAMPOS_MANTIDOS = {"from", "as", "localField", "foreignField", "into", "on", "path", "unit", "connectFromField", "connectToField"}
+ESTAGIOS_MANTIDOS = {"$sort", "$project", "$limit", "$skip", "$count", "$unwind", "$replaceRoot", "$sortByCount"}
+# Campos de sessão/roteamento que não entram no explain
+CAMPOS_IGNORADOS = {"lsid", "txnNumber", "autocommit", "startTransaction", "writeConcern", "readConcern"}
+
+def redigir(valor):
+  """Troca os literais por "?", mantendo operadores, nomes de campos e referências "$campo"."""
+  if isinstance(valor, dict):
+    return {
+      chave: v if chave in CAMPOS_MANTIDOS or chave in ESTAGIOS_MANTIDOS else redigir(v)
+      for chave, v in valor.items()
+    }
+  if isinstance(valor, (list, tuple)):
+    itens = [redigir(item) for item in valor]
+    # Listas de literais ($in, $nin...) viram um único "?": o tamanho também identifica dados
+    return [REDIGIDO] if itens and all(item == REDIGIDO for item in itens) else itens
+  if isinstance(valor, str) and valor.startswith("$"):
+    return valor
+  if isinstance(valor, bool) or valor is None:
+    return valor
+  return REDIGIDO
+
+def forma(comando: dict) -> dict:
+  if "pipeline" in comando:
+    return {"pipeline": redigir(comando["pipeline"])}
+  resultado = {"filter": redigir(comando.get("filter", {}))}
+  for campo in ("sort", "projection"):
+    if campo in comando:
+      resultado[campo] = comando[campo]
+  return resultado
+
+def redigir_plano(plano):
+  """
+  O plano repete o filtro e os limites do índice com os valores da consulta: esses trechos são redigidos.
+  Em planos do SBE (MongoDB 7+) o slotBasedPlan é um texto com as constantes da consulta: sai inteiro,
+  fica só o queryPlan.
+  """
+  if isinstance(plano, dict):
+    resultado = {}
+    for chave, valor in plano.items():
+      if chave == "slotBasedPlan":
+        resultado[chave] = REDIGIDO
+      elif chave in ("filter", "parsedQuery"):
+        resultado[chave] = redigir(valor)
+      elif chave == "indexBounds" and isinstance(valor, dict):
+        resultado[chave] = {campo: [REDIGIDO] for campo in valor}
+      else:
+        resultado[chave] = redigir_plano(valor)
+    return resultado
+  if isinstance(plano, list):
+    return [redigir_plano(item) for item in plano]
+  return plano
+
+def _estagios(plano) -> List[str]:
+  """Nomes dos estágios do plano (COLLSCAN, IXSCAN, FETCH...), na ordem em que aparecem."""
+  estagios = []
+  if isinstance(plano, dict):
+    if "stage" in plano:
+      estagios.append(plano["stage"])
+    for valor in plano.values():
+      estagios.extend(_estagios(valor))
+  elif isinstance(plano, list):
+    for item in plano:
+      estagios.extend(_estagios(item))
+  return estagios
+
+def plano_vencedor(explain: dict):
+  """winningPlan do find ou do primeiro estágio $cursor do aggregate."""
+  if "queryPlanner" in explain:
+    return explain["queryPlanner"].get("winningPlan")
+  for estagio in explain.get("stages", []):
+    if "$cursor" in estagio:
+      return estagio["$cursor"].get("queryPlanner", {}).get("winningPlan")
+  return None
+
+class SlowQueryCapture(monitoring.CommandListener):
+  """
+  Listener de comandos que separa os find/aggregate lentos. O listener roda na thread do driver,
+  então só enfileira a captura; o explain e a gravação acontecem em uma tarefa no event loop.
+  """
+
+  def __init__(self):
+    self.recentes = deque(maxlen=SLOW_QUERY_RING_SIZE)
+    self._comandos = {}
+    self._planos = {}
+    self._fila: Optional[asyncio.Queue] = None
+    self._loop: Optional[asyncio.AbstractEventLoop] = None
+    self._tarefa: Optional[asyncio.Task] = None
+    self._client = None
+    self.capturadas = 0
+    self.descartadas = 0
+    self.explains = 0
+
+  def started(self, event: monitoring.CommandStartedEvent):
+    if self._fila is None or event.command_name not in COMANDOS:
+      return
+    if event.command.get(event.command_name) == SLOW_QUERY_COLLECTION:
+      return
+    self._comandos[(event.request_id, event.connection_id)] = (event.command, rota_atual())
+
+  def succeeded(self, event: monitoring.CommandSucceededEvent):
+    registro = self._comandos.pop((event.request_id, event.connection_id), None)
+    duracao_ms = event.duration_micros / 1000
+    if registro is None or duracao_ms < SLOW_QUERY_MS:
+      return
+
+    comando, rota = registro
+    captura = {
+      "em": datetime.now(timezone.utc),
+      "duracao_ms": round(duracao_ms, 2),
+      "banco": event.database_name,
+      "colecao": comando.get(event.command_name),
+      "comando": event.command_name,
+      "rota": rota,
+      "forma": forma(comando),
+    }
+    explicar = {campo: valor for campo, valor in comando.items() if not campo.startswith("$") and campo not in CAMPOS_IGNORADOS}
+    self._loop.call_soon_threadsafe(self._enfileirar, captura, explicar)
+
+  def failed(self, event: monitoring.CommandFailedEvent):
+    self._comandos.pop((event.request_id, event.connection_id), None)
+
+  def _enfileirar(self, captura: dict, comando: dict):
+    if self._fila is None:
+      return
+    try:
+      self._fila.put_nowait((captura, comando))
+    except asyncio.QueueFull:
+      self.descartadas += 1
+
+  async def _explicar(self, captura: dict, comando: dict):
+    chave = repr((captura["banco"], captura["colecao"], captura["forma"]))
+    em_cache = self._planos.get(chave)
+    if em_cache is not None and time.monotonic() - em_cache[0] < SLOW_QUERY_EXPLAIN_INTERVAL_S:
+      return em_cache[1]
+
+    try:
+      self.explains += 1
+      explain = await self._client[captura["banco"]].command({"explain": comando, "verbosity": "queryPlanner"})
+      plano = {"plano": redigir_plano(plano_vencedor(explain))}
+    except Exception as e:
+      plano = {"plano": None, "erro_explain": str(e)}
+    if len(self._planos) >= 10 * SLOW_QUERY_RING_SIZE:
+      self._planos.clear()
+    self._planos[chave] = (time.monotonic(), plano)
+    return plano
+
+  async def _processar(self):
+    while True:
+      captura, comando = await self._fila.get()
+      try:
+        captura.update(await self._explicar(captura, comando))
+        estagios = _estagios(captura["plano"])
+        captura["estagios"] = estagios
+        captura["collscan"] = "COLLSCAN" in estagios
+        self.capturadas += 1
+        self.recentes.append(captura)
+        # insert_one acrescenta o _id ao dict: grava uma cópia para o anel continuar serializável
+        await self._client[captura["banco"]][SLOW_QUERY_COLLECTION].insert_one(dict(captura))
+      except Exception:
+        logger.exception("Falha ao registrar consulta lenta")
+
+  async def iniciar(self, client, database):
+    """Cria a coleção limitada (se preciso) e a tarefa que processa as capturas."""
+    if SLOW_QUERY_COLLECTION not in await database.list_collection_names():
+      await database.create_collection(
+        SLOW_QUERY_COLLECTION, capped=True, size=SLOW_QUERY_CAPPED_BYTES, max=SLOW_QUERY_CAPPED_MAX
+      )
+    self._client = client
+    self._loop = asyncio.get_running_loop()
+    self._fila = asyncio.Queue(SLOW_QUERY_RING_SIZE)
+    self._tarefa = asyncio.ensure_future(self._processar())
+
+  def parar(self):
+    self._fila = None
+    if self._tarefa is not None:
+      self._tarefa.cancel()
+      self._tarefa = None
+
+  async def listar(self, limite: int, database=None) -> List[dict]:
+    """Capturas mais recentes primeiro: do anel em memória ou, com database, da coleção limitada."""
+    if database is None:
+      return list(reversed(self.recentes))[:limite]
+    cursor = database[SLOW_QUERY_COLLECTION].find({}, projection={"_id": 0}).sort("$natural", -1).limit(limite)
+    return await cursor.to_list(None)
+
+  def stats(self) -> dict:
+    return {
+      "threshold_ms": SLOW_QUERY_MS,
+      "capturadas": self.capturadas,
+      "descartadas": self.descartadas,
+      "explains": self.explains,
+      "na_fila": self._fila.qsize() if self._fila is not None else 0,
+      "no_anel": len(self.recentes),
+    }
@@ -11,3 +11,7 @@ class BadRequestException(HTTPException):
 class InternalServerErrorException(HTTPException):
   def __init__(self, detail: str = "Erro interno do servidor"):
     super().__init__(status_code=500, detail=detail)
+
+class ServiceUnavailableException(HTTPException):
+  def __init__(self, detail: str = "Serviço temporariamente indisponível"):
+    super().__init__(status_code=503, detail=detail)
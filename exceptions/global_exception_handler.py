@@ -3,7 +3,7 @@ import logging
 from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
 
-from exceptions.exceptions import BadRequestException, InternalServerErrorException, NotFoundException
+from exceptions.exceptions import BadRequestException, InternalServerErrorException, NotFoundException, ServiceUnavailableException
 
 logger = logging.getLogger(__name__)
 
@@ -36,4 +36,10 @@ async def internal_server_error_exception_handler(request, exc: InternalServerEr
   return JSONResponse(
     status_code=500,
     content={"message": exc.detail},
-  )
\ No newline at end of file
+  )
+
+async def service_unavailable_exception_handler(request, exc: ServiceUnavailableException):
+  return JSONResponse(
+    status_code=503,
+    content={"message": exc.detail},
+  )
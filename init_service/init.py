@@ -1,143 +1,293 @@
+"""
+Popula o banco com dados fakes em qualquer escala.
+
+As peças, serviços e mecânicos são gerados no processo principal; clientes e ordens são gerados
+em processos paralelos (Faker e codificação BSON), em lotes inseridos com insert_many enquanto
+os próximos lotes ainda estão sendo gerados. Os ids são derivados do tipo e da posição de cada
+documento, então a mesma semente e a mesma data de referência geram sempre os mesmos dados.
+
+Uso:
+  python init.py                          # 34 ordens (ou SEED_ORDENS)
+  python init.py --ordens 10000000 --workers 8
+  python init.py --ordens 100000 --limpar # apaga os dados anteriores antes de gerar
+"""
+import argparse
 import asyncio
-from datetime import timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
+import os
+import random
+import sys
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import bson
 from beanie import init_beanie
+from bson import DBRef, ObjectId
+from bson.raw_bson import RawBSONDocument
 from faker import Faker
-from models.models import Endereco, Peca, Servico, Mecanico, Cliente, PecasOrdemServico, OrdemServico
-
-fake = Faker("pt_BR")
-
-async def connect():
-  client = AsyncIOMotorClient("mongodb://oficina-mongodb:27017/oficina")
-  db = client.get_database()
-  await init_beanie(db, document_models=[Peca, Servico, Mecanico, Cliente, PecasOrdemServico, OrdemServico])
-
-async def init_data():
-  print("Inicializando o banco de dados com dados fakes")
-  # Cria Peças
-  print("Criando peças")
-  pecas = []
-  for _ in range(12):
-    peca = Peca(
-      nome=fake.word().capitalize(),
-      marca=fake.company(),
-      modelo=fake.word(),
-      valor=round(fake.pyfloat(left_digits=3, right_digits=2, positive=True), 2)
-    )
-    await peca.insert()
-    pecas.append(peca)
-    print(peca)
-
-  # Cria Serviços
-  print("Criando serviços")
-  servicos = []
-  categorias = ["Manutenção", "Pneu", "Relação", "Suspensão", "BikeFit", "Limpeza"]
-  for _ in range(7):
-    servico = Servico(
-      nome=fake.word().capitalize(),
-      valor=round(fake.pyfloat(left_digits=2, right_digits=2, positive=True), 2),
-      ativo=fake.boolean(chance_of_getting_true=80),
-      categoria=fake.random_element(elements=categorias)
-    )
-    await servico.insert()
-    servicos.append(servico)
-    print(servico)
-
-  # Cria dados para Mecanico
-  print("Criando mecanicos")
-  mecanicos = []
-  for _ in range(5):
-    mecanico = Mecanico(
-      nome=fake.first_name(),
-      sobrenome=fake.last_name(),
-      telefone=fake.phone_number(),
-      email=fake.email()
-    )
-    await mecanico.insert()
-    mecanicos.append(mecanico)
-    print(mecanico)
-
-  # Cria dados para Cliente
-  print("Criando clientes")
-  clientes = []
-  for _ in range(33):
-    cliente = Cliente(
-      nome=fake.first_name(),
-      sobrenome=fake.last_name(),
-      endereco=Endereco(
-        cidade=fake.city(),
-        logradouro=f"{fake.street_address()}, {fake.postcode()}",
-        bairro=fake.neighborhood()
-      ),
-      telefone=fake.phone_number()
-    )
-    await cliente.insert()
-    clientes.append(cliente)
-    print(cliente)
-
-  # Cria itens de peças para ordem de serviço
-  print("Criando peças para ordens de serviço")
-  pecas_ordens_servicos = []
-  for _ in range(10):
-    peca_escolhida = fake.random_element(elements=pecas)
-    item = PecasOrdemServico(
-      peca=peca_escolhida.to_ref(),
-      quantidade=fake.random_int(min=1, max=5)
-    )
-    await item.insert()
-    pecas_ordens_servicos.append(item)
-    print(item)
-
-  # Cria ordens de serviço
-  print("Criando ordens de serviço")
-  for _ in range(34):
-    cliente_escolhido = fake.random_element(elements=clientes)
-    mecanico_escolhido = fake.random_element(elements=mecanicos)
-    
-    # Seleciona aleatoriamente alguns serviços e itens de peças para essa ordem:
-    selected_servicos = fake.random_elements(elements=servicos, length=fake.random_int(min=1, max=3), unique=True)
-    servicos_refs = [s.to_ref() for s in selected_servicos]
-
-    selected_itens_peca = fake.random_elements(elements=pecas_ordens_servicos, length=fake.random_int(min=0, max=2), unique=True)
-    pecas_refs = [item.to_ref() for item in selected_itens_peca]
-    
-    # Calcula o total de peças (valor da peça x quantidade)
-    total_pecas = 0.0
-    for item in selected_itens_peca:
-      # Busca a peça relacionada
-      peca: Peca = await item.peca.fetch()
-      total_pecas += peca.valor * item.quantidade
-
-    # Calcula o total dos serviços (soma dos valores)
-    total_servicos = sum(s.valor for s in selected_servicos)
-
-    # Valor total da ordem
-    total_ordem = round(total_pecas + total_servicos, 2)
-    
-    data_abertura = fake.date_time_this_year(before_now=True, after_now=False)
-    # Define data_conclusao com 75% de chance
-    data_conclusao = data_abertura + timedelta(days=fake.random_int(min=1, max=10)) if fake.boolean(chance_of_getting_true=75) else None
-    
-    ordem = OrdemServico(
-      cliente=cliente_escolhido.to_ref(),
-      mecanico=mecanico_escolhido.to_ref(),
-      servicos=servicos_refs,
-      pecas=pecas_refs,
-      data_abertura=data_abertura,
-      data_conclusao=data_conclusao,
-      situacao="concluida" if data_conclusao else "pendente",
-      valor=total_ordem if data_conclusao else None
-    )
-    await ordem.insert()
-    print(ordem)
-
-async def main():
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from models.models import MecanicoEstatisticaDiaria, Peca, ResultadoRelatorio, Servico, Mecanico, Cliente, OrdemServico
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://oficina-mongodb:27017/oficina")
+LOTE = 20_000
+
+# Tipo de documento, gravado no byte 5 do ObjectId para que ids de coleções diferentes nunca coincidam
+PECA, SERVICO, MECANICO, CLIENTE, ORDEM = 1, 2, 3, 4, 5
+CATEGORIAS = ["Manutenção", "Pneu", "Relação", "Suspensão", "BikeFit", "Limpeza"]
+
+def nome_busca(nome, sobrenome):
+  # Mesma normalização de utils/text.py da API: sem acentos, minúsculo
+  texto = unicodedata.normalize("NFKD", f"{nome} {sobrenome}").encode("ascii", "ignore").decode("ascii")
+  return " ".join(texto.lower().split())
+
+def gerar_id(tipo: int, indice: int, momento: datetime) -> ObjectId:
+  """ObjectId determinístico: segundos de "momento" (UTC), tipo do documento e posição (7 bytes)."""
+  segundos = int(momento.replace(tzinfo=timezone.utc).timestamp())
+  return ObjectId(segundos.to_bytes(4, "big") + bytes([tipo]) + indice.to_bytes(7, "big"))
+
+def tamanhos(ordens: int) -> dict:
+  """Catálogo proporcional ao número de ordens, com o mínimo do seed original."""
+  return {
+    "pecas": max(12, min(5_000, ordens // 1_000)),
+    "servicos": max(7, min(200, ordens // 50_000)),
+    "mecanicos": max(5, ordens // 20_000),
+    "clientes": max(33, ordens // 10),
+  }
+
+def _fake(semente) -> Faker:
+  fake = Faker("pt_BR")
+  fake.seed_instance(semente)
+  return fake
+
+def gerar_catalogo(semente: int, quantidades: dict, referencia: datetime):
+  """Peças, serviços e mecânicos (poucos, gerados no processo principal)."""
+  fake = _fake(f"{semente}-catalogo")
+  pecas = [{
+    "_id": gerar_id(PECA, i, referencia),
+    "nome": fake.word().capitalize(),
+    "marca": fake.company(),
+    "modelo": fake.word(),
+    "valor": round(fake.pyfloat(left_digits=3, right_digits=2, positive=True), 2),
+  } for i in range(quantidades["pecas"])]
+  servicos = [{
+    "_id": gerar_id(SERVICO, i, referencia),
+    "nome": fake.word().capitalize(),
+    "valor": round(fake.pyfloat(left_digits=2, right_digits=2, positive=True), 2),
+    "ativo": fake.boolean(chance_of_getting_true=80),
+    "categoria": fake.random_element(elements=CATEGORIAS),
+  } for i in range(quantidades["servicos"])]
+  mecanicos = [{
+    "_id": gerar_id(MECANICO, i, referencia),
+    "nome": fake.first_name(),
+    "sobrenome": fake.last_name(),
+    "telefone": fake.phone_number(),
+    "email": fake.email(),
+  } for i in range(quantidades["mecanicos"])]
+  return pecas, servicos, mecanicos
+
+# Estado dos processos de geração, preenchido pelo initializer do pool
+_worker = {}
+
+def _iniciar_worker(semente: int, referencia: datetime, catalogo: dict):
+  _worker.update(semente=semente, referencia=referencia, **catalogo)
+
+def gerar_clientes(inicio: int, fim: int):
+  """Clientes [inicio, fim) já codificados em BSON, com os nomes de busca usados pelas ordens."""
+  fake = _fake(f"{_worker['semente']}-clientes-{inicio}")
+  documentos, nomes = [], []
+  for i in range(inicio, fim):
+    nome, sobrenome = fake.first_name(), fake.last_name()
+    documentos.append(bson.encode({
+      "_id": gerar_id(CLIENTE, i, _worker["referencia"]),
+      "nome": nome,
+      "sobrenome": sobrenome,
+      "endereco": {
+        "cidade": fake.city(),
+        "logradouro": f"{fake.street_address()}, {fake.postcode()}",
+        "bairro": fake.neighborhood(),
+      },
+      "telefone": fake.phone_number(),
+      "ordens_count": 0,
+    }))
+    nomes.append(nome_busca(nome, sobrenome))
+  return documentos, nomes
+
+def gerar_ordens(inicio: int, fim: int):
+  """
+  Ordens [inicio, fim) em BSON, mais as contagens do lote: referências por documento do
+  catálogo ({tipo: Counter(posição)}) e ordens por (mecânico, dia) para os buckets diários.
+  """
+  aleatorio = random.Random(f"{_worker['semente']}-ordens-{inicio}")
+  referencia = _worker["referencia"]
+  pecas, servicos, mecanicos, clientes = _worker["pecas"], _worker["servicos"], _worker["mecanicos"], _worker["clientes"]
+  referencias = {tipo: Counter() for tipo in (PECA, SERVICO, MECANICO, CLIENTE)}
+  buckets = Counter()
+
+  documentos = []
+  for i in range(inicio, fim):
+    cliente = aleatorio.randrange(len(clientes))
+    mecanico = aleatorio.randrange(len(mecanicos))
+    indices_servicos = aleatorio.sample(range(len(servicos)), min(len(servicos), aleatorio.randint(1, 3)))
+    indices_pecas = aleatorio.sample(range(len(pecas)), min(len(pecas), aleatorio.randint(0, 2)))
+
+    # Peças embutidas na ordem, com os dados da peça no momento da inclusão (preços vêm do mapa em memória)
+    itens_peca = [{
+      "peca_id": gerar_id(PECA, p, referencia),
+      "nome": pecas[p][0],
+      "marca": pecas[p][1],
+      "modelo": pecas[p][2],
+      "valor": pecas[p][3],
+      "quantidade": aleatorio.randint(1, 5),
+    } for p in indices_pecas]
+    total_pecas = sum(item["valor"] * item["quantidade"] for item in itens_peca)
+    total_servicos = sum(servicos[s] for s in indices_servicos)
+
+    # Abertura no último ano antes da data de referência; 75% das ordens concluídas
+    data_abertura = referencia - timedelta(seconds=aleatorio.randrange(365 * 24 * 3600))
+    data_conclusao = data_abertura + timedelta(days=aleatorio.randint(1, 10)) if aleatorio.random() < 0.75 else None
+
+    documentos.append(bson.encode({
+      "_id": gerar_id(ORDEM, i, data_abertura),
+      "cliente": DBRef("clientes", gerar_id(CLIENTE, cliente, referencia)),
+      "mecanico": DBRef("mecanicos", gerar_id(MECANICO, mecanico, referencia)),
+      "cliente_nome_busca": clientes[cliente],
+      "mecanico_nome_busca": mecanicos[mecanico],
+      "servicos": [DBRef("servicos", gerar_id(SERVICO, s, referencia)) for s in indices_servicos],
+      "servicos_itens": [{"servico_id": gerar_id(SERVICO, s, referencia), "valor": servicos[s]} for s in indices_servicos],
+      "pecas": itens_peca,
+      "data_abertura": data_abertura,
+      "data_conclusao": data_conclusao,
+      "situacao": "concluida" if data_conclusao else "pendente",
+      "valor": round(total_pecas + total_servicos, 2) if data_conclusao else None,
+      "subtotal_servicos": total_servicos,
+      "subtotal_pecas": total_pecas,
+      "subtotal": total_servicos + total_pecas,
+    }))
+
+    referencias[CLIENTE][cliente] += 1
+    referencias[MECANICO][mecanico] += 1
+    referencias[SERVICO].update(indices_servicos)
+    referencias[PECA].update(indices_pecas)
+    buckets[(mecanico, data_abertura.date())] += 1
+  return documentos, referencias, buckets
+
+async def carregar(executor, funcao, total: int, colecao, ao_receber, paralelos: int, descricao: str):
+  """
+  Gera os lotes no pool e insere cada um assim que fica pronto, com no máximo "paralelos" lotes
+  em andamento (limita a memória e mantém os workers ocupados enquanto o banco grava).
+  """
+  loop = asyncio.get_running_loop()
+  lotes = [(inicio, min(inicio + LOTE, total)) for inicio in range(0, total, LOTE)]
+  inicio_carga = time.perf_counter()
+  inseridos = 0
+
+  async def gerar_e_inserir(inicio, fim):
+    documentos, *extras = await loop.run_in_executor(executor, funcao, inicio, fim)
+    await colecao.insert_many([RawBSONDocument(documento) for documento in documentos], ordered=False)
+    return inicio, fim, extras
+
+  pendentes = set()
+  while lotes or pendentes:
+    while lotes and len(pendentes) < paralelos:
+      pendentes.add(asyncio.ensure_future(gerar_e_inserir(*lotes.pop(0))))
+    prontos, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+    for pronto in prontos:
+      inicio, fim, extras = pronto.result()
+      ao_receber(inicio, *extras)
+      inseridos += fim - inicio
+    decorrido = time.perf_counter() - inicio_carga
+    print(f"{descricao}: {inseridos}/{total} ({inseridos / decorrido:,.0f}/s)", flush=True)
+
+async def atualizar_contadores(database, colecao: str, tipo: int, contagem: Counter, referencia: datetime):
+  operacoes = [
+    UpdateOne({"_id": gerar_id(tipo, indice, referencia)}, {"$set": {"ordens_count": total}})
+    for indice, total in contagem.items()
+  ]
+  for inicio in range(0, len(operacoes), LOTE):
+    await database[colecao].bulk_write(operacoes[inicio:inicio + LOTE], ordered=False)
+
+async def init_data(database, ordens: int, semente: int, workers: int, referencia: datetime):
+  quantidades = tamanhos(ordens)
+  print(f"Gerando {ordens} ordens com {quantidades} (semente {semente}, {workers} workers)")
+  inicio = time.perf_counter()
+
+  pecas, servicos, mecanicos = gerar_catalogo(semente, quantidades, referencia)
+  for colecao, documentos in [("pecas", pecas), ("servicos", servicos), ("mecanicos", mecanicos)]:
+    await database[colecao].insert_many([{**documento, "ordens_count": 0} for documento in documentos], ordered=False)
+
+  nomes_clientes = [None] * quantidades["clientes"]
+  def receber_clientes(inicio, nomes):
+    nomes_clientes[inicio:inicio + len(nomes)] = nomes
+
+  with ProcessPoolExecutor(workers, initializer=_iniciar_worker, initargs=(semente, referencia, {})) as executor:
+    await carregar(executor, gerar_clientes, quantidades["clientes"], database["clientes"], receber_clientes, workers + 2, "clientes")
+
+  # Os workers das ordens recebem uma vez o catálogo resumido: dados/preços das peças, preços dos serviços e nomes de busca
+  catalogo = {
+    "pecas": [(p["nome"], p["marca"], p["modelo"], p["valor"]) for p in pecas],
+    "servicos": [s["valor"] for s in servicos],
+    "mecanicos": [nome_busca(m["nome"], m["sobrenome"]) for m in mecanicos],
+    "clientes": nomes_clientes,
+  }
+  referencias = {tipo: Counter() for tipo in (PECA, SERVICO, MECANICO, CLIENTE)}
+  buckets = Counter()
+  def receber_ordens(inicio, contagens, buckets_lote):
+    for tipo, contagem in contagens.items():
+      referencias[tipo].update(contagem)
+    buckets.update(buckets_lote)
+
+  with ProcessPoolExecutor(workers, initializer=_iniciar_worker, initargs=(semente, referencia, catalogo)) as executor:
+    await carregar(executor, gerar_ordens, ordens, database["ordens_servico"], receber_ordens, workers + 2, "ordens")
+
+  # Quantidade de ordens que referenciam cada documento do catálogo (conferida nas exclusões)
+  print("Atualizando contadores de ordens do catálogo")
+  for colecao, tipo in [("pecas", PECA), ("servicos", SERVICO), ("mecanicos", MECANICO), ("clientes", CLIENTE)]:
+    await atualizar_contadores(database, colecao, tipo, referencias[tipo], referencia)
+
+  # Buckets diários usados pelo relatório de mecânicos (mesmo formato mantido pela API)
+  print("Criando estatísticas diárias dos mecânicos")
+  estatisticas = [
+    {"mecanico_id": gerar_id(MECANICO, mecanico, referencia), "dia": datetime(dia.year, dia.month, dia.day), "total_ordens": total}
+    for (mecanico, dia), total in buckets.items()
+  ]
+  for inicio_lote in range(0, len(estatisticas), LOTE):
+    await database["mecanico_daily_stats"].insert_many(estatisticas[inicio_lote:inicio_lote + LOTE], ordered=False)
+
+  print(f"Dados gerados em {time.perf_counter() - inicio:.1f}s")
+
+async def main(args) -> int:
+  client = AsyncIOMotorClient(MONGO_URI)
+  database = client.get_database()
+  # Os mesmos models de db.DOCUMENT_MODELS: o --limpar apaga também os relatórios calculados sobre os dados antigos
+  document_models = [Peca, Servico, Mecanico, Cliente, OrdemServico, MecanicoEstatisticaDiaria, ResultadoRelatorio]
+
+  if args.limpar:
+    for model in document_models:
+      await database.drop_collection(model.Settings.name)
+  elif await database["ordens_servico"].estimated_document_count():
+    print("Banco já possui ordens de serviço; nada a fazer (use --limpar para gerar de novo).")
+    return 0
+
   try:
-    await connect()
-    await init_data()
+    # Os dados entram sem índices; o init_beanie cria os índices depois da carga, de uma vez
+    referencia = datetime.fromisoformat(args.referencia) if args.referencia else datetime.now(timezone.utc).replace(tzinfo=None)
+    await init_data(database, args.ordens, args.semente, args.workers, referencia)
+    await init_beanie(database, document_models=document_models)
     print("Banco inicializado com sucesso.")
-  except Exception:
-    print(Exception)
+    return 0
+  except Exception as e:
+    print(f"Erro ao inicializar o banco: {e!r}")
+    return 1
 
 if __name__ == "__main__":
-  asyncio.run(main())
\ No newline at end of file
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--ordens", type=int, default=int(os.getenv("SEED_ORDENS", "34")))
+  parser.add_argument("--semente", type=int, default=int(os.getenv("SEED_SEMENTE", "42")))
+  parser.add_argument("--workers", type=int, default=int(os.getenv("SEED_WORKERS", str(os.cpu_count() or 1))))
+  parser.add_argument("--referencia", default=os.getenv("SEED_REFERENCIA"), help="data final das aberturas (ISO); padrão: agora")
+  parser.add_argument("--limpar", action="store_true", help="apaga os dados existentes antes de gerar")
+  sys.exit(asyncio.run(main(parser.parse_args())))
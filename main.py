@@ -1,27 +1,45 @@
-from fastapi import FastAPI, HTTPException, Request, Response
-from controllers import cliente_controller, mecanico_controller, ordem_servico_controller, peca_controller, servico_controller
-from db import db
-from exceptions.exceptions import BadRequestException, InternalServerErrorException, NotFoundException
-from exceptions.global_exception_handler import bad_request_exception_handler, global_exception_handler, http_exception_handler, internal_server_error_exception_handler, not_found_exception_handler
-import logging
-from datetime import datetime
-from beanie import init_beanie
-
 from dotenv import load_dotenv
 
+# Antes dos demais imports: db/db.py lê a configuração do banco do ambiente ao ser importado
 load_dotenv()
 
-from models.models import Peca, PecasOrdemServico, Servico, Mecanico, Cliente, OrdemServico
+from fastapi import FastAPI, HTTPException, Request, Response
+from controllers import cliente_controller, debug_controller, mecanico_controller, ordem_servico_controller, peca_controller, relatorio_controller, servico_controller
+from db import db
+from db.command_metrics import requisicao_atual
+from relatorios.jobs import report_jobs
+from utils import access_log
+from utils.responses import default_response_class
+from exceptions.exceptions import BadRequestException, InternalServerErrorException, NotFoundException, ServiceUnavailableException
+from exceptions.global_exception_handler import bad_request_exception_handler, global_exception_handler, http_exception_handler, internal_server_error_exception_handler, not_found_exception_handler, service_unavailable_exception_handler
+import time
 
-app = FastAPI(title="Oficina Mecânica")
+app = FastAPI(title="Oficina Mecânica", default_response_class=default_response_class())
 
 @app.on_event("startup")
 async def init_db():
-  await init_beanie(database=db.db, document_models=[Peca, Servico, Mecanico, Cliente, OrdemServico, PecasOrdemServico])
+  await db.init_db()
+
+@app.on_event("startup")
+async def start_access_log():
+  access_log.iniciar()
+
+@app.on_event("shutdown")
+async def shutdown_report_pool():
+  report_jobs.shutdown()
+
+@app.on_event("shutdown")
+async def stop_slow_queries():
+  db.slow_queries.parar()
+
+@app.on_event("shutdown")
+async def stop_access_log():
+  access_log.parar()
 
 app.add_exception_handler(NotFoundException, not_found_exception_handler)
 app.add_exception_handler(BadRequestException, bad_request_exception_handler)
 app.add_exception_handler(InternalServerErrorException, internal_server_error_exception_handler)
+app.add_exception_handler(ServiceUnavailableException, service_unavailable_exception_handler)
 app.add_exception_handler(HTTPException, http_exception_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
@@ -30,29 +48,28 @@ app.include_router(mecanico_controller.router)
 app.include_router(peca_controller.router)
 app.include_router(servico_controller.router)
 app.include_router(ordem_servico_controller.router)
-
-def get_log_level(status_code):
-  log_levels = {
-    2: logging.INFO,      # 2xx: Sucesso
-    3: logging.WARNING,   # 3xx: Redirecionamento
-    4: logging.ERROR,     # 4xx: Erro do cliente
-    5: logging.CRITICAL,  # 5xx: Erro do servidor
-  }
-  return log_levels.get(status_code // 100, logging.DEBUG)
+app.include_router(relatorio_controller.router)
+app.include_router(debug_controller.router)
 
 @app.middleware("http")
 async def log(request: Request, call_next):
-  start_time = datetime.now()
-  method = request.method
-  path = request.url.path
-
-  response: Response = await call_next(request)
-  status_code = response.status_code
-
-  log_level = get_log_level(status_code)
-  logging.log(log_level, f"Metodo: {method} | Caminho: {path} | Status: {status_code} | Data/Hora: {start_time}")
-
-  return response
+  inicio = time.perf_counter()
+  # Permite ao listener de comandos do Mongo marcar cada comando com a rota que o originou
+  requisicao_atual.set(request.scope)
+  status_code = 500
+  try:
+    response: Response = await call_next(request)
+    status_code = response.status_code
+    return response
+  finally:
+    # Template da rota (ex.: /clientes/{id}) para agrupar os registros; sem rota, o caminho
+    route = request.scope.get("route")
+    access_log.registrar(
+      request.method,
+      route.path if route is not None else request.url.path,
+      status_code,
+      (time.perf_counter() - inicio) * 1000
+    )
 
 @app.get("/")
 def root():
@@ -1,14 +1,15 @@
-from beanie import Document, Link
-from typing import List, Optional
+from beanie import Document, Link, PydanticObjectId
+from typing import Any, List, Optional
 from datetime import datetime
 
 from bson import ObjectId
 from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
 
 class BaseDocument(Document):
   def to_dict(self):
     """Converte ObjectId para string em qualquer documento Beanie."""
-    data = self.model_dump()
+    data = self.model_dump(exclude={"revision_id", "ordens_count"})
     if isinstance(self.id, ObjectId):
       data["id"] = str(self.id)
     return data
@@ -19,6 +20,8 @@ class Peca(BaseDocument):
   marca: str
   modelo: str
   valor: float
+  # Quantidade de ordens de serviço que referenciam o documento, mantida em todo o catálogo (ver repositories/referencias.py)
+  ordens_count: int = 0
 
   class Settings:
     name = "pecas"
@@ -29,6 +32,7 @@ class Servico(BaseDocument):
   valor: float
   ativo: bool
   categoria: str
+  ordens_count: int = 0
 
   class Settings:
     name = "servicos"
@@ -39,6 +43,7 @@ class Mecanico(BaseDocument):
   sobrenome: str
   telefone: str
   email: Optional[str] = None
+  ordens_count: int = 0
 
   class Settings:
     name = "mecanicos"
@@ -54,28 +59,91 @@ class Cliente(BaseDocument):
   sobrenome: str
   endereco: Endereco
   telefone: str
+  ordens_count: int = 0
 
   class Settings:
     name = "clientes"
     
 
-class PecasOrdemServico(BaseDocument):
-  peca: Link[Peca]
+class ItemPecaOrdemServico(BaseModel):
+  """Peça usada na ordem, embutida no documento com os dados da peça no momento da inclusão."""
+  peca_id: PydanticObjectId
+  nome: str
+  marca: str
+  modelo: str
+  valor: float
   quantidade: int
-  
-  class Settings:
-    name = "pecas_ordens_servicos"
+
+
+class ItemServicoOrdemServico(BaseModel):
+  """Valor do serviço no momento da inclusão na ordem; é o que entra (e depois sai) do subtotal."""
+  servico_id: PydanticObjectId
+  valor: float
 
 
 class OrdemServico(BaseDocument):
   cliente: Link[Cliente]
   mecanico: Link[Mecanico]
   servicos: Optional[List[Link[Servico]]] = []
-  pecas: Optional[List[Link[PecasOrdemServico]]] = []
+  # Um item por serviço em "servicos"; ordens anteriores ao campo não têm os itens
+  servicos_itens: Optional[List[ItemServicoOrdemServico]] = []
+  pecas: Optional[List[ItemPecaOrdemServico]] = []
   data_abertura: datetime
   data_conclusao: Optional[datetime] = None
   situacao: str
   valor: Optional[float] = None
+  # Subtotais mantidos com $inc ao adicionar/remover itens; "valor" recebe o subtotal ao concluir
+  subtotal_servicos: float = 0
+  subtotal_pecas: float = 0
+  subtotal: float = 0
+  # Cópias normalizadas (sem acento, minúsculas) de "nome sobrenome" para a busca por prefixo
+  cliente_nome_busca: Optional[str] = None
+  mecanico_nome_busca: Optional[str] = None
 
   class Settings:
     name = "ordens_servico"
+    # Os links são gravados como DBRef, por isso os índices usam o campo "$id"
+    indexes = [
+      # Listagem ordenada (cursor) e filtro por período do relatório de mecânicos
+      IndexModel([("data_abertura", ASCENDING), ("_id", ASCENDING)], name="data_abertura_id"),
+      # Filtros da listagem, atualização dos nomes de busca e contagem de referências do cliente/mecânico
+      IndexModel([("cliente.$id", ASCENDING), ("data_abertura", ASCENDING), ("_id", ASCENDING)], name="cliente_data_abertura_id"),
+      IndexModel([("mecanico.$id", ASCENDING), ("data_abertura", ASCENDING), ("_id", ASCENDING)], name="mecanico_data_abertura_id"),
+      IndexModel([("situacao", ASCENDING)], name="situacao"),
+      # Contagem das referências de serviço/peça ao excluir um documento ainda sem ordens_count
+      IndexModel([("servicos.$id", ASCENDING)], name="servicos_id"),
+      IndexModel([("pecas.peca_id", ASCENDING)], name="pecas_peca_id"),
+      # Busca por prefixo do nome do cliente/mecânico
+      IndexModel([("cliente_nome_busca", ASCENDING), ("data_abertura", ASCENDING), ("_id", ASCENDING)], name="cliente_nome_busca_data_abertura_id"),
+      IndexModel([("mecanico_nome_busca", ASCENDING), ("data_abertura", ASCENDING), ("_id", ASCENDING)], name="mecanico_nome_busca_data_abertura_id"),
+    ]
+
+
+class MecanicoEstatisticaDiaria(Document):
+  """Total de ordens abertas por mecânico em cada dia (UTC), mantido a cada criação/alteração/exclusão de ordem."""
+  mecanico_id: PydanticObjectId
+  dia: datetime
+  total_ordens: int = 0
+
+  class Settings:
+    name = "mecanico_daily_stats"
+    indexes = [
+      # Chave do upsert incremental e filtro por período do relatório (cobre o $group)
+      IndexModel([("dia", ASCENDING), ("mecanico_id", ASCENDING)], name="dia_mecanico_id", unique=True),
+    ]
+
+
+class ResultadoRelatorio(Document):
+  """Resultado de um relatório analítico em um período, gravado com $merge por relatorios/analytics.py."""
+  relatorio: str
+  periodo_inicio: datetime
+  periodo_fim: datetime
+  dados: List[Any] = []
+  gerado_em: datetime
+
+  class Settings:
+    name = "report_results"
+    indexes = [
+      # Chave do $merge: um documento por relatório e período
+      IndexModel([("relatorio", ASCENDING), ("periodo_inicio", ASCENDING), ("periodo_fim", ASCENDING)], name="relatorio_periodo", unique=True),
+    ]
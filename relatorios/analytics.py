@@ -0,0 +1,205 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from models.models import OrdemServico, ResultadoRelatorio
+
+# Relatórios analíticos sobre as ordens de serviço de um período (pela data de abertura).
+# Todos são calculados juntos, em uma única leitura das ordens com $facet, e gravados com $merge
+# em "report_results" (um documento por relatório e período). Pedidos seguintes do mesmo período
+# são atendidos dessa coleção até o resultado ficar mais velho que REPORT_RESULTS_TTL_SECONDS.
+
+REPORT_RESULTS_TTL_SECONDS = float(os.getenv("REPORT_RESULTS_TTL_SECONDS", "3600"))
+TOP_PECAS = int(os.getenv("REPORT_TOP_PECAS", "10"))
+
+def _nomes_mecanicos(campo_id: str = "_id") -> List[dict]:
+  """Busca nome e sobrenome do mecânico depois da agregação (uma vez por mecânico)."""
+  return [
+    {"$lookup": {
+      "from": "mecanicos",
+      "localField": campo_id,
+      "foreignField": "_id",
+      "pipeline": [{"$project": {"nome": 1, "sobrenome": 1}}],
+      "as": "mecanico_info"
+    }},
+    {"$unwind": "$mecanico_info"},
+  ]
+
+def _pecas(ordenar_por: str) -> List[dict]:
+  return [
+    {"$unwind": "$pecas"},
+    {"$group": {
+      "_id": "$pecas.peca_id",
+      # Nome, marca e modelo da ordem aberta mais recentemente (os dados da peça podem ter mudado)
+      "dados": {"$top": {
+        "sortBy": {"data_abertura": -1, "_id": -1},
+        "output": {"nome": "$pecas.nome", "marca": "$pecas.marca", "modelo": "$pecas.modelo"}
+      }},
+      "quantidade": {"$sum": "$pecas.quantidade"},
+      # Valor registrado em cada ordem no momento da inclusão da peça
+      "valor": {"$sum": {"$multiply": ["$pecas.valor", "$pecas.quantidade"]}},
+      "ordens": {"$sum": 1}
+    }},
+    {"$sort": {ordenar_por: -1, "_id": 1}},
+    {"$limit": TOP_PECAS},
+    {"$project": {
+      "_id": 0,
+      "peca_id": {"$toString": "$_id"},
+      "nome": "$dados.nome",
+      "marca": "$dados.marca",
+      "modelo": "$dados.modelo",
+      "quantidade": 1,
+      "valor": {"$round": ["$valor", 2]},
+      "ordens": 1
+    }}
+  ]
+
+# Sub-pipeline do $facet de cada relatório
+RELATORIOS: Dict[str, List[dict]] = {
+  "ordens_por_mecanico": [
+    {"$group": {"_id": "$mecanico.$id", "total_ordens": {"$sum": 1}}},
+    {"$sort": {"total_ordens": -1, "_id": 1}},
+    *_nomes_mecanicos(),
+    {"$project": {"_id": 0, "nome": "$mecanico_info.nome", "sobrenome": "$mecanico_info.sobrenome", "total_ordens": 1}}
+  ],
+  # Receita das ordens concluídas por categoria de serviço, pelo valor registrado na inclusão (servicos_itens).
+  # Ordens anteriores ao registro contam em servicos_realizados e servicos_sem_valor, mas não na receita
+  "receita_por_categoria": [
+    {"$match": {"situacao": "concluida"}},
+    {"$project": {"itens": {"$cond": [
+      {"$eq": [{"$size": {"$ifNull": ["$servicos", []]}}, {"$size": {"$ifNull": ["$servicos_itens", []]}}]},
+      {"$ifNull": ["$servicos_itens", []]},
+      {"$map": {
+        "input": {"$ifNull": ["$servicos", []]},
+        "in": {"servico_id": {"$getField": {"field": {"$literal": "$id"}, "input": "$$this"}}, "valor": None}
+      }}
+    ]}}},
+    {"$unwind": "$itens"},
+    {"$group": {
+      "_id": "$itens.servico_id",
+      "receita": {"$sum": "$itens.valor"},
+      "realizados": {"$sum": 1},
+      "sem_valor": {"$sum": {"$cond": [{"$eq": ["$itens.valor", None]}, 1, 0]}}
+    }},
+    # A categoria vem do catálogo, buscada uma vez por serviço depois do $group
+    {"$lookup": {
+      "from": "servicos",
+      "localField": "_id",
+      "foreignField": "_id",
+      "pipeline": [{"$project": {"categoria": 1}}],
+      "as": "servico"
+    }},
+    {"$unwind": "$servico"},
+    {"$group": {
+      "_id": "$servico.categoria",
+      "receita": {"$sum": "$receita"},
+      "servicos_realizados": {"$sum": "$realizados"},
+      "servicos_sem_valor": {"$sum": "$sem_valor"}
+    }},
+    {"$sort": {"receita": -1, "_id": 1}},
+    {"$project": {
+      "_id": 0,
+      "categoria": "$_id",
+      "receita": {"$round": ["$receita", 2]},
+      "servicos_realizados": 1,
+      "servicos_sem_valor": 1
+    }}
+  ],
+  "pecas_por_quantidade": _pecas("quantidade"),
+  "pecas_por_valor": _pecas("valor"),
+  "tempo_medio_por_mecanico": [
+    {"$match": {"data_conclusao": {"$ne": None}}},
+    {"$group": {
+      "_id": "$mecanico.$id",
+      "tempo_medio_ms": {"$avg": {"$subtract": ["$data_conclusao", "$data_abertura"]}},
+      "ordens_concluidas": {"$sum": 1}
+    }},
+    {"$sort": {"tempo_medio_ms": 1, "_id": 1}},
+    *_nomes_mecanicos(),
+    {"$project": {
+      "_id": 0,
+      "nome": "$mecanico_info.nome",
+      "sobrenome": "$mecanico_info.sobrenome",
+      "tempo_medio_horas": {"$round": [{"$divide": ["$tempo_medio_ms", 3600 * 1000]}, 2]},
+      "ordens_concluidas": 1
+    }}
+  ],
+  "backlog_por_situacao": [
+    {"$group": {
+      "_id": "$situacao",
+      "ordens": {"$sum": 1},
+      "valor": {"$sum": {"$ifNull": ["$subtotal", 0]}},
+      "abertura_mais_antiga": {"$min": "$data_abertura"}
+    }},
+    {"$sort": {"ordens": -1, "_id": 1}},
+    {"$project": {"_id": 0, "situacao": "$_id", "ordens": 1, "valor": {"$round": ["$valor", 2]}, "abertura_mais_antiga": 1}}
+  ],
+}
+
+def facet_pipeline(inicio: datetime, fim: datetime, gerado_em: datetime) -> List[dict]:
+  """Uma leitura das ordens do período para todos os relatórios; cada relatório vira um documento no $merge."""
+  return [
+    {"$match": {"data_abertura": {"$gte": inicio, "$lte": fim}}},
+    {"$facet": RELATORIOS},
+    {"$project": {"relatorios": {"$objectToArray": "$$ROOT"}}},
+    {"$unwind": "$relatorios"},
+    {"$project": {
+      "_id": 0,
+      "relatorio": "$relatorios.k",
+      "periodo_inicio": {"$literal": inicio},
+      "periodo_fim": {"$literal": fim},
+      "dados": "$relatorios.v",
+      "gerado_em": {"$literal": gerado_em}
+    }},
+    {"$merge": {
+      "into": ResultadoRelatorio.get_settings().name,
+      "on": ["relatorio", "periodo_inicio", "periodo_fim"],
+      "whenMatched": "replace",
+      "whenNotMatched": "insert"
+    }}
+  ]
+
+# Cálculos em andamento por período: pedidos simultâneos do mesmo período esperam o mesmo $facet
+_em_andamento: Dict[Tuple[datetime, datetime], asyncio.Future] = {}
+
+async def _calcular(inicio: datetime, fim: datetime):
+  # Precisão de milissegundos, a mesma que o Mongo grava
+  agora = datetime.now(timezone.utc)
+  gerado_em = agora.replace(microsecond=agora.microsecond // 1000 * 1000)
+  await OrdemServico.get_motor_collection().aggregate(facet_pipeline(inicio, fim, gerado_em)).to_list(None)
+
+async def calcular(inicio: datetime, fim: datetime):
+  chave = (inicio, fim)
+  tarefa = _em_andamento.get(chave)
+  if tarefa is None:
+    tarefa = asyncio.ensure_future(_calcular(inicio, fim))
+    _em_andamento[chave] = tarefa
+    tarefa.add_done_callback(lambda _: _em_andamento.pop(chave, None))
+  await asyncio.shield(tarefa)
+
+async def _ler(nomes: List[str], inicio: datetime, fim: datetime) -> Dict[str, dict]:
+  documentos = ResultadoRelatorio.get_motor_collection().find(
+    {"relatorio": {"$in": nomes}, "periodo_inicio": inicio, "periodo_fim": fim},
+    projection={"_id": 0}
+  )
+  return {documento["relatorio"]: documento async for documento in documentos}
+
+def _atuais(resultados: Dict[str, dict], nomes: List[str]) -> bool:
+  if any(nome not in resultados for nome in nomes):
+    return False
+  limite = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=REPORT_RESULTS_TTL_SECONDS)
+  return all(resultados[nome]["gerado_em"] >= limite for nome in nomes)
+
+async def obter(nomes: List[str], inicio: datetime, fim: datetime, recalcular: bool = False) -> Tuple[Dict[str, dict], bool]:
+  """
+  Resultados dos relatórios pedidos no período e se vieram de report_results (True) ou
+  acabaram de ser calculados (False). Calcular um relatório recalcula todos os do período.
+  """
+  if not recalcular:
+    resultados = await _ler(nomes, inicio, fim)
+    if _atuais(resultados, nomes):
+      return resultados, True
+
+  await calcular(inicio, fim)
+  return await _ler(nomes, inicio, fim), False
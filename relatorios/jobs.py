@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from exceptions.exceptions import ServiceUnavailableException
+from relatorios.pdf import generate_report
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_MAX_QUEUE = int(os.getenv("REPORT_MAX_QUEUE", "20"))
+REPORT_MAX_JOBS = int(os.getenv("REPORT_MAX_JOBS", "500"))
+
+NA_FILA = "na_fila"
+CONSULTANDO = "consultando"
+GERANDO_PDF = "gerando_pdf"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+@dataclass
+class ReportJob:
+  id: str
+  data_inicio: str
+  data_fim: str
+  status: str = NA_FILA
+  progresso: float = 0.0
+  criado_em: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+  concluido_em: Optional[datetime] = None
+  filename: Optional[str] = None
+  report: Optional[List[dict]] = None
+  erro: Optional[str] = None
+
+  def to_dict(self):
+    return asdict(self)
+
+class ReportJobManager:
+  """
+  Gera os PDFs em um pool de processos limitado, fora do event loop.
+  O semáforo limita quantos PDFs são gerados ao mesmo tempo; o restante espera na fila,
+  que também tem limite (acima dele as requisições recebem 503).
+  """
+
+  def __init__(self, workers: int, max_queue: int, max_jobs: int):
+    self.workers = workers
+    self.max_queue = max_queue
+    self.max_jobs = max_jobs
+    self.jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+    self._executor: Optional[ProcessPoolExecutor] = None
+    self._semaphore: Optional[asyncio.Semaphore] = None
+    self._tasks = set()
+    self._aguardando = 0
+    self._gerando = 0
+    self.submetidos = 0
+    self.concluidos = 0
+    self.falhas = 0
+    self.rejeitados = 0
+
+  def _pool(self):
+    if self._executor is None:
+      # "spawn" evita herdar o event loop e as conexões do processo da API
+      self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+    if self._semaphore is None:
+      self._semaphore = asyncio.Semaphore(self.workers)
+    return self._executor
+
+  def _reservar_vaga(self):
+    if self._aguardando >= self.max_queue:
+      self.rejeitados += 1
+      raise ServiceUnavailableException("Fila de relatórios cheia, tente novamente em instantes.")
+    self._aguardando += 1
+
+  async def render(self, data, data_inicio: str, data_fim: str, reservado: bool = False) -> str:
+    """Gera o PDF no pool de processos e devolve o nome do arquivo."""
+    if not reservado:
+      self._reservar_vaga()
+
+    na_fila = True
+    try:
+      # Dentro do try: se o pool não puder ser criado, a vaga reservada é devolvida no finally
+      executor = self._pool()
+      async with self._semaphore:
+        self._aguardando -= 1
+        na_fila = False
+        self._gerando += 1
+        try:
+          loop = asyncio.get_running_loop()
+          return await loop.run_in_executor(executor, generate_report, data, data_inicio, data_fim)
+        except BrokenProcessPool:
+          # Um worker morreu; o pool fica inutilizável e é recriado na próxima chamada
+          if self._executor is executor:
+            self._executor = None
+          raise
+        finally:
+          self._gerando -= 1
+    finally:
+      if na_fila:
+        self._aguardando -= 1
+
+  def submit(self, data_inicio: str, data_fim: str, consulta: Callable[[], Awaitable[list]]) -> ReportJob:
+    """Cria um job que executa a consulta e gera o PDF em segundo plano."""
+    self._reservar_vaga()
+
+    job = ReportJob(id=str(uuid.uuid4()), data_inicio=data_inicio, data_fim=data_fim)
+    self.jobs[job.id] = job
+    self.submetidos += 1
+    self._descartar_antigos()
+
+    # Guarda a referência para a task não ser coletada antes de terminar
+    task = asyncio.create_task(self._executar(job, consulta))
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+    return job
+
+  async def _executar(self, job: ReportJob, consulta: Callable[[], Awaitable[list]]):
+    # A vaga reservada no submit passa para o render; se não chegar lá, é liberada aqui
+    vaga_reservada = True
+    try:
+      job.status = CONSULTANDO
+      job.progresso = 0.25
+      job.report = await consulta()
+
+      if job.report:
+        job.status = GERANDO_PDF
+        job.progresso = 0.5
+        vaga_reservada = False
+        job.filename = await self.render(job.report, job.data_inicio, job.data_fim, reservado=True)
+
+      job.status = CONCLUIDO
+      self.concluidos += 1
+    except Exception as e:
+      logger.error(f"Erro ao gerar relatório {job.id}: {e}")
+      job.status = ERRO
+      job.erro = str(e)
+      self.falhas += 1
+    finally:
+      if vaga_reservada:
+        self._aguardando -= 1
+      job.progresso = 1.0
+      job.concluido_em = datetime.now(timezone.utc)
+
+  def _descartar_antigos(self):
+    # Mantém só os jobs mais recentes; os finalizados saem primeiro
+    for job_id in list(self.jobs):
+      if len(self.jobs) <= self.max_jobs:
+        break
+      if self.jobs[job_id].status in (CONCLUIDO, ERRO):
+        del self.jobs[job_id]
+
+  def get(self, job_id: str) -> Optional[ReportJob]:
+    return self.jobs.get(job_id)
+
+  def stats(self) -> dict:
+    return {
+      "workers": self.workers,
+      "max_queue": self.max_queue,
+      "queue_depth": self._aguardando,
+      "em_execucao": self._gerando,
+      "submetidos": self.submetidos,
+      "concluidos": self.concluidos,
+      "falhas": self.falhas,
+      "rejeitados": self.rejeitados,
+    }
+
+  def shutdown(self):
+    if self._executor is not None:
+      self._executor.shutdown(wait=False, cancel_futures=True)
+      self._executor = None
+
+report_jobs = ReportJobManager(REPORT_WORKERS, REPORT_MAX_QUEUE, REPORT_MAX_JOBS)
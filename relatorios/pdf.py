@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+import os
+import uuid
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet
+
+# Executado nos processos do pool de relatórios (relatorios/jobs.py): deve continuar
+# sendo uma função de módulo, com argumentos simples, para poder ser enviada ao processo.
+def generate_report(data, data_inicio, data_fim):
+  
+  data_geracao = datetime.now(timezone.utc)
+  
+  # Gera um nome único para o PDF
+  filename = f"{uuid.uuid4()}.pdf"
+  filepath = os.path.join("reports", filename)
+  
+  # Cria o diretório 'reports' se não existir
+  os.makedirs("reports", exist_ok=True)
+  
+  doc = SimpleDocTemplate(filepath, pagesize=A4)
+  elementos = []
+  
+  styles = getSampleStyleSheet()
+  
+  titulo = Paragraph("<b>Relatório de Mecânicos</b>", styles["Title"])
+  elementos.append(titulo)
+  elementos.append(Spacer(1, 12))
+  
+  info = f"Data de geração: {data_geracao} <br/> Período: {data_inicio} a {data_fim}"
+  elementos.append(Paragraph(info, styles["Normal"]))
+  elementos.append(Spacer(1, 12))
+  
+  dados_tabela = [["Nome", "Sobrenome", "Total de Ordens"]]
+  
+  for i, item in enumerate(data):
+    linha = [item["nome"], item["sobrenome"], item["total_ordens"]]
+    dados_tabela.append(linha)
+  
+  tabela = Table(dados_tabela, colWidths=[150, 150, 100])
+  
+  estilo = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+  ])
+  
+  for i in range(1, len(dados_tabela)):
+    if i % 2 == 0:
+      estilo.add('BACKGROUND', (0, i), (-1, i), colors.lightgrey)
+  
+  tabela.setStyle(estilo)
+  elementos.append(tabela)
+  
+  doc.build(elementos)
+  
+  return filename
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from exceptions.exceptions import BadRequestException
+
+def periodo(data_inicio: str, data_fim: str):
+  """Converte as datas dd/mm/aaaa dos relatórios no intervalo [início do primeiro dia, fim do último dia]."""
+  try:
+    data_inicio_convert = datetime.strptime(data_inicio, "%d/%m/%Y")
+    data_fim_convert = datetime.strptime(data_fim, "%d/%m/%Y")
+  except ValueError:
+    raise BadRequestException("Datas devem estar no formato dd/mm/aaaa.")
+
+  data_inicio_datetime = datetime(data_inicio_convert.year, data_inicio_convert.month, data_inicio_convert.day, 0, 0, 0)
+  data_fim_datetime = datetime(data_fim_convert.year, data_fim_convert.month, data_fim_convert.day, 23, 59, 59)
+  return data_inicio_datetime, data_fim_datetime
@@ -0,0 +1,109 @@
+import os
+from typing import Awaitable, Callable, List, Optional, Type
+
+from bson import ObjectId
+from pydantic import BaseModel, ValidationError
+from pymongo import InsertOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from exceptions.exceptions import BadRequestException
+from models.models import OrdemServico
+from repositories import catalogo_cache
+from schemas.util_schema import BulkItemResult, BulkResponse
+from utils.text import nome_completo_busca
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+def sincronizar_nomes_busca(campo: str):
+  """Callback para bulk_upsert que atualiza "<campo>_nome_busca" nas ordens das pessoas alteradas."""
+  async def sincronizar(pessoas: List[dict]):
+    await OrdemServico.get_motor_collection().bulk_write([
+      UpdateMany(
+        {f"{campo}.$id": pessoa["_id"]},
+        {"$set": {f"{campo}_nome_busca": nome_completo_busca(pessoa["nome"], pessoa["sobrenome"])}}
+      ) for pessoa in pessoas
+    ], ordered=False)
+  return sincronizar
+
+def _mensagem_validacao(erro: ValidationError) -> str:
+  return "; ".join(f"{'.'.join(str(parte) for parte in e['loc'])}: {e['msg']}" for e in erro.errors())
+
+async def bulk_upsert(
+  model: Type,
+  schema: Type[BaseModel],
+  itens: List[dict],
+  apos_atualizar: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+  padroes: Optional[dict] = None
+) -> BulkResponse:
+  """
+  Valida cada item com o schema de criação e grava todos em um único bulk_write não ordenado.
+  Itens sem "id" são inseridos; itens com "id" substituem os campos do documento (upsert).
+  Os padroes (campos que o create preenche e o schema não tem) só entram quando o documento é criado.
+  Um item inválido ou com erro de escrita não impede a gravação dos demais.
+  """
+  padroes = {**(padroes or {}), "ordens_count": 0}
+  if len(itens) > BULK_MAX_ITEMS:
+    raise BadRequestException(f"O lote pode ter no máximo {BULK_MAX_ITEMS} itens.")
+
+  resultados = [BulkItemResult(indice=indice, status="erro") for indice in range(len(itens))]
+  operacoes = []
+  # Posição de cada operação do bulk_write no lote recebido
+  indices = []
+  atualizados = []
+
+  for indice, item in enumerate(itens):
+    id = item.get("id")
+    if id is not None and not ObjectId.is_valid(str(id)):
+      resultados[indice].erro = f"id {id} inválido."
+      continue
+
+    try:
+      dados = schema.model_validate({campo: valor for campo, valor in item.items() if campo != "id"})
+    except ValidationError as e:
+      resultados[indice].erro = _mensagem_validacao(e)
+      continue
+
+    # Passa pelo model para aplicar os mesmos defaults do create; o contador de ordens nunca vem do lote
+    documento = model(**{**padroes, **dados.model_dump()}).model_dump(exclude={"id", "revision_id", *padroes})
+
+    if id is None:
+      documento["_id"] = ObjectId()
+      operacoes.append(InsertOne({**documento, **padroes}))
+      resultados[indice].id = str(documento["_id"])
+      resultados[indice].status = "criado"
+    else:
+      operacoes.append(UpdateOne({"_id": ObjectId(str(id))}, {"$set": documento, "$setOnInsert": padroes}, upsert=True))
+      resultados[indice].id = str(id)
+      resultados[indice].status = "atualizado"
+      atualizados.append({"_id": ObjectId(str(id)), **documento})
+    indices.append(indice)
+
+  if operacoes:
+    ids_com_erro = set()
+    try:
+      result = await model.get_motor_collection().bulk_write(operacoes, ordered=False)
+      upserts = list(result.upserted_ids)
+    except BulkWriteError as e:
+      upserts = [upsert["index"] for upsert in e.details.get("upserted", [])]
+      for erro in e.details.get("writeErrors", []):
+        indice = indices[erro["index"]]
+        resultados[indice].status = "erro"
+        resultados[indice].erro = erro.get("errmsg")
+        ids_com_erro.add(resultados[indice].id)
+    # Upsert de um id que não existia: o documento foi criado, não atualizado
+    for operacao in upserts:
+      resultados[indices[operacao]].status = "criado"
+    atualizados = [documento for documento in atualizados if str(documento["_id"]) not in ids_com_erro]
+
+  for documento in atualizados:
+    catalogo_cache.invalidar(model, documento["_id"])
+  if atualizados and apos_atualizar:
+    await apos_atualizar(atualizados)
+
+  erros = sum(1 for resultado in resultados if resultado.status == "erro")
+  return BulkResponse(
+    total=len(itens),
+    sucesso=len(itens) - erros,
+    erros=erros,
+    resultados=resultados
+  )
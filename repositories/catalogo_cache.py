@@ -0,0 +1,93 @@
+import os
+from typing import Dict, Iterable, Optional, Type
+
+from bson import ObjectId
+
+from models.models import Cliente, Mecanico, Peca, Servico
+from utils.batch_loader import BatchLoader
+from utils.cache import MISSING, LRUTTLCache
+
+# Cache de leitura para os dados de referência usados pelas ordens de serviço.
+# Cada repositório invalida a entrada ao atualizar/excluir; em outros workers a entrada vale até o TTL.
+CACHE_MAX_ITEMS = int(os.getenv("CATALOGO_CACHE_MAX_ITEMS", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("CATALOGO_CACHE_TTL_SECONDS", "60"))
+LOADER_MAX_BATCH = int(os.getenv("CATALOGO_LOADER_MAX_BATCH", "500"))
+
+caches: Dict[str, LRUTTLCache] = {
+  model.__name__: LRUTTLCache(CACHE_MAX_ITEMS, CACHE_TTL_SECONDS)
+  for model in [Cliente, Mecanico, Peca, Servico]
+}
+
+def _carregador(model: Type):
+  async def carregar(ids):
+    documentos = await model.find({"_id": {"$in": [ObjectId(id) for id in ids]}}).to_list()
+    return {str(documento.id): documento for documento in documentos}
+  return carregar
+
+# Os misses do cache passam pelo loader: buscas pelo mesmo id ou por ids da mesma coleção feitas
+# ao mesmo tempo por requisições diferentes viram uma única consulta $in
+loaders: Dict[str, BatchLoader] = {
+  model.__name__: BatchLoader(_carregador(model), LOADER_MAX_BATCH)
+  for model in [Cliente, Mecanico, Peca, Servico]
+}
+
+def _cache(model: Type) -> LRUTTLCache:
+  return caches[model.__name__]
+
+def _chave(id) -> str:
+  """Hex minúsculo do id: a mesma forma das chaves devolvidas pelo loader (str(ObjectId))."""
+  return str(ObjectId(str(id)))
+
+async def obter(model: Type, id) -> Optional[object]:
+  """Busca o documento pelo id passando pelo cache. Os documentos devolvidos são compartilhados: não altere."""
+  if not ObjectId.is_valid(str(id)):
+    return None
+
+  chave = _chave(id)
+  documento = _cache(model).get(chave)
+  if documento is not MISSING:
+    return documento
+
+  # Uma invalidação durante a carga (update/delete concorrente) impede o set do documento lido antes dela
+  geracao = _cache(model).geracao
+  documento = await loaders[model.__name__].load(chave)
+  if documento:
+    _cache(model).set(chave, documento, geracao=geracao)
+  return documento
+
+async def obter_varios(model: Type, ids: Iterable) -> Dict[str, object]:
+  """
+  Busca vários documentos pelo id; os que não estão no cache vêm pelo loader, em uma única consulta $in.
+  O resultado é indexado pelo id em hex minúsculo (str(ObjectId)); ids inválidos ficam de fora.
+  """
+  encontrados = {}
+  faltando = []
+  for id in ids:
+    if not ObjectId.is_valid(str(id)):
+      continue
+    chave = _chave(id)
+    documento = _cache(model).get(chave)
+    if documento is MISSING:
+      faltando.append(chave)
+    else:
+      encontrados[chave] = documento
+
+  if faltando:
+    geracao = _cache(model).geracao
+    for id, documento in (await loaders[model.__name__].load_many(faltando)).items():
+      if documento:
+        _cache(model).set(id, documento, geracao=geracao)
+        encontrados[id] = documento
+
+  return encontrados
+
+def invalidar(model: Type, id):
+  if ObjectId.is_valid(str(id)):
+    _cache(model).invalidate(_chave(id))
+    loaders[model.__name__].esquecer(_chave(id))
+
+def estatisticas() -> dict:
+  return {nome: cache.stats() for nome, cache in caches.items()}
+
+def estatisticas_loaders() -> dict:
+  return {nome: loader.stats() for nome, loader in loaders.items()}
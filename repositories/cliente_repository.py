@@ -1,7 +1,12 @@
+from typing import List, Optional
+
 from exceptions.exceptions import BadRequestException, NotFoundException
 from models.models import Cliente, OrdemServico
 from schemas.cliente_schema import ClienteCreate, ClientePaginatedResponse, ClienteUpdate
-from schemas.util_schema import Pagination
+from repositories import catalogo_cache, referencias
+from repositories.bulk import bulk_upsert, sincronizar_nomes_busca
+from repositories.pagination import paginate_by_id
+from utils.text import nome_completo_busca
 
 class ClienteRepository:
   
@@ -10,21 +15,19 @@ class ClienteRepository:
     await cliente.insert()
     return cliente.to_dict()
   
-  async def list_clientes(self, page: int = 1, size: int = 10):
-    total = await Cliente.find_all().count()
-    clientes = await Cliente.find_all().skip((page - 1) * size).limit(size).to_list()
+  async def bulk_clientes(self, itens: List[dict]):
+    return await bulk_upsert(Cliente, ClienteCreate, itens, apos_atualizar=sincronizar_nomes_busca("cliente"))
+  
+  async def list_clientes(self, page: int = 1, size: int = 10, cursor: Optional[str] = None, include_total: bool = True):
+    clientes, pagination = await paginate_by_id(Cliente, page, size, cursor, include_total)
     
     return ClientePaginatedResponse(
       clientes=[cliente.to_dict() for cliente in clientes],
-      pagination=Pagination(
-        page=page,
-        size=size,
-        total=total
-      )
+      pagination=pagination
     )
     
   async def get(self, id: str):
-    cliente = await Cliente.get(id)
+    cliente = await catalogo_cache.obter(Cliente, id)
     if not cliente:
       raise NotFoundException(f"Cliente com id {id} não encontrado.")
         
@@ -34,21 +37,27 @@ class ClienteRepository:
     cliente = await Cliente.get(id)
     
     if cliente:
+      nome_anterior = nome_completo_busca(cliente.nome, cliente.sobrenome)
       update_data = data.model_dump(exclude_unset=True)
       await cliente.set(update_data)
+      catalogo_cache.invalidar(Cliente, cliente.id)
+
+      # Mantém a cópia do nome usada na busca de ordens de serviço
+      nome_busca = nome_completo_busca(cliente.nome, cliente.sobrenome)
+      if nome_busca != nome_anterior:
+        await OrdemServico.find({"cliente.$id": cliente.id}).update({"$set": {"cliente_nome_busca": nome_busca}})
     else:
       raise NotFoundException(f"Cliente com id {id} não encontrado.")
     
     return cliente.to_dict()
 
   async def delete(self, id: str):
-    cliente = await Cliente.get(id)
-    if not cliente:
+    # O contador de ordens é conferido no próprio delete_one
+    excluido = await referencias.excluir_sem_referencias(Cliente, id)
+    if excluido is None:
       raise NotFoundException(f"Cliente com id {id} não encontrado.")
-      
-    cliente_is_related = await OrdemServico.find_one({"cliente": cliente.id})
-    if cliente_is_related:
-      raise BadRequestException(f"Cliente com id {id} está relacionado a uma ordem de serviço.")  
+    if not excluido:
+      raise BadRequestException(f"Cliente com id {id} está relacionado a uma ordem de serviço.")
     
-    await cliente.delete()
+    catalogo_cache.invalidar(Cliente, id)
     return {"message": "Cliente excluído com sucesso"}
\ No newline at end of file
@@ -0,0 +1,39 @@
+import os
+from typing import Optional, Tuple, Type
+
+from bson import json_util
+
+from db.db import leitura
+
+from utils.cache import MISSING, LRUTTLCache
+
+# Totais das listagens paginadas. Sem filtro usa a contagem estimada pelos metadados da coleção;
+# com filtro guarda o count_documents por um tempo curto, por coleção + filtro.
+COUNT_CACHE_MAX_ITEMS = int(os.getenv("COUNT_CACHE_MAX_ITEMS", "1000"))
+COUNT_CACHE_TTL_SECONDS = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "30"))
+
+cache = LRUTTLCache(COUNT_CACHE_MAX_ITEMS, COUNT_CACHE_TTL_SECONDS)
+
+async def contar(model: Type, filtro: dict, include_total: bool = True) -> Tuple[Optional[int], bool]:
+  """
+  Devolve (total, exato). "exato" só é verdadeiro quando o total acabou de ser contado;
+  estimativas e valores do cache podem estar defasados. Com include_total=False não conta nada.
+  """
+  if not include_total:
+    return None, False
+
+  colecao = leitura(model)
+  if not filtro:
+    return await colecao.estimated_document_count(), False
+
+  chave = (model.__name__, json_util.dumps(filtro, sort_keys=True))
+  total = cache.get(chave)
+  if total is not MISSING:
+    return total, False
+
+  total = await colecao.count_documents(filtro)
+  cache.set(chave, total)
+  return total, True
+
+def estatisticas() -> dict:
+  return cache.stats()
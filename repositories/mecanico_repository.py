@@ -1,7 +1,15 @@
+from datetime import datetime
+from typing import List, Optional
+
+from db.db import leitura
 from exceptions.exceptions import BadRequestException, NotFoundException
-from models.models import Mecanico, OrdemServico
+from models.models import Mecanico, MecanicoEstatisticaDiaria, OrdemServico
 from schemas.mecanico_schema import MecanicoCreate, MecanicoPaginatedResponse, MecanicoUpdate
-from schemas.util_schema import Pagination
+from repositories import catalogo_cache, referencias
+from repositories.bulk import bulk_upsert, sincronizar_nomes_busca
+from repositories.mecanico_stats import report_pipeline
+from repositories.pagination import paginate_by_id
+from utils.text import nome_completo_busca
 
 class MecanicoRepository:
   
@@ -10,21 +18,19 @@ class MecanicoRepository:
     await mecanico.insert()
     return mecanico.to_dict()
   
-  async def list_mecanicos(self, page: int = 1, size: int = 10):
-    total = await Mecanico.find_all().count()
-    mecanicos = await Mecanico.find_all().skip((page - 1) * size).limit(size).to_list()
+  async def bulk_mecanicos(self, itens: List[dict]):
+    return await bulk_upsert(Mecanico, MecanicoCreate, itens, apos_atualizar=sincronizar_nomes_busca("mecanico"))
+  
+  async def list_mecanicos(self, page: int = 1, size: int = 10, cursor: Optional[str] = None, include_total: bool = True):
+    mecanicos, pagination = await paginate_by_id(Mecanico, page, size, cursor, include_total)
     
     return MecanicoPaginatedResponse(
       mecanicos=[mecanico.to_dict() for mecanico in mecanicos],
-      pagination=Pagination(
-        page=page,
-        size=size,
-        total=total
-      )
+      pagination=pagination
     )
     
   async def get(self, id: str):
-    mecanico = await Mecanico.get(id)
+    mecanico = await catalogo_cache.obter(Mecanico, id)
     if not mecanico:
       raise NotFoundException(f"Mecanico com id {id} não encontrado.")
         
@@ -34,21 +40,31 @@ class MecanicoRepository:
     mecanico = await Mecanico.get(id)
     
     if mecanico:
+      nome_anterior = nome_completo_busca(mecanico.nome, mecanico.sobrenome)
       update_data = data.model_dump(exclude_unset=True)
       await mecanico.set(update_data)
+      catalogo_cache.invalidar(Mecanico, mecanico.id)
+
+      # Mantém a cópia do nome usada na busca de ordens de serviço
+      nome_busca = nome_completo_busca(mecanico.nome, mecanico.sobrenome)
+      if nome_busca != nome_anterior:
+        await OrdemServico.find({"mecanico.$id": mecanico.id}).update({"$set": {"mecanico_nome_busca": nome_busca}})
     else:
       raise NotFoundException(f"Mecanico com id {id} não encontrado.")
     
     return mecanico.to_dict()
 
   async def delete(self, id: str):
-    mecanico = await Mecanico.get(id)
-    if not mecanico:
+    # O contador de ordens é conferido no próprio delete_one
+    excluido = await referencias.excluir_sem_referencias(Mecanico, id)
+    if excluido is None:
       raise NotFoundException(f"Mecanico com id {id} não encontrado.")
-      
-    mecanico_is_related = await OrdemServico.find_one({"mecanico": mecanico.id})
-    if mecanico_is_related:
-      raise BadRequestException(f"Mecanico com id {id} está relacionado a uma ordem de serviço.")  
+    if not excluido:
+      raise BadRequestException(f"Mecanico com id {id} está relacionado a uma ordem de serviço.")
     
-    await mecanico.delete()
-    return {"message": "Mecanico excluído com sucesso"}
\ No newline at end of file
+    catalogo_cache.invalidar(Mecanico, id)
+    return {"message": "Mecanico excluído com sucesso"}
+
+  async def report(self, data_inicio: datetime, data_fim: datetime):
+    # Soma os buckets diários em vez de agrupar as ordens do período
+    return await leitura(MecanicoEstatisticaDiaria).aggregate(report_pipeline(data_inicio, data_fim)).to_list(None)
\ No newline at end of file
@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from typing import List
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from models.models import MecanicoEstatisticaDiaria, OrdemServico
+
+# Buckets diários (UTC) de ordens abertas por mecânico, usados pelo relatório de mecânicos.
+# São mantidos com $inc a cada criação/alteração/exclusão de ordem; reconstruir() refaz tudo a partir das ordens.
+
+def dia_de(data: datetime) -> datetime:
+  """Início do dia (UTC) da data, no mesmo formato em que o Mongo devolve datas (sem tzinfo)."""
+  if data.tzinfo is not None:
+    data = data.astimezone(timezone.utc).replace(tzinfo=None)
+  return datetime(data.year, data.month, data.day)
+
+def op_contar(mecanico_id: ObjectId, data_abertura: datetime, quantidade: int):
+  """(filtro, update) que soma "quantidade" ao bucket do mecânico no dia da abertura."""
+  return (
+    {"dia": dia_de(data_abertura), "mecanico_id": mecanico_id},
+    {"$inc": {"total_ordens": quantidade}}
+  )
+
+async def contar(mecanico_id: ObjectId, data_abertura: datetime, quantidade: int = 1):
+  filtro, update = op_contar(mecanico_id, data_abertura, quantidade)
+  await MecanicoEstatisticaDiaria.get_motor_collection().update_one(filtro, update, upsert=True)
+
+async def transferir(mecanico_anterior: ObjectId, mecanico_novo: ObjectId, data_abertura: datetime):
+  """Move uma ordem de um mecânico para outro no bucket do dia da abertura."""
+  if mecanico_anterior == mecanico_novo:
+    return
+
+  operacoes = [
+    UpdateOne(*op_contar(mecanico_anterior, data_abertura, -1), upsert=True),
+    UpdateOne(*op_contar(mecanico_novo, data_abertura, 1), upsert=True)
+  ]
+  await MecanicoEstatisticaDiaria.get_motor_collection().bulk_write(operacoes, ordered=False)
+
+def report_pipeline(data_inicio: datetime, data_fim: datetime) -> List[dict]:
+  """Soma os buckets do período por mecânico; mesmo formato do relatório calculado sobre as ordens."""
+  return [
+    # O filtro usa o dia de cada data: o relatório trabalha com dias inteiros
+    {"$match": {"dia": {"$gte": dia_de(data_inicio), "$lte": dia_de(data_fim)}}},
+    {"$group": {"_id": "$mecanico_id", "total_ordens": {"$sum": "$total_ordens"}}},
+    # Buckets zerados por exclusões não entram no relatório
+    {"$match": {"total_ordens": {"$gt": 0}}},
+    {"$sort": {"total_ordens": -1}},
+    # Os nomes são buscados uma vez por mecânico, depois da agregação
+    {"$lookup": {
+      "from": "mecanicos",
+      "localField": "_id",
+      "foreignField": "_id",
+      "pipeline": [{"$project": {"nome": 1, "sobrenome": 1}}],
+      "as": "mecanico_info"
+    }},
+    {"$unwind": "$mecanico_info"},
+    {"$project": {
+      "_id": 0,
+      "nome": "$mecanico_info.nome",
+      "sobrenome": "$mecanico_info.sobrenome",
+      "total_ordens": 1
+    }}
+  ]
+
+def rebuild_pipeline(reconstruido_em: datetime) -> List[dict]:
+  """Agrega as ordens em buckets diários e grava com $merge na coleção de estatísticas."""
+  return [
+    {"$group": {
+      "_id": {
+        "dia": {"$dateTrunc": {"date": "$data_abertura", "unit": "day"}},
+        "mecanico_id": "$mecanico.$id"
+      },
+      "total_ordens": {"$sum": 1}
+    }},
+    {"$project": {
+      "_id": 0,
+      "dia": "$_id.dia",
+      "mecanico_id": "$_id.mecanico_id",
+      "total_ordens": 1,
+      "reconstruido_em": {"$literal": reconstruido_em}
+    }},
+    {"$merge": {
+      "into": MecanicoEstatisticaDiaria.get_settings().name,
+      "on": ["dia", "mecanico_id"],
+      "whenMatched": "replace",
+      "whenNotMatched": "insert"
+    }}
+  ]
+
+async def reconstruir() -> int:
+  """
+  Recalcula todos os buckets a partir das ordens. Buckets que não vieram da agregação
+  (dias sem ordens) são removidos. Deve rodar com pouco tráfego: ordens criadas durante a
+  reconstrução podem ficar de fora até a próxima execução.
+  """
+  # Precisão de milissegundos, a mesma que o Mongo grava, para a comparação abaixo
+  agora = datetime.now(timezone.utc)
+  reconstruido_em = agora.replace(microsecond=agora.microsecond // 1000 * 1000)
+  await OrdemServico.get_motor_collection().aggregate(rebuild_pipeline(reconstruido_em)).to_list(None)
+
+  colecao = MecanicoEstatisticaDiaria.get_motor_collection()
+  await colecao.delete_many({"reconstruido_em": {"$ne": reconstruido_em}})
+  return await colecao.count_documents({})
@@ -1,34 +1,189 @@
+import asyncio
+import os
 from typing import Optional
 
 from bson import ObjectId
-from fastapi import HTTPException
+from pymongo import ReturnDocument
+from db.db import leitura
 from exceptions.exceptions import BadRequestException, NotFoundException
-from models.models import Cliente, Endereco, Mecanico, OrdemServico, Peca, PecasOrdemServico, Servico
+from models.models import Cliente, ItemPecaOrdemServico, ItemServicoOrdemServico, Mecanico, OrdemServico, Peca, Servico
 from datetime import datetime, timezone
 
+from repositories import catalogo_cache, contagem, mecanico_stats, referencias
 from schemas.cliente_schema import ClienteResponse
 from schemas.mecanico_schema import MecanicoResponse
-from schemas.ordem_servico_schema import OrdemServicoCreate, OrdemServicoFullResponse, OrdemServicoPaginatedResponse, OrdemServicoPartialResponse, OrdemServicoPecaResponse, OrdemServicoResponse, OrdemServicoServicoResponse, OrdemServicoUpdate
+from schemas.ordem_servico_schema import OrdemServicoCreate, OrdemServicoFullResponse, OrdemServicoItensBatch, OrdemServicoPaginatedResponse, OrdemServicoPartialResponse, OrdemServicoPecaResponse, OrdemServicoResponse, OrdemServicoServicoResponse, OrdemServicoUpdate
 from schemas.peca_schema import PecaResponse
 from schemas.servico_schema import ServicoResponse
 from schemas.util_schema import Pagination
+from utils.cursor import decode_cursor, encode_cursor
+from utils.text import nome_completo_busca, normalize_nome, prefix_regex
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Cada operação do lote de itens vira um estágio do pipeline de update (o MongoDB aceita até 1000)
+ITENS_MAX_OPERACOES = int(os.getenv("ORDEM_ITENS_MAX_OPERACOES", "200"))
+
+# Campos lidos do banco na exportação e colunas geradas (na mesma ordem do CSV)
+EXPORT_PROJECAO = {
+  "cliente": 1, "mecanico": 1, "data_abertura": 1, "data_conclusao": 1, "situacao": 1,
+  "valor": 1, "subtotal_servicos": 1, "subtotal_pecas": 1, "subtotal": 1
+}
+EXPORT_CAMPOS = [
+  "id", "cliente_id", "mecanico_id", "data_abertura", "data_conclusao", "situacao",
+  "valor", "subtotal_servicos", "subtotal_pecas", "subtotal"
+]
+
+# Campos necessários para montar ClienteResponse e MecanicoResponse na listagem
+CLIENTE_PROJECAO = {"nome": 1, "sobrenome": 1, "endereco": 1, "telefone": 1}
+MECANICO_PROJECAO = {"nome": 1, "sobrenome": 1, "telefone": 1, "email": 1}
+
+def _lookup_projetado(colecao: str, campo: str, projecao: dict):
+  """Substitui o DBRef do campo pelo documento relacionado, trazendo apenas os campos projetados."""
+  return [
+    {"$lookup": {
+      "from": colecao,
+      "localField": f"{campo}.$id",
+      "foreignField": "_id",
+      "pipeline": [{"$project": projecao}],
+      "as": campo
+    }},
+    {"$unwind": f"${campo}"}
+  ]
+
+def _ordem_id(id: str) -> ObjectId:
+  if not ObjectId.is_valid(id):
+    raise NotFoundException("Ordem de serviço não encontrada.")
+  return ObjectId(id)
+
+# Toda alteração de itens só se aplica a ordens que ainda não foram concluídas
+NAO_CONCLUIDA = {"$ne": "concluida"}
+
+def _somar_subtotais(servicos=0, pecas=0):
+  """Expressões de pipeline que somam aos subtotais (aceitam valores ou expressões)."""
+  return {
+    "subtotal_servicos": {"$add": [{"$ifNull": ["$subtotal_servicos", 0]}, servicos]},
+    "subtotal_pecas": {"$add": [{"$ifNull": ["$subtotal_pecas", 0]}, pecas]},
+    "subtotal": {"$add": [{"$ifNull": ["$subtotal", 0]}, servicos, pecas]}
+  }
+
+# Cada operação abaixo devolve (filtro, pipeline de update) para um único update_one; o lote de itens encadeia os pipelines
+
+def _op_add_servico(ordem_id: ObjectId, servico: Servico):
+  """O serviço entra como link e como item com o valor atual do catálogo, que é o somado ao subtotal."""
+  item = ItemServicoOrdemServico(servico_id=servico.id, valor=servico.valor).model_dump()
+  return (
+    {"_id": ordem_id, "situacao": NAO_CONCLUIDA, "servicos.$id": {"$ne": servico.id}},
+    [{"$set": {
+      **_somar_subtotais(servicos=servico.valor),
+      "servicos": {"$concatArrays": [{"$ifNull": ["$servicos", []]}, {"$literal": [servico.to_ref()]}]},
+      "servicos_itens": {"$concatArrays": [{"$ifNull": ["$servicos_itens", []]}, {"$literal": [item]}]}
+    }}]
+  )
+
+def _op_remove_servico(ordem_id: ObjectId, servico: Servico):
+  """
+  Subtrai o valor registrado na inclusão, não o atual do catálogo.
+  Ordens anteriores a servicos_itens não têm o valor registrado: nelas vale o do catálogo.
+  """
+  itens = {"$ifNull": ["$servicos_itens", []]}
+  removidos = {"$filter": {"input": itens, "cond": {"$eq": ["$$this.servico_id", servico.id]}}}
+  valor_removido = {"$cond": [
+    {"$gt": [{"$size": removidos}, 0]},
+    {"$sum": {"$map": {"input": removidos, "in": "$$this.valor"}}},
+    servico.valor
+  ]}
+
+  return (
+    {"_id": ordem_id, "situacao": NAO_CONCLUIDA, "servicos.$id": servico.id},
+    [{"$set": {
+      **_somar_subtotais(servicos={"$multiply": [valor_removido, -1]}),
+      "servicos": {"$filter": {"input": "$servicos", "cond": {"$ne": ["$$this", {"$literal": servico.to_ref()}]}}},
+      "servicos_itens": {"$filter": {"input": itens, "cond": {"$ne": ["$$this.servico_id", servico.id]}}}
+    }}]
+  )
+
+def _op_add_peca(ordem_id: ObjectId, peca: Peca, quantidade: int):
+  """
+  Se a peça já está na ordem, soma a quantidade e usa o valor registrado na inclusão;
+  senão, inclui um novo item com os dados atuais da peça.
+  """
+  pecas = {"$ifNull": ["$pecas", []]}
+  presente = {"$in": [peca.id, {"$map": {"input": pecas, "in": "$$this.peca_id"}}]}
+  valor_item = {"$cond": [
+    presente,
+    {"$arrayElemAt": [
+      {"$map": {"input": {"$filter": {"input": pecas, "cond": {"$eq": ["$$this.peca_id", peca.id]}}}, "in": "$$this.valor"}},
+      0
+    ]},
+    peca.valor
+  ]}
+  novo_item = ItemPecaOrdemServico(
+    peca_id=peca.id,
+    nome=peca.nome,
+    marca=peca.marca,
+    modelo=peca.modelo,
+    valor=peca.valor,
+    quantidade=quantidade
+  ).model_dump()
+
+  return (
+    {"_id": ordem_id, "situacao": NAO_CONCLUIDA},
+    [{"$set": {
+      **_somar_subtotais(pecas={"$multiply": [valor_item, quantidade]}),
+      "pecas": {"$cond": [
+        presente,
+        {"$map": {"input": pecas, "in": {"$cond": [
+          {"$eq": ["$$this.peca_id", peca.id]},
+          {**{campo: f"$$this.{campo}" for campo in ItemPecaOrdemServico.model_fields}, "quantidade": {"$add": ["$$this.quantidade", quantidade]}},
+          "$$this"
+        ]}}},
+        {"$concatArrays": [pecas, {"$literal": [novo_item]}]}
+      ]}
+    }}]
+  )
+
+def _op_remove_peca(ordem_id: ObjectId, peca_id: ObjectId):
+  removidos = {"$filter": {"input": "$pecas", "cond": {"$eq": ["$$this.peca_id", peca_id]}}}
+  valor_removido = {"$sum": {"$map": {"input": removidos, "in": {"$multiply": ["$$this.valor", "$$this.quantidade"]}}}}
+
+  return (
+    {"_id": ordem_id, "situacao": NAO_CONCLUIDA, "pecas.peca_id": peca_id},
+    [{"$set": {
+      **_somar_subtotais(pecas={"$multiply": [valor_removido, -1]}),
+      "pecas": {"$filter": {"input": "$pecas", "cond": {"$ne": ["$$this.peca_id", peca_id]}}}
+    }}]
+  )
+
+async def _falha_na_ordem(ordem_id: ObjectId, erro: Optional[Exception] = None):
+  """
+  Chamado só quando um update condicional não encontrou a ordem:
+  descobre o motivo para devolver 404 ou 400.
+  """
+  ordem_servico = await OrdemServico.get_motor_collection().find_one({"_id": ordem_id}, {"situacao": 1})
+  if not ordem_servico:
+    raise NotFoundException("Ordem de serviço não encontrada.")
+  if ordem_servico["situacao"] == "concluida":
+    raise BadRequestException("Ordem de serviço já foi concluida.")
+  raise erro or BadRequestException("Não foi possível alterar a ordem de serviço.")
 
 class OrdemServicoRepository:
 
   async def create(self, data: OrdemServicoCreate):
     # Verificar se o cliente existe
-    cliente = await Cliente.get(data.cliente_id)
+    cliente = await catalogo_cache.obter(Cliente, data.cliente_id)
     if not cliente:
       raise NotFoundException(f"Cliente com id {id} não encontrado.")
     
     # Verificar se o mecanico existe
-    mecanico = await Mecanico.get(data.mecanico_id)
+    mecanico = await catalogo_cache.obter(Mecanico, data.mecanico_id)
     if not mecanico:
       raise NotFoundException(f"Mecânico com id {id} não encontrado.")
           
     ordem_servico = OrdemServico(
       cliente=cliente.id, 
       mecanico=mecanico.id,
+      cliente_nome_busca=nome_completo_busca(cliente.nome, cliente.sobrenome),
+      mecanico_nome_busca=nome_completo_busca(mecanico.nome, mecanico.sobrenome),
       data_abertura = datetime.now(timezone.utc),
       situacao = "pendente",
       data_conclusao = None,
@@ -36,6 +191,11 @@ class OrdemServicoRepository:
     )
     
     await ordem_servico.insert()
+    await asyncio.gather(
+      mecanico_stats.contar(mecanico.id, ordem_servico.data_abertura),
+      referencias.incrementar(Cliente, cliente.id),
+      referencias.incrementar(Mecanico, mecanico.id)
+    )
     
     return OrdemServicoResponse(
       id=str(ordem_servico.id),
@@ -47,10 +207,8 @@ class OrdemServicoRepository:
       valor=ordem_servico.valor
     )
 
-  async def list(
+  def list_match(
     self,
-    page: int = 1,
-    size: int = 10,
     mecanico_id: Optional[str] = None,
     cliente_id: Optional[str] = None,
     nome_mecanico: Optional[str] = None,
@@ -58,79 +216,189 @@ class OrdemServicoRepository:
     data_abertura_inicio: Optional[datetime] = None,
     data_abertura_fim: Optional[datetime] = None,
   ):
-    query = {}
+    """Filtro das ordens usado pela listagem e pela exportação."""
+    match = {}
+
+    for campo, valor in (("mecanico_id", mecanico_id), ("cliente_id", cliente_id)):
+      if valor and not ObjectId.is_valid(valor):
+        raise BadRequestException(f"{campo} inválido.")
 
+    # Os links são gravados como DBRef, então os filtros por id usam o campo "$id"
     if mecanico_id:
-      query["mecanico._id"] = ObjectId(mecanico_id)
+      match["mecanico.$id"] = ObjectId(mecanico_id)
     if cliente_id:
-      query["cliente._id"] = ObjectId(cliente_id)
+      match["cliente.$id"] = ObjectId(cliente_id)
+    if data_abertura_inicio and data_abertura_fim:
+      match["data_abertura"] = {"$gte": data_abertura_inicio, "$lte": data_abertura_fim}
+
+    # Um nome que fica vazio depois de normalizado (só acentos ou espaços) viraria "^" e percorreria o índice inteiro
+    for campo, nome in (("nome_mecanico", nome_mecanico), ("nome_cliente", nome_cliente)):
+      if nome and not normalize_nome(nome):
+        raise BadRequestException(f"{campo} inválido: informe ao menos um caractere além de acentos e espaços.")
+
     if nome_mecanico:
-      query["mecanico.nome"] = {"$regex": nome_mecanico, "$options": "i"}
+      match["mecanico_nome_busca"] = prefix_regex(nome_mecanico)
     if nome_cliente:
-      query["cliente.nome"] = {"$regex": nome_cliente, "$options": "i"}
-    if data_abertura_inicio and data_abertura_fim:
-      query["data_abertura"] = {"$gte": data_abertura_inicio, "$lte": data_abertura_fim}
+      match["cliente_nome_busca"] = prefix_regex(nome_cliente)
+
+    return match
+
+  def list_pipeline(self, match: dict, page: int = 1, size: int = 10, cursor: Optional[str] = None):
+    """
+    Monta o pipeline da página da listagem: $match -> $sort -> cursor/$skip -> $limit -> lookups.
+    O filtro vem pronto de list_match (o mesmo usado na contagem, feita à parte).
+    """
+    # Ordenação estável por (data_abertura, _id), usada como chave do cursor
+    pipeline = [{"$match": match}, {"$sort": {"data_abertura": 1, "_id": 1}}]
 
-    total = await OrdemServico.find(query, fetch_links=True).count()
-    ordens = await OrdemServico.find(query, fetch_links=True).skip((page - 1) * size).limit(size).to_list()
+    if cursor:
+      ultima_data, ultimo_id = decode_cursor(cursor, datetime, ObjectId)
+      pipeline.append({"$match": {"$or": [
+        {"data_abertura": {"$gt": ultima_data}},
+        {"data_abertura": ultima_data, "_id": {"$gt": ultimo_id}}
+      ]}})
+    else:
+      pipeline.append({"$skip": (page - 1) * size})
+
+    # O lookup é feito só para os itens da página
+    pipeline += [
+      {"$limit": size + 1},
+      *_lookup_projetado("clientes", "cliente", CLIENTE_PROJECAO),
+      *_lookup_projetado("mecanicos", "mecanico", MECANICO_PROJECAO),
+    ]
+    pipeline.append({"$project": {
+      "data_abertura": 1,
+      "data_conclusao": 1,
+      "situacao": 1,
+      "valor": 1,
+      "cliente": 1,
+      "mecanico": 1
+    }})
+
+    return pipeline
+
+  async def list(
+    self,
+    page: int = 1,
+    size: int = 10,
+    mecanico_id: Optional[str] = None,
+    cliente_id: Optional[str] = None,
+    nome_mecanico: Optional[str] = None,
+    nome_cliente: Optional[str] = None,
+    data_abertura_inicio: Optional[datetime] = None,
+    data_abertura_fim: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+  ):
+    match = self.list_match(
+      mecanico_id=mecanico_id,
+      cliente_id=cliente_id,
+      nome_mecanico=nome_mecanico,
+      nome_cliente=nome_cliente,
+      data_abertura_inicio=data_abertura_inicio,
+      data_abertura_fim=data_abertura_fim
+    )
+    pipeline = self.list_pipeline(match, page=page, size=size, cursor=cursor)
+
+    # A página e o total (estimado, do cache ou contado) saem em paralelo
+    ordens, (total, total_exato) = await asyncio.gather(
+      leitura(OrdemServico).aggregate(pipeline).to_list(None),
+      contagem.contar(OrdemServico, match, include_total)
+    )
+    has_more = len(ordens) > size
+    ordens = ordens[:size]
 
     return OrdemServicoPaginatedResponse(
       ordens_servicos=[OrdemServicoPartialResponse(
-        id=str(ordem.id),
-        cliente=ordem.cliente.to_dict(),
-        mecanico=ordem.mecanico.to_dict(),
-        data_abertura=ordem.data_abertura,
-        data_conclusao=ordem.data_conclusao,
-        situacao=ordem.situacao,
-        valor=ordem.valor,
+        id=str(ordem["_id"]),
+        cliente={**ordem["cliente"], "id": str(ordem["cliente"]["_id"])},
+        mecanico={**ordem["mecanico"], "id": str(ordem["mecanico"]["_id"])},
+        data_abertura=ordem["data_abertura"],
+        data_conclusao=ordem.get("data_conclusao"),
+        situacao=ordem["situacao"],
+        valor=ordem.get("valor"),
       ) for ordem in ordens],
       pagination=Pagination(
-        page=page,
+        page=None if cursor else page,
         size=size,
-        total=total
+        total=total,
+        total_exato=total_exato,
+        next_cursor=encode_cursor(ordens[-1]["data_abertura"], ordens[-1]["_id"]) if has_more else None
       )
     )
     
+  async def export(self, match: dict):
+    """
+    Percorre as ordens filtradas direto do cursor do Motor, um lote por vez, devolvendo linhas planas.
+    O próximo lote só é buscado quando o anterior foi consumido, então a memória não cresce com o total.
+    O filtro vem pronto de list_match: validado antes de a resposta começar a ser enviada.
+    """
+    cursor = leitura(OrdemServico).find(match, projection=EXPORT_PROJECAO)
+    cursor = cursor.sort([("data_abertura", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+
+    try:
+      async for ordem in cursor:
+        yield {
+          "id": str(ordem["_id"]),
+          "cliente_id": str(ordem["cliente"].id),
+          "mecanico_id": str(ordem["mecanico"].id),
+          "data_abertura": ordem["data_abertura"],
+          "data_conclusao": ordem.get("data_conclusao"),
+          "situacao": ordem["situacao"],
+          "valor": ordem.get("valor"),
+          "subtotal_servicos": ordem.get("subtotal_servicos", 0),
+          "subtotal_pecas": ordem.get("subtotal_pecas", 0),
+          "subtotal": ordem.get("subtotal", 0),
+        }
+    finally:
+      # Cliente desconectado no meio da exportação: libera o cursor no servidor
+      await cursor.close()
+
   async def get(self, id: str):      
-    data = await OrdemServico.get(id, fetch_links=True)
+    # Sem fetch_links: cliente, mecânico e serviços vêm do cache do catálogo
+    data = await OrdemServico.get(id)
       
     if not data:
       raise NotFoundException("Ordem de serviço não encontrada.")      
+    
+    cliente, mecanico, servicos = await asyncio.gather(
+      catalogo_cache.obter(Cliente, data.cliente.ref.id),
+      catalogo_cache.obter(Mecanico, data.mecanico.ref.id),
+      catalogo_cache.obter_varios(Servico, [link.ref.id for link in data.servicos])
+    )
+    valores = {item.servico_id: item.valor for item in data.servicos_itens or []}
         
     return OrdemServicoFullResponse(
       id=str(data.id),
       cliente=ClienteResponse(
-        id=str(data.cliente.id), 
-        nome=data.cliente.nome, 
-        sobrenome=data.cliente.sobrenome,
-        endereco=Endereco(
-          cidade=data.cliente.endereco.cidade,
-          bairro=data.cliente.endereco.bairro,
-          logradouro=data.cliente.endereco.logradouro
-        ), 
-        telefone=data.cliente.telefone
+        id=str(cliente.id), 
+        nome=cliente.nome, 
+        sobrenome=cliente.sobrenome,
+        endereco=cliente.endereco.model_dump(), 
+        telefone=cliente.telefone
       ),
       mecanico=MecanicoResponse(
-        id=str(data.mecanico.id), 
-        nome=data.mecanico.nome, 
-        sobrenome=data.mecanico.sobrenome,
-        telefone=data.mecanico.telefone, 
-        email=data.mecanico.email
+        id=str(mecanico.id), 
+        nome=mecanico.nome, 
+        sobrenome=mecanico.sobrenome,
+        telefone=mecanico.telefone, 
+        email=mecanico.email
       ),
+      # Valor cobrado na ordem (registrado na inclusão) quando existe; senão, o do catálogo
       servicos=[
         OrdemServicoServicoResponse(
           id=str(s.id), 
           nome=s.nome, 
-          valor=s.valor, 
+          valor=valores.get(s.id, s.valor), 
           categoria=s.categoria
-        ) for s in data.servicos],
+        ) for s in (servicos.get(str(link.ref.id)) for link in data.servicos) if s],
       pecas=[
         OrdemServicoPecaResponse(
-          id=str(item.peca.id), 
-          nome=item.peca.nome, 
-          marca=item.peca.marca, 
-          modelo=item.peca.modelo, 
-          valor=item.peca.valor,
+          id=str(item.peca_id), 
+          nome=item.nome, 
+          marca=item.marca, 
+          modelo=item.modelo, 
+          valor=item.valor,
           quantidade=item.quantidade
         ) for item in data.pecas],
       data_abertura=data.data_abertura,
@@ -140,177 +408,241 @@ class OrdemServicoRepository:
     )
 
   async def update(self, id: str, data: OrdemServicoUpdate):
-    ordem_servico = await OrdemServico.get(id, fetch_links=True)
-    if not ordem_servico:
-      raise NotFoundException("Ordem de serviço não encontrada.")
+    ordem_id = _ordem_id(id)
     
-    if ordem_servico.situacao == "concluida":
-      raise BadRequestException("Ordem de serviço já foi concluida.")
-    
-    cliente = await Cliente.get(data.cliente_id)
+    cliente = await catalogo_cache.obter(Cliente, data.cliente_id)
     if not cliente:
       raise NotFoundException(f"Cliente com id {id} não encontrado.")
     
-    mecanico = await Mecanico.get(data.mecanico_id)
+    mecanico = await catalogo_cache.obter(Mecanico, data.mecanico_id)
     if not mecanico:
       raise NotFoundException(f"Mecânico com id {id} não encontrado.")
     
-    ordem_servico.cliente = cliente
-    ordem_servico.mecanico = mecanico
-    
-    await ordem_servico.save()
+    # Altera só os campos do cliente/mecânico, sem regravar itens e subtotais da ordem
+    ordem_servico = await OrdemServico.get_motor_collection().find_one_and_update(
+      {"_id": ordem_id, "situacao": NAO_CONCLUIDA},
+      {"$set": {
+        "cliente": cliente.to_ref(),
+        "mecanico": mecanico.to_ref(),
+        "cliente_nome_busca": nome_completo_busca(cliente.nome, cliente.sobrenome),
+        "mecanico_nome_busca": nome_completo_busca(mecanico.nome, mecanico.sobrenome)
+      }},
+      # O documento anterior informa o cliente e o mecânico antigos; os campos da resposta não mudam neste $set
+      projection={"cliente": 1, "mecanico": 1, "data_abertura": 1, "data_conclusao": 1, "situacao": 1, "valor": 1},
+      return_document=ReturnDocument.BEFORE
+    )
+    if not ordem_servico:
+      await _falha_na_ordem(ordem_id)
+
+    ajustes = referencias.deltas()
+    ajustes[Cliente][ordem_servico["cliente"].id] -= 1
+    ajustes[Cliente][cliente.id] += 1
+    ajustes[Mecanico][ordem_servico["mecanico"].id] -= 1
+    ajustes[Mecanico][mecanico.id] += 1
+    await asyncio.gather(
+      mecanico_stats.transferir(ordem_servico["mecanico"].id, mecanico.id, ordem_servico["data_abertura"]),
+      referencias.ajustar(ajustes)
+    )
     
     return OrdemServicoResponse(
-      id=str(ordem_servico.id),
+      id=str(ordem_servico["_id"]),
       cliente_id=str(cliente.id),
       mecanico_id=str(mecanico.id),
-      data_abertura=ordem_servico.data_abertura,
-      data_conclusao=ordem_servico.data_conclusao,
-      situacao=ordem_servico.situacao,
-      valor=ordem_servico.valor
+      data_abertura=ordem_servico["data_abertura"],
+      data_conclusao=ordem_servico.get("data_conclusao"),
+      situacao=ordem_servico["situacao"],
+      valor=ordem_servico.get("valor")
     )
       
   async def delete(self, id: str):
-    ordem_servico = await OrdemServico.get(id)
+    ordem_servico = await OrdemServico.get_motor_collection().find_one_and_delete(
+      {"_id": _ordem_id(id)},
+      projection={"cliente": 1, "mecanico": 1, "servicos": 1, "pecas.peca_id": 1, "data_abertura": 1}
+    )
     if ordem_servico:
-      await ordem_servico.delete()
+      await asyncio.gather(
+        mecanico_stats.contar(ordem_servico["mecanico"].id, ordem_servico["data_abertura"], -1),
+        referencias.ajustar(referencias.referencias_da_ordem(ordem_servico, -1))
+      )
       return {"message": "ordem de Serviço excluída com sucesso"}
     else:
       raise NotFoundException("Ordem de serviço não encontrada.")
 
   async def conclude(self, id: str):
-    ordem_servico = await OrdemServico.get(id)
-    
-    if not ordem_servico:
-      raise NotFoundException("Ordem de serviço não encontrada.")
-    
-    if ordem_servico.situacao == "concluida":
-      raise BadRequestException("Ordem de serviço já foi concluida.")
-    
-    pipeline = [
-      {"$match": {"_id": id}},
-      {"$lookup": {
-        "from": "servicos",
-        "localField": "servicos",
-        "foreignField": "_id",
-        "as": "servicos_info"
-      }},
-      {"$unwind": "$pecas"},  # Desestrutura a lista de peças para processar uma por uma
-      {"$lookup": {
-        "from": "pecas",
-        "localField": "pecas.peca",
-        "foreignField": "_id",
-        "as": "peca_info"
-      }},
-      {"$unwind": "$peca_info"},
-      {"$project": {
-        "total_servicos": {"$sum": "$servicos_info.valor"},
-        "total_pecas": {"$sum": {"$multiply": ["$peca_info.valor", "$pecas.quantidade"]}}
-      }},
-      {"$group": {
-        "_id": "$_id",
-        "valor_total": {"$sum": ["$total_servicos", "$total_pecas"]}
-      }}
-    ]
-
-    result = await OrdemServico.aggregate(pipeline).to_list()
-    if not result:
-      raise HTTPException(status_code=500, detail="Erro ao calcular total")
-
-    valor_total = result[0]["valor_total"]
-
-    # Atualiza a ordem no banco
-    await OrdemServico.find_one({"_id": id}).update({
-      "$set": {
+    # O valor final vem do subtotal mantido pelas operações de itens, sem consultar outras coleções
+    ordem_servico = await OrdemServico.get_motor_collection().find_one_and_update(
+      {"_id": _ordem_id(id), "situacao": NAO_CONCLUIDA},
+      [{"$set": {
         "situacao": "concluida",
         "data_conclusao": datetime.now(timezone.utc),
-        "valor": valor_total
-      }
-    })
+        "valor": {"$round": [{"$ifNull": ["$subtotal", 0]}, 2]}
+      }}],
+      projection={"valor": 1},
+      return_document=ReturnDocument.AFTER
+    )
+
+    if not ordem_servico:
+      await _falha_na_ordem(_ordem_id(id))
+
+    valor_total = ordem_servico["valor"]
 
     return { "message": "Ordem de serviço concluída com sucesso", "valor_total": valor_total }
 
   async def remove_servico(self, id: str, servico_id: str):
-    ordem_servico = await OrdemServico.get(id, fetch_links=True)
-    if not ordem_servico:
-      raise NotFoundException("Ordem de serviço não encontrada.")
-    
-    if ordem_servico.situacao == "concluida":
-      raise BadRequestException("Ordem de serviço já foi concluida.")
-    
-    servico = await Servico.get(servico_id)
+    ordem_id = _ordem_id(id)
+    servico = await catalogo_cache.obter(Servico, servico_id)
     if not servico:
       raise NotFoundException("Serviço não encontrado.")
     
-    # Remove o serviço pelo ID
-    ordem_servico.servicos = [s for s in ordem_servico.servicos if str(s.id) != servico_id]
-    await ordem_servico.save()
+    result = await OrdemServico.get_motor_collection().update_one(*_op_remove_servico(ordem_id, servico))
+    if not result.matched_count:
+      await _falha_na_ordem(ordem_id, NotFoundException("Serviço não encontrado na ordem de serviço."))
+    await referencias.incrementar(Servico, servico.id, -1)
     
     return { "message": "Serviço removido da ordem de serviço." }
 
   async def add_servico(self, id: str, servico_id: str):
-    ordem_servico = await OrdemServico.get(id, fetch_links=True)
-    if not ordem_servico:
-      raise NotFoundException("Ordem de serviço não encontrada.")
-    
-    if ordem_servico.situacao == "concluida":
-      raise BadRequestException("Ordem de serviço já foi concluida.")
-    
-    servico = await Servico.get(servico_id)
+    ordem_id = _ordem_id(id)
+    servico = await catalogo_cache.obter(Servico, servico_id)
     if not servico:
       raise NotFoundException("Serviço não encontrado.")
     
-    # Verifica se o serviço já existe na ordem
-    servico_existente = next((s for s in ordem_servico.servicos if str(s.id) == servico_id), None)
+    result = await OrdemServico.get_motor_collection().update_one(*_op_add_servico(ordem_id, servico))
+    if not result.matched_count:
+      await _falha_na_ordem(ordem_id, BadRequestException("Serviço já existe na ordem de serviço"))
+    await referencias.incrementar(Servico, servico.id)
     
-    if servico_existente:
-      raise BadRequestException("Serviço já existe na ordem de serviço")
-    else:
-      ordem_servico.servicos.append(servico)
-      await ordem_servico.save()
-      return { "message": "Serviço adicionado na ordem de serviço." }
+    return { "message": "Serviço adicionado na ordem de serviço." }
     
   async def add_peca(self, id: str, data: any):
-    ordem_servico = await OrdemServico.get(id, fetch_links=True)
-    if not ordem_servico:
-      raise NotFoundException("Ordem de serviço não encontrada.")
-    
-    if ordem_servico.situacao == "concluida":
-      raise BadRequestException("Ordem de serviço já foi concluida.")
-    
-    peca = await Peca.get(data.peca_id)
+    ordem_id = _ordem_id(id)
+    peca = await catalogo_cache.obter(Peca, data.peca_id)
     if not peca:
       raise NotFoundException("Peça não encontrada.")
     
-    # Verifica se a peça já existe na ordem
-    peca_existente = next((item for item in ordem_servico.pecas if str(item.peca.id) == data.peca_id), None)
-    
-    if peca_existente:
-      peca_existente.quantidade += data.quantidade
-      ordem_servico_peca = await PecasOrdemServico.get(peca_existente.id, fetch_links=True)
-      ordem_servico_peca.quantidade = peca_existente.quantidade
-      await ordem_servico_peca.save()
-    else:
-      ordem_servico_peca = PecasOrdemServico(peca=peca.id, quantidade=data.quantidade)
-      await ordem_servico_peca.insert()
-      ordem_servico.pecas.append(ordem_servico_peca)
-      await ordem_servico.save()
+    # O documento anterior diz se a peça já estava na ordem (aí só a quantidade muda)
+    anterior = await OrdemServico.get_motor_collection().find_one_and_update(
+      *_op_add_peca(ordem_id, peca, data.quantidade),
+      projection={"pecas.peca_id": 1},
+      return_document=ReturnDocument.BEFORE
+    )
+    if not anterior:
+      await _falha_na_ordem(ordem_id)
+    if all(item["peca_id"] != peca.id for item in anterior.get("pecas") or []):
+      await referencias.incrementar(Peca, peca.id)
     
     return { "message": "Peça adicionada na ordem de serviço." }
 
   async def remove_peca(self, id: str, peca_id: str):
-    ordem_servico = await OrdemServico.get(id, fetch_links=True)
-    if not ordem_servico:
-      raise NotFoundException("Ordem de serviço não encontrada.")
-    
-    if ordem_servico.situacao == "concluida":
-      raise BadRequestException("Ordem de serviço já foi concluida.")
-    
-    peca = await Peca.get(peca_id)
-    if not peca:
+    ordem_id = _ordem_id(id)
+    if not ObjectId.is_valid(peca_id):
       raise NotFoundException("Peça não encontrada.")
     
-    ordem_servico.pecas = [item for item in ordem_servico.pecas if str(item.peca.id) != peca_id]
-    await ordem_servico.save()
+    result = await OrdemServico.get_motor_collection().update_one(*_op_remove_peca(ordem_id, ObjectId(peca_id)))
+    if not result.matched_count:
+      await _falha_na_ordem(ordem_id, NotFoundException("Peça não encontrada."))
+    await referencias.incrementar(Peca, ObjectId(peca_id), -1)
     
-    return { "message": "Peça removida da ordem de serviço." }
\ No newline at end of file
+    return { "message": "Peça removida da ordem de serviço." }
+
+  async def aplicar_itens(self, id: str, data: OrdemServicoItensBatch):
+    """
+    Aplica várias inclusões/remoções de peças e serviços de uma vez: as peças e os serviços são
+    buscados com um $in por coleção, a ordem é lida uma vez para validar tudo antes de gravar e
+    as alterações vão em um único update (atômico no documento), encadeando os pipelines das
+    mesmas operações dos endpoints unitários.
+    """
+    ordem_id = _ordem_id(id)
+    if not data.operacoes:
+      raise BadRequestException("Nenhuma operação informada.")
+    if len(data.operacoes) > ITENS_MAX_OPERACOES:
+      raise BadRequestException(f"O lote pode ter no máximo {ITENS_MAX_OPERACOES} operações.")
+
+    for operacao in data.operacoes:
+      if not ObjectId.is_valid(operacao.id):
+        raise NotFoundException(f"{'Peça' if operacao.tipo == 'peca' else 'Serviço'} com id {operacao.id} não encontrado.")
+      # Hex minúsculo, como str(ObjectId) dos itens lidos da ordem e das chaves do cache
+      operacao.id = str(ObjectId(operacao.id))
+      if operacao.acao == "adicionar" and operacao.tipo == "peca" and operacao.quantidade < 1:
+        raise BadRequestException("Quantidade deve ser maior que zero.")
+
+    pecas_ids = {operacao.id for operacao in data.operacoes if operacao.tipo == "peca" and operacao.acao == "adicionar"}
+    servicos_ids = {operacao.id for operacao in data.operacoes if operacao.tipo == "servico"}
+
+    pecas, servicos, ordem = await asyncio.gather(
+      catalogo_cache.obter_varios(Peca, pecas_ids),
+      catalogo_cache.obter_varios(Servico, servicos_ids),
+      OrdemServico.get_motor_collection().find_one(
+        {"_id": ordem_id},
+        projection={"situacao": 1, "servicos": 1, "pecas.peca_id": 1}
+      )
+    )
+
+    faltando = [f"peça {peca_id}" for peca_id in pecas_ids if peca_id not in pecas]
+    faltando += [f"serviço {servico_id}" for servico_id in servicos_ids if servico_id not in servicos]
+    if faltando:
+      raise NotFoundException(f"Não encontrados: {', '.join(faltando)}.")
+
+    if not ordem:
+      raise NotFoundException("Ordem de serviço não encontrada.")
+    if ordem["situacao"] == "concluida":
+      raise BadRequestException("Ordem de serviço já concluída.")
+
+    # Simula as operações sobre os itens atuais para rejeitar o lote inteiro antes de gravar
+    servicos_na_ordem = {str(ref.id) for ref in ordem.get("servicos") or []}
+    pecas_na_ordem = {str(item["peca_id"]) for item in ordem.get("pecas") or []}
+    servicos_antes, pecas_antes = set(servicos_na_ordem), set(pecas_na_ordem)
+    estagios = []
+    for operacao in data.operacoes:
+      if operacao.tipo == "servico":
+        servico = servicos[operacao.id]
+        if operacao.acao == "adicionar":
+          if operacao.id in servicos_na_ordem:
+            raise BadRequestException(f"Serviço {operacao.id} já existe na ordem de serviço")
+          servicos_na_ordem.add(operacao.id)
+          _, update = _op_add_servico(ordem_id, servico)
+        else:
+          if operacao.id not in servicos_na_ordem:
+            raise NotFoundException(f"Serviço {operacao.id} não encontrado na ordem de serviço.")
+          servicos_na_ordem.discard(operacao.id)
+          _, update = _op_remove_servico(ordem_id, servico)
+      else:
+        if operacao.acao == "adicionar":
+          pecas_na_ordem.add(operacao.id)
+          _, update = _op_add_peca(ordem_id, pecas[operacao.id], operacao.quantidade)
+        else:
+          if operacao.id not in pecas_na_ordem:
+            raise NotFoundException(f"Peça {operacao.id} não encontrada na ordem de serviço.")
+          pecas_na_ordem.discard(operacao.id)
+          _, update = _op_remove_peca(ordem_id, ObjectId(operacao.id))
+      estagios += update
+
+    # Um único update com os estágios de todas as operações em sequência: ou tudo é aplicado ou nada.
+    # O filtro exige os itens tocados no mesmo estado da leitura, que é o que a simulação validou.
+    condicoes = [{"_id": ordem_id, "situacao": NAO_CONCLUIDA}]
+    for campo, ids, antes in (
+      ("servicos.$id", {operacao.id for operacao in data.operacoes if operacao.tipo == "servico"}, servicos_antes),
+      ("pecas.peca_id", {operacao.id for operacao in data.operacoes if operacao.tipo == "peca"}, pecas_antes),
+    ):
+      presentes = [ObjectId(id) for id in ids if id in antes]
+      ausentes = [ObjectId(id) for id in ids if id not in antes]
+      if presentes:
+        condicoes.append({campo: {"$all": presentes}})
+      if ausentes:
+        condicoes.append({campo: {"$nin": ausentes}})
+
+    result = await OrdemServico.get_motor_collection().update_one({"$and": condicoes}, estagios)
+    if not result.matched_count:
+      await _falha_na_ordem(ordem_id, BadRequestException(
+        "A ordem de serviço foi alterada durante a operação; nenhum item foi alterado, tente novamente."
+      ))
+
+    # Contadores de referência: só o que entrou ou saiu da ordem no saldo do lote
+    ajustes = referencias.deltas()
+    for servico_id in servicos_na_ordem ^ servicos_antes:
+      ajustes[Servico][ObjectId(servico_id)] += 1 if servico_id in servicos_na_ordem else -1
+    for peca_id in pecas_na_ordem ^ pecas_antes:
+      ajustes[Peca][ObjectId(peca_id)] += 1 if peca_id in pecas_na_ordem else -1
+    await referencias.ajustar(ajustes)
+
+    return { "message": "Itens da ordem de serviço atualizados.", "operacoes": len(data.operacoes) }
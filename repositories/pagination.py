@@ -0,0 +1,38 @@
+import asyncio
+from typing import Optional
+
+from bson import ObjectId
+
+from db.db import leitura
+from repositories import contagem
+from utils.cursor import decode_cursor, encode_cursor
+from schemas.util_schema import Pagination
+
+async def paginate_by_id(model, page: int = 1, size: int = 10, cursor: Optional[str] = None, include_total: bool = True):
+  """
+  Pagina uma coleção ordenada por _id, lendo pela preferência de leitura das listagens (db.leitura).
+  Com cursor, busca a partir do último _id retornado (keyset), sem skip.
+  Sem cursor, mantém o modo page/size para clientes antigos.
+  O total da coleção é o estimado pelos metadados (ou nenhum, com include_total=False).
+  """
+  if cursor:
+    (ultimo_id,) = decode_cursor(cursor, ObjectId)
+    query = leitura(model).find({"_id": {"$gt": ultimo_id}})
+  else:
+    query = leitura(model).find({}).skip((page - 1) * size)
+
+  # Busca um item a mais para saber se existe próxima página; o total sai em paralelo
+  documentos, (total, total_exato) = await asyncio.gather(
+    query.sort("_id", 1).limit(size + 1).to_list(None),
+    contagem.contar(model, {}, include_total)
+  )
+  has_more = len(documentos) > size
+  itens = [model.model_validate(documento) for documento in documentos[:size]]
+
+  return itens, Pagination(
+    page=None if cursor else page,
+    size=size,
+    total=total,
+    total_exato=total_exato,
+    next_cursor=encode_cursor(itens[-1].id) if has_more else None
+  )
@@ -1,7 +1,11 @@
+from typing import List, Optional
+
 from exceptions.exceptions import BadRequestException, NotFoundException
-from models.models import Peca, OrdemServico
+from models.models import Peca
 from schemas.peca_schema import PecaCreate, PecaPaginatedResponse, PecaUpdate
-from schemas.util_schema import Pagination
+from repositories import catalogo_cache, referencias
+from repositories.bulk import bulk_upsert
+from repositories.pagination import paginate_by_id
 
 class PecaRepository:
   
@@ -10,21 +14,19 @@ class PecaRepository:
     await peca.insert()
     return peca.to_dict()
   
-  async def list_pecas(self, page: int = 1, size: int = 10):
-    total = await Peca.find_all().count()
-    pecas = await Peca.find_all().skip((page - 1) * size).limit(size).to_list()
+  async def bulk_pecas(self, itens: List[dict]):
+    return await bulk_upsert(Peca, PecaCreate, itens)
+  
+  async def list_pecas(self, page: int = 1, size: int = 10, cursor: Optional[str] = None, include_total: bool = True):
+    pecas, pagination = await paginate_by_id(Peca, page, size, cursor, include_total)
     
     return PecaPaginatedResponse(
       pecas=[peca.to_dict() for peca in pecas],
-      pagination=Pagination(
-        page=page,
-        size=size,
-        total=total
-      )
+      pagination=pagination
     )
     
   async def get(self, id: str):
-    peca = await Peca.get(id)
+    peca = await catalogo_cache.obter(Peca, id)
     if not peca:
       raise NotFoundException(f"Peça com id {id} não encontrada.")
         
@@ -36,19 +38,19 @@ class PecaRepository:
     if peca:
       update_data = data.model_dump(exclude_unset=True)
       await peca.set(update_data)
+      catalogo_cache.invalidar(Peca, peca.id)
     else:
       raise NotFoundException(f"Peça com id {id} não encontrada.")
     
     return peca.to_dict()
 
   async def delete(self, id: str):
-    peca = await Peca.get(id)
-    if not peca:
+    # O contador de ordens é conferido no próprio delete_one
+    excluido = await referencias.excluir_sem_referencias(Peca, id)
+    if excluido is None:
       raise NotFoundException(f"Peça com id {id} não encontrada.")
-      
-    peca_is_related = await OrdemServico.find_one({"pecas": peca.id})
-    if peca_is_related:
-      raise BadRequestException(f"Peça com id {id} está relacionada a uma ordem de serviço.")  
+    if not excluido:
+      raise BadRequestException(f"Peça com id {id} está relacionada a uma ordem de serviço.")
     
-    await peca.delete()
+    catalogo_cache.invalidar(Peca, id)
     return {"message": "Peça excluída com sucesso"}
\ No newline at end of file
@@ -0,0 +1,130 @@
+import asyncio
+from collections import Counter
+from typing import Dict, Optional, Type
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from models.models import Cliente, Mecanico, OrdemServico, Peca, Servico
+
+# Contador "ordens_count" de cada documento do catálogo: em quantas ordens de serviço ele aparece.
+# É ajustado com $inc sempre que uma ordem ganha ou perde a referência e é o que as exclusões
+# conferem. Não é transacional com a ordem: scripts/recount_ordens_count refaz a contagem.
+
+# Só o contador gravado e zerado libera a exclusão. Documentos sem o campo (anteriores ao contador)
+# têm contagem desconhecida: as referências são contadas nas ordens e o contador é gravado antes
+SEM_REFERENCIAS = {"$lte": 0}
+
+def deltas() -> Dict[Type, Counter]:
+  """Acumulador de ajustes: {model: Counter({id: delta})}."""
+  return {model: Counter() for model in [Cliente, Mecanico, Peca, Servico]}
+
+async def ajustar(ajustes: Dict[Type, Counter]):
+  """Aplica os ajustes diferentes de zero, um bulk_write por coleção."""
+  escritas = []
+  for model, contador in ajustes.items():
+    operacoes = [
+      UpdateOne({"_id": id}, {"$inc": {"ordens_count": delta}})
+      for id, delta in contador.items() if delta
+    ]
+    if operacoes:
+      escritas.append(model.get_motor_collection().bulk_write(operacoes, ordered=False))
+  await asyncio.gather(*escritas)
+
+async def incrementar(model: Type, id: ObjectId, delta: int = 1):
+  await model.get_motor_collection().update_one({"_id": id}, {"$inc": {"ordens_count": delta}})
+
+def referencias_da_ordem(ordem: dict, sinal: int = 1) -> Dict[Type, Counter]:
+  """Ajustes para todas as referências de uma ordem (documento bruto com cliente, mecanico, servicos e pecas.peca_id)."""
+  ajustes = deltas()
+  ajustes[Cliente][ordem["cliente"].id] += sinal
+  ajustes[Mecanico][ordem["mecanico"].id] += sinal
+  for ref in ordem.get("servicos") or []:
+    ajustes[Servico][ref.id] += sinal
+  for item in ordem.get("pecas") or []:
+    ajustes[Peca][item["peca_id"]] += sinal
+  return ajustes
+
+def filtro_referencias(model: Type, id: ObjectId) -> dict:
+  """Filtro das ordens que referenciam o documento (o mesmo campo agrupado em contagem_pipelines)."""
+  return {
+    Cliente: {"cliente.$id": id},
+    Mecanico: {"mecanico.$id": id},
+    Servico: {"servicos.$id": id},
+    Peca: {"pecas.peca_id": id},
+  }[model]
+
+async def _contar_sem_contador(model: Type, id: ObjectId):
+  """Grava o contador de um documento que ainda não tem o campo, contando as ordens que o referenciam."""
+  total = await OrdemServico.get_motor_collection().count_documents(filtro_referencias(model, id))
+  # Só grava se o campo continua ausente: um $inc concorrente já criou o campo com a contagem nova
+  await model.get_motor_collection().update_one(
+    {"_id": id, "ordens_count": {"$exists": False}},
+    {"$set": {"ordens_count": total}}
+  )
+
+async def excluir_sem_referencias(model: Type, id: str) -> Optional[bool]:
+  """
+  Exclui o documento só se nenhuma ordem o referencia, no mesmo delete_one.
+  Devolve False se ele existe mas está em uso; None se não existe.
+  """
+  if not ObjectId.is_valid(id):
+    return None
+
+  colecao = model.get_motor_collection()
+  filtro = {"_id": ObjectId(id), "ordens_count": SEM_REFERENCIAS}
+  result = await colecao.delete_one(filtro)
+  if result.deleted_count:
+    return True
+
+  # Não excluiu: consulta para escolher entre 404 e 400 (ou contar, se o documento não tem o contador)
+  documento = await colecao.find_one({"_id": ObjectId(id)}, projection={"ordens_count": 1})
+  if documento is None:
+    return None
+  if "ordens_count" not in documento:
+    await _contar_sem_contador(model, ObjectId(id))
+    result = await colecao.delete_one(filtro)
+    return bool(result.deleted_count)
+  return False
+
+def contagem_pipelines() -> Dict[Type, list]:
+  """Pipelines sobre as ordens que contam as referências de cada coleção do catálogo."""
+  return {
+    Cliente: [{"$group": {"_id": "$cliente.$id", "total": {"$sum": 1}}}],
+    Mecanico: [{"$group": {"_id": "$mecanico.$id", "total": {"$sum": 1}}}],
+    Servico: [
+      {"$unwind": "$servicos"},
+      {"$group": {"_id": "$servicos.$id", "total": {"$sum": 1}}}
+    ],
+    Peca: [
+      {"$unwind": "$pecas"},
+      {"$group": {"_id": "$pecas.peca_id", "total": {"$sum": 1}}}
+    ],
+  }
+
+async def recontar(corrigir: bool = False) -> Dict[str, list]:
+  """Recalcula os contadores a partir das ordens; com corrigir=True grava os valores divergentes."""
+  divergencias = {}
+  for model, pipeline in contagem_pipelines().items():
+    contagem = {
+      grupo["_id"]: grupo["total"]
+      async for grupo in OrdemServico.get_motor_collection().aggregate(pipeline)
+    }
+
+    colecao = model.get_motor_collection()
+    divergentes = []
+    async for documento in colecao.find({}, projection={"ordens_count": 1}):
+      # Sem o campo (None) também é divergente: o --corrigir grava o contador
+      atual = documento.get("ordens_count")
+      calculado = contagem.get(documento["_id"], 0)
+      if atual != calculado:
+        divergentes.append((documento["_id"], atual, calculado))
+
+    if corrigir and divergentes:
+      await colecao.bulk_write([
+        UpdateOne({"_id": id}, {"$set": {"ordens_count": calculado}})
+        for id, _, calculado in divergentes
+      ], ordered=False)
+
+    divergencias[model.__name__] = divergentes
+  return divergencias
@@ -1,7 +1,11 @@
+from typing import List, Optional
+
 from exceptions.exceptions import BadRequestException, NotFoundException
-from models.models import Servico, OrdemServico
+from models.models import Servico
 from schemas.servico_schema import ServicoCreate, ServicoPaginatedResponse, ServicoUpdate
-from schemas.util_schema import Pagination
+from repositories import catalogo_cache, referencias
+from repositories.bulk import bulk_upsert
+from repositories.pagination import paginate_by_id
 
 class ServicoRepository:
   
@@ -13,21 +17,20 @@ class ServicoRepository:
     await servico.insert()
     return servico.to_dict()
   
-  async def list_servicos(self, page: int = 1, size: int = 10):
-    total = await Servico.find_all().count()
-    servicos = await Servico.find_all().skip((page - 1) * size).limit(size).to_list()
+  async def bulk_servicos(self, itens: List[dict]):
+    # Como no create, serviços novos entram ativos; o upsert de um existente não muda "ativo"
+    return await bulk_upsert(Servico, ServicoCreate, itens, padroes={"ativo": True})
+  
+  async def list_servicos(self, page: int = 1, size: int = 10, cursor: Optional[str] = None, include_total: bool = True):
+    servicos, pagination = await paginate_by_id(Servico, page, size, cursor, include_total)
     
     return ServicoPaginatedResponse(
       servicos=[servico.to_dict() for servico in servicos],
-      pagination=Pagination(
-        page=page,
-        size=size,
-        total=total
-      )
+      pagination=pagination
     )
     
   async def get(self, id: str):
-    servico = await Servico.get(id)
+    servico = await catalogo_cache.obter(Servico, id)
     if not servico:
       raise NotFoundException(f"Serviço com id {id} não encontrado.")
         
@@ -39,19 +42,19 @@ class ServicoRepository:
     if servico:
       update_data = data.model_dump(exclude_unset=True)
       await servico.set(update_data)
+      catalogo_cache.invalidar(Servico, servico.id)
     else:
       raise NotFoundException(f"Serviço com id {id} não encontrado.")
     
     return servico.to_dict()
 
   async def delete(self, id: str):
-    servico = await Servico.get(id)
-    if not servico:
+    # O contador de ordens é conferido no próprio delete_one
+    excluido = await referencias.excluir_sem_referencias(Servico, id)
+    if excluido is None:
       raise NotFoundException(f"Serviço com id {id} não encontrado.")
-      
-    servico_is_related = await OrdemServico.find_one({"servicos": servico.id})
-    if servico_is_related:
-      raise BadRequestException(f"Serviço com id {id} está relacionado a uma ordem de serviço.")  
+    if not excluido:
+      raise BadRequestException(f"Serviço com id {id} está relacionado a uma ordem de serviço.")
     
-    await servico.delete()
+    catalogo_cache.invalidar(Servico, id)
     return {"message": "Serviço excluído com sucesso"}
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel
 from schemas.cliente_schema import ClienteResponse
 from schemas.mecanico_schema import MecanicoResponse
@@ -9,6 +9,16 @@ class OrdemServicoPecaCreate(BaseModel):
   quantidade: int
   peca_id: str
   
+class OrdemServicoItemOperacao(BaseModel):
+  acao: Literal["adicionar", "remover"]
+  tipo: Literal["peca", "servico"]
+  id: str
+  # Usada só ao adicionar peças
+  quantidade: int = 1
+
+class OrdemServicoItensBatch(BaseModel):
+  operacoes: List[OrdemServicoItemOperacao]
+  
 class OrdemServicoCreate(BaseModel):
   cliente_id: str
   mecanico_id: str
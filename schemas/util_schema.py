@@ -1,6 +1,23 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 class Pagination(BaseModel):
-  page: int
+  page: Optional[int] = None
   size: int
+  # Sem total quando a listagem é pedida com include_total=false
+  total: Optional[int] = None
+  # Falso para totais estimados ou vindos do cache de contagens
+  total_exato: bool = True
+  next_cursor: Optional[str] = None
+
+class BulkItemResult(BaseModel):
+  indice: int
+  id: Optional[str] = None
+  status: str
+  erro: Optional[str] = None
+
+class BulkResponse(BaseModel):
   total: int
+  sucesso: int
+  erros: int
+  resultados: List[BulkItemResult]
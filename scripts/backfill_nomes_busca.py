@@ -0,0 +1,35 @@
+"""
+Preenche cliente_nome_busca e mecanico_nome_busca nas ordens de serviço existentes.
+
+Uso (na raiz do projeto):
+  python -m scripts.backfill_nomes_busca
+"""
+import asyncio
+
+from pymongo import UpdateMany
+
+from db import db
+from models.models import Cliente, Mecanico, OrdemServico
+from utils.text import nome_completo_busca
+
+async def backfill(model, campo: str):
+  operacoes = []
+  async for pessoa in model.find_all():
+    operacoes.append(UpdateMany(
+      {f"{campo}.$id": pessoa.id},
+      {"$set": {f"{campo}_nome_busca": nome_completo_busca(pessoa.nome, pessoa.sobrenome)}}
+    ))
+
+  if not operacoes:
+    return 0
+
+  result = await OrdemServico.get_motor_collection().bulk_write(operacoes, ordered=False)
+  return result.modified_count
+
+async def main():
+  await db.init_db()
+  print(f"Ordens atualizadas (cliente): {await backfill(Cliente, 'cliente')}")
+  print(f"Ordens atualizadas (mecanico): {await backfill(Mecanico, 'mecanico')}")
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Executa explain() nas consultas dos repositórios e aponta as que ainda fazem COLLSCAN.
+
+Uso (na raiz do projeto):
+  python -m scripts.explain_queries
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from db import db
+from models.models import Cliente, Mecanico, MecanicoEstatisticaDiaria, OrdemServico, Peca, Servico
+from repositories.mecanico_stats import report_pipeline
+from repositories.referencias import filtro_referencias
+from repositories.ordem_servico_repository import OrdemServicoRepository
+from utils.cursor import encode_cursor
+
+def consultas():
+  """Formatos das consultas feitas pelos repositórios, preenchidos com valores de exemplo."""
+  id_exemplo = ObjectId()
+  fim = datetime.now(timezone.utc)
+  inicio = fim - timedelta(days=30)
+  cursor = encode_cursor(inicio, id_exemplo)
+  ordem_servico_repo = OrdemServicoRepository()
+  filtro = ordem_servico_repo.list_match
+
+  catalogo = []
+  for model in [Cliente, Mecanico, Peca, Servico]:
+    nome = model.get_settings().name
+    catalogo += [
+      (f"{nome}: listagem paginada", model, "find", {}, [("_id", 1)]),
+      (f"{nome}: listagem por cursor", model, "find", {"_id": {"$gt": id_exemplo}}, [("_id", 1)]),
+      (f"{nome}: busca por id", model, "find", {"_id": id_exemplo}, None),
+    ]
+
+  return catalogo + [
+    ("OrdemServicoRepository.list: sem filtros", OrdemServico, "aggregate", ordem_servico_repo.list_pipeline(filtro()), None),
+    ("OrdemServicoRepository.list: cursor", OrdemServico, "aggregate", ordem_servico_repo.list_pipeline(filtro(), cursor=cursor), None),
+    ("OrdemServicoRepository.list: por mecânico", OrdemServico, "aggregate", ordem_servico_repo.list_pipeline(filtro(mecanico_id=str(id_exemplo))), None),
+    ("OrdemServicoRepository.list: por cliente", OrdemServico, "aggregate", ordem_servico_repo.list_pipeline(filtro(cliente_id=str(id_exemplo))), None),
+    ("OrdemServicoRepository.list: por período", OrdemServico, "aggregate", ordem_servico_repo.list_pipeline(filtro(data_abertura_inicio=inicio, data_abertura_fim=fim)), None),
+    ("OrdemServicoRepository.list: por nome do cliente", OrdemServico, "aggregate", ordem_servico_repo.list_pipeline(filtro(nome_cliente="ana")), None),
+    ("OrdemServicoRepository.list: por nome do mecânico", OrdemServico, "aggregate", ordem_servico_repo.list_pipeline(filtro(nome_mecanico="ana")), None),
+    ("MecanicoRepository.report", MecanicoEstatisticaDiaria, "aggregate", report_pipeline(inicio, fim), None),
+  ] + [
+    (f"referencias: ordens com o {model.__name__.lower()}", OrdemServico, "find", filtro_referencias(model, id_exemplo), None)
+    for model in [Cliente, Mecanico, Peca, Servico]
+  ]
+
+def find_stages(plano, stage: str) -> bool:
+  """Procura um estágio no plano vencedor, ignorando os planos rejeitados."""
+  if isinstance(plano, dict):
+    if plano.get("stage") == stage:
+      return True
+    return any(find_stages(valor, stage) for chave, valor in plano.items() if chave != "rejectedPlans")
+  if isinstance(plano, list):
+    return any(find_stages(item, stage) for item in plano)
+  return False
+
+async def explain(model, tipo: str, consulta, sort):
+  collection = model.get_motor_collection()
+  if tipo == "find":
+    cursor = collection.find(consulta)
+    if sort:
+      cursor = cursor.sort(sort)
+    return await cursor.limit(1).explain()
+
+  return await db.db.command({
+    "explain": {"aggregate": collection.name, "pipeline": consulta, "cursor": {}},
+    "verbosity": "queryPlanner"
+  })
+
+async def main():
+  await db.init_db()
+
+  com_collscan = []
+  for descricao, model, tipo, consulta, sort in consultas():
+    plano = await explain(model, tipo, consulta, sort)
+    collscan = find_stages(plano, "COLLSCAN")
+    print(f"{'COLLSCAN' if collscan else 'ok':<9} {descricao}")
+    if collscan:
+      com_collscan.append(descricao)
+
+  print(f"\n{len(com_collscan)} consulta(s) com COLLSCAN.")
+  return 1 if com_collscan else 0
+
+if __name__ == "__main__":
+  sys.exit(asyncio.run(main()))
@@ -0,0 +1,90 @@
+"""
+Converte as peças das ordens de serviço da coleção pecas_ordens_servicos para itens embutidos na ordem.
+
+Cada referência (DBRef) em "pecas" vira um item com peca_id, nome, marca, modelo, valor e quantidade.
+A conversão roda no servidor, com $merge de volta em ordens_servico, e pode ser executada mais de uma vez.
+
+Uso (na raiz do projeto):
+  python -m scripts.migrate_pecas_embutidas [--remover-colecao]
+"""
+import argparse
+import asyncio
+
+from db import db
+from models.models import OrdemServico
+
+COLECAO_ANTIGA = "pecas_ordens_servicos"
+
+def migracao_pipeline():
+  return [
+    # Só as ordens que ainda guardam referências para pecas_ordens_servicos
+    {"$match": {"pecas.$id": {"$exists": True}}},
+    {"$lookup": {
+      "from": COLECAO_ANTIGA,
+      "localField": "pecas.$id",
+      "foreignField": "_id",
+      "as": "itens_info"
+    }},
+    {"$lookup": {
+      "from": "pecas",
+      "localField": "itens_info.peca.$id",
+      "foreignField": "_id",
+      "as": "pecas_info"
+    }},
+    {"$project": {
+      "pecas": {"$map": {
+        "input": "$itens_info",
+        "as": "item",
+        "in": {"$let": {
+          "vars": {"peca": {"$first": {"$filter": {
+            "input": "$pecas_info",
+            "as": "peca",
+            "cond": {"$eq": ["$$peca._id", "$$item.peca.$id"]}
+          }}}},
+          "in": {
+            "peca_id": "$$peca._id",
+            "nome": "$$peca.nome",
+            "marca": "$$peca.marca",
+            "modelo": "$$peca.modelo",
+            "valor": "$$peca.valor",
+            "quantidade": "$$item.quantidade"
+          }
+        }}
+      }}
+    }},
+    # Descarta itens cuja peça já foi excluída do catálogo
+    {"$set": {"pecas": {"$filter": {
+      "input": "$pecas",
+      "as": "item",
+      "cond": {"$ne": [{"$ifNull": ["$$item.peca_id", None]}, None]}
+    }}}},
+    {"$merge": {
+      "into": OrdemServico.Settings.name,
+      "on": "_id",
+      "whenMatched": "merge",
+      "whenNotMatched": "discard"
+    }}
+  ]
+
+async def main(remover_colecao: bool):
+  await db.init_db()
+  collection = OrdemServico.get_motor_collection()
+
+  pendentes = await collection.count_documents({"pecas.$id": {"$exists": True}})
+  print(f"Ordens a converter: {pendentes}")
+
+  if pendentes:
+    await collection.aggregate(migracao_pipeline()).to_list(None)
+
+  restantes = await collection.count_documents({"pecas.$id": {"$exists": True}})
+  print(f"Ordens ainda com referências: {restantes}")
+
+  if remover_colecao and not restantes:
+    await db.db.drop_collection(COLECAO_ANTIGA)
+    print(f"Coleção {COLECAO_ANTIGA} removida.")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--remover-colecao", action="store_true", help=f"remove {COLECAO_ANTIGA} após a conversão")
+  args = parser.parse_args()
+  asyncio.run(main(args.remover_colecao))
@@ -0,0 +1,18 @@
+"""
+Reconstrói a coleção mecanico_daily_stats (ordens abertas por mecânico por dia) a partir das ordens de serviço.
+Necessário em bases criadas antes dessa coleção ou para corrigir divergências.
+
+Uso (na raiz do projeto):
+  python -m scripts.rebuild_mecanico_daily_stats
+"""
+import asyncio
+
+from db import db
+from repositories import mecanico_stats
+
+async def main():
+  await db.init_db()
+  print(f"Buckets gravados: {await mecanico_stats.reconstruir()}")
+
+if __name__ == "__main__":
+  asyncio.run(main())
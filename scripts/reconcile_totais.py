@@ -0,0 +1,96 @@
+"""
+Recalcula os subtotais das ordens de serviço a partir dos valores registrados nos itens (serviços e peças) e aponta divergências.
+
+Ordens anteriores a servicos_itens não têm o valor cobrado de cada serviço: nelas só as peças são
+conferidas e o subtotal de serviços gravado é mantido.
+
+Uso (na raiz do projeto):
+  python -m scripts.reconcile_totais             # só relatório
+  python -m scripts.reconcile_totais --corrigir  # grava os valores recalculados
+"""
+import argparse
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from db import db
+from models.models import OrdemServico
+
+TOLERANCIA = 0.005
+
+def subtotais_pipeline():
+  """Calcula os subtotais de cada ordem a partir dos valores registrados nos itens embutidos."""
+  return [
+    {"$project": {
+      "subtotal_servicos": {"$ifNull": ["$subtotal_servicos", 0]},
+      "subtotal_pecas": {"$ifNull": ["$subtotal_pecas", 0]},
+      "subtotal": {"$ifNull": ["$subtotal", 0]},
+      # Os serviços têm o valor registrado na inclusão em servicos_itens, um item por link
+      "calculado_servicos": {"$sum": {"$map": {
+        "input": {"$ifNull": ["$servicos_itens", []]},
+        "in": "$$this.valor"
+      }}},
+      "servicos_registrados": {"$eq": [
+        {"$size": {"$ifNull": ["$servicos", []]}},
+        {"$size": {"$ifNull": ["$servicos_itens", []]}}
+      ]},
+      # As peças ficam embutidas na ordem com o valor registrado na inclusão
+      "calculado_pecas": {"$sum": {"$map": {
+        "input": {"$ifNull": ["$pecas", []]},
+        "as": "item",
+        "in": {"$multiply": ["$$item.valor", "$$item.quantidade"]}
+      }}}
+    }}
+  ]
+
+def divergente(atual: float, calculado: float) -> bool:
+  return abs(atual - calculado) > TOLERANCIA
+
+async def main(corrigir: bool):
+  await db.init_db()
+
+  divergencias = []
+  sem_registro = 0
+  async for ordem in OrdemServico.get_motor_collection().aggregate(subtotais_pipeline()):
+    # Sem o valor registrado de cada serviço não há como recalcular: mantém o subtotal gravado
+    if not ordem["servicos_registrados"]:
+      ordem["calculado_servicos"] = ordem["subtotal_servicos"]
+      sem_registro += 1
+    calculado_total = ordem["calculado_servicos"] + ordem["calculado_pecas"]
+    if (
+      divergente(ordem["subtotal_servicos"], ordem["calculado_servicos"])
+      or divergente(ordem["subtotal_pecas"], ordem["calculado_pecas"])
+      or divergente(ordem["subtotal"], calculado_total)
+    ):
+      divergencias.append(ordem)
+      print(
+        f"{ordem['_id']}: subtotal {ordem['subtotal']:.2f} -> {calculado_total:.2f} "
+        f"(serviços {ordem['subtotal_servicos']:.2f} -> {ordem['calculado_servicos']:.2f}, "
+        f"peças {ordem['subtotal_pecas']:.2f} -> {ordem['calculado_pecas']:.2f})"
+      )
+
+  if sem_registro:
+    print(f"\n{sem_registro} ordem(ns) sem o valor registrado dos serviços: só as peças foram conferidas.")
+  print(f"\n{len(divergencias)} ordem(ns) com divergência.")
+  if not divergencias:
+    return 0
+  if not corrigir:
+    return 1
+
+  await OrdemServico.get_motor_collection().bulk_write([
+    UpdateOne({"_id": ordem["_id"]}, {"$set": {
+      "subtotal_servicos": ordem["calculado_servicos"],
+      "subtotal_pecas": ordem["calculado_pecas"],
+      "subtotal": ordem["calculado_servicos"] + ordem["calculado_pecas"]
+    }})
+    for ordem in divergencias
+  ], ordered=False)
+  print("Subtotais corrigidos.")
+  return 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--corrigir", action="store_true", help="grava os subtotais recalculados")
+  args = parser.parse_args()
+  sys.exit(asyncio.run(main(args.corrigir)))
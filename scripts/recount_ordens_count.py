@@ -0,0 +1,36 @@
+"""
+Recalcula do zero o contador ordens_count de clientes, mecânicos, serviços e peças a partir das ordens de serviço.
+Necessário em bases criadas antes do contador (senão as exclusões não enxergam as referências) ou para corrigir divergências.
+Com --corrigir, rode com pouco tráfego: o valor recalculado sobrescreve ajustes feitos durante a execução.
+
+Uso (na raiz do projeto):
+  python -m scripts.recount_ordens_count             # só relatório
+  python -m scripts.recount_ordens_count --corrigir  # grava os valores recalculados
+"""
+import argparse
+import asyncio
+import sys
+
+from db import db
+from repositories import referencias
+
+async def main(corrigir: bool):
+  await db.init_db()
+
+  divergencias = await referencias.recontar(corrigir)
+  total = 0
+  for colecao, divergentes in divergencias.items():
+    for id, atual, calculado in divergentes:
+      print(f"{colecao} {id}: ordens_count {atual} -> {calculado}")
+    total += len(divergentes)
+
+  print(f"\n{total} documento(s) com divergência.")
+  if total and corrigir:
+    print("Contadores corrigidos.")
+  return 1 if total and not corrigir else 0
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--corrigir", action="store_true", help="grava os contadores recalculados")
+  args = parser.parse_args()
+  sys.exit(asyncio.run(main(args.corrigir)))
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from opentelemetry import trace
+
+# Log de acesso em JSON, uma linha por requisição. O middleware só monta o registro e o coloca
+# na fila; a serialização e a escrita no stdout acontecem na thread do QueueListener.
+# 2xx/3xx são amostrados por ACCESS_LOG_SAMPLE_RATE; erros (4xx/5xx) e requisições lentas sempre entram.
+
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", "1000"))
+ACCESS_LOG_QUEUE_SIZE = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", "10000"))
+
+class _JsonFormatter(logging.Formatter):
+  def format(self, record: logging.LogRecord) -> str:
+    return json.dumps({
+      "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+      "level": record.levelname,
+      "logger": record.name,
+      **record.campos
+    }, ensure_ascii=False)
+
+class _QueueHandlerSemBloqueio(QueueHandler):
+  """Com a fila cheia descarta o registro (e conta) em vez de bloquear ou imprimir erro."""
+
+  def __init__(self, fila: queue.Queue):
+    super().__init__(fila)
+    self.descartados = 0
+
+  def enqueue(self, record: logging.LogRecord):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.descartados += 1
+
+_fila = queue.Queue(ACCESS_LOG_QUEUE_SIZE)
+_handler = _QueueHandlerSemBloqueio(_fila)
+
+_saida = logging.StreamHandler(sys.stdout)
+_saida.setFormatter(_JsonFormatter())
+_listener = QueueListener(_fila, _saida, respect_handler_level=False)
+
+logger = logging.getLogger("oficina.access")
+logger.setLevel(logging.INFO)
+logger.addHandler(_handler)
+# Não repassa para o root: o registro já sai completo no stdout, que o collector lê dos logs do container
+logger.propagate = False
+
+_estatisticas = {"requisicoes": 0, "registrados": 0, "amostrados_fora": 0}
+_iniciado = False
+
+def iniciar():
+  global _iniciado
+  if not _iniciado:
+    _listener.start()
+    _iniciado = True
+
+def parar():
+  """Para a thread de escrita depois de esvaziar a fila."""
+  global _iniciado
+  if _iniciado:
+    _listener.stop()
+    _iniciado = False
+
+def nivel(status_code: int) -> int:
+  if status_code >= 500:
+    return logging.ERROR
+  if status_code >= 400:
+    return logging.WARNING
+  return logging.INFO
+
+def _trace_id() -> Optional[str]:
+  contexto = trace.get_current_span().get_span_context()
+  return format(contexto.trace_id, "032x") if contexto.is_valid else None
+
+def registrar(metodo: str, rota: str, status_code: int, duracao_ms: float):
+  _estatisticas["requisicoes"] += 1
+  lenta = duracao_ms >= ACCESS_LOG_SLOW_MS
+  if status_code < 400 and not lenta and random.random() >= ACCESS_LOG_SAMPLE_RATE:
+    _estatisticas["amostrados_fora"] += 1
+    return
+
+  _estatisticas["registrados"] += 1
+  logger.log(nivel(status_code), "access", extra={"campos": {
+    "method": metodo,
+    "route": rota,
+    "status": status_code,
+    "duration_ms": round(duracao_ms, 2),
+    "slow": lenta,
+    "trace_id": _trace_id(),
+  }})
+
+def estatisticas() -> dict:
+  return {
+    **_estatisticas,
+    "sample_rate": ACCESS_LOG_SAMPLE_RATE,
+    "slow_ms": ACCESS_LOG_SLOW_MS,
+    "fila": _fila.qsize(),
+    "descartados": _handler.descartados,
+  }
@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List
+
+class BatchLoader:
+  """
+  Agrupa as chamadas de load() feitas na mesma volta do event loop em uma única chamada
+  de "carregar" (no estilo DataLoader). Chamadas para uma chave que já está sendo carregada
+  recebem o mesmo resultado, sem nova consulta. Não guarda resultados depois de entregues:
+  o cache fica por conta de quem usa o loader.
+  """
+
+  def __init__(self, carregar: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]], max_batch: int = 500):
+    self.carregar = carregar
+    self.max_batch = max_batch
+    self._pendentes: Dict[Hashable, asyncio.Future] = {}
+    self._em_andamento: Dict[Hashable, asyncio.Future] = {}
+    self._agendado = False
+    self._tarefas = set()
+    self.batches = 0
+    self.chaves = 0
+    self.compartilhadas = 0
+    self.maior_batch = 0
+
+  async def load(self, chave: Hashable) -> Any:
+    """Devolve o valor da chave (ou None se não existir)."""
+    future = self._pendentes.get(chave) or self._em_andamento.get(chave)
+    if future is not None:
+      self.compartilhadas += 1
+      return await asyncio.shield(future)
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    self._pendentes[chave] = future
+    if not self._agendado:
+      # Despacha depois que as demais tarefas prontas desta volta do loop fizeram seus pedidos
+      self._agendado = True
+      loop.call_soon(self._despachar)
+    return await asyncio.shield(future)
+
+  async def load_many(self, chaves: Iterable[Hashable]) -> Dict[Hashable, Any]:
+    chaves = list(dict.fromkeys(chaves))
+    valores = await asyncio.gather(*(self.load(chave) for chave in chaves))
+    return dict(zip(chaves, valores))
+
+  def _despachar(self):
+    self._agendado = False
+    pendentes = list(self._pendentes.items())
+    self._pendentes.clear()
+
+    for inicio in range(0, len(pendentes), self.max_batch):
+      lote = dict(pendentes[inicio:inicio + self.max_batch])
+      self._em_andamento.update(lote)
+      self.batches += 1
+      self.chaves += len(lote)
+      self.maior_batch = max(self.maior_batch, len(lote))
+      tarefa = asyncio.ensure_future(self._executar(lote))
+      self._tarefas.add(tarefa)
+      tarefa.add_done_callback(self._tarefas.discard)
+
+  async def _executar(self, lote: Dict[Hashable, asyncio.Future]):
+    try:
+      valores = await self.carregar(list(lote))
+    except Exception as e:
+      for future in lote.values():
+        if not future.done():
+          future.set_exception(e)
+    else:
+      for chave, future in lote.items():
+        if not future.done():
+          future.set_result(valores.get(chave))
+    finally:
+      for chave, future in lote.items():
+        # Só remove se ainda é deste lote: depois de um esquecer() a chave pode ter uma carga nova
+        if self._em_andamento.get(chave) is future:
+          del self._em_andamento[chave]
+      for future in lote.values():
+        # Evita o aviso de exceção não lida quando todos os chamadores foram cancelados
+        if future.done() and not future.cancelled():
+          future.exception()
+
+  def esquecer(self, chave: Hashable):
+    """
+    Chamadas seguintes para a chave não aproveitam a carga já em andamento (que pode ter lido
+    um valor anterior a uma alteração): fazem uma consulta nova.
+    """
+    self._em_andamento.pop(chave, None)
+
+  def stats(self) -> dict:
+    return {
+      "batches": self.batches,
+      "chaves": self.chaves,
+      "media_batch": round(self.chaves / self.batches, 2) if self.batches else None,
+      "maior_batch": self.maior_batch,
+      "compartilhadas": self.compartilhadas,
+      "em_andamento": len(self._em_andamento),
+    }
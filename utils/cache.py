@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+MISSING = object()
+
+class LRUTTLCache:
+  """
+  Cache em memória com limite de itens (LRU) e tempo de vida por item (TTL).
+  Não é compartilhado entre processos: cada worker tem o seu.
+  """
+
+  def __init__(self, max_items: int, ttl_seconds: float):
+    self.max_items = max_items
+    self.ttl_seconds = ttl_seconds
+    self._itens: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+    self.invalidations = 0
+    # Incrementada a cada invalidação: quem carrega um valor guarda a geração do início da carga
+    # e o set descarta o valor se alguma invalidação aconteceu no meio (ele pode estar velho)
+    self.geracao = 0
+    self.stale_sets = 0
+
+  def get(self, key: Hashable, default: Any = MISSING) -> Any:
+    item = self._itens.get(key)
+    if item is None:
+      self.misses += 1
+      return default
+
+    expira_em, valor = item
+    if expira_em <= time.monotonic():
+      del self._itens[key]
+      self.expirations += 1
+      self.misses += 1
+      return default
+
+    self._itens.move_to_end(key)
+    self.hits += 1
+    return valor
+
+  def set(self, key: Hashable, valor: Any, ttl_seconds: Optional[float] = None, geracao: Optional[int] = None):
+    if geracao is not None and geracao != self.geracao:
+      self.stale_sets += 1
+      return
+
+    ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+    self._itens[key] = (time.monotonic() + ttl, valor)
+    self._itens.move_to_end(key)
+
+    while len(self._itens) > self.max_items:
+      self._itens.popitem(last=False)
+      self.evictions += 1
+
+  def invalidate(self, key: Hashable):
+    # Mesmo sem a chave no cache: uma carga em andamento não pode gravar o valor anterior
+    self.geracao += 1
+    if self._itens.pop(key, None) is not None:
+      self.invalidations += 1
+
+  def clear(self):
+    self.geracao += 1
+    self.invalidations += len(self._itens)
+    self._itens.clear()
+
+  def stats(self) -> dict:
+    consultas = self.hits + self.misses
+    return {
+      "size": len(self._itens),
+      "max_items": self.max_items,
+      "ttl_seconds": self.ttl_seconds,
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_ratio": round(self.hits / consultas, 4) if consultas else None,
+      "evictions": self.evictions,
+      "expirations": self.expirations,
+      "invalidations": self.invalidations,
+      "stale_sets": self.stale_sets,
+    }
@@ -0,0 +1,32 @@
+import base64
+import binascii
+from typing import Tuple, Type, Union
+
+from bson import json_util
+
+from exceptions.exceptions import BadRequestException
+
+def encode_cursor(*valores) -> str:
+  """Gera um cursor opaco a partir dos valores da chave de ordenação do último item."""
+  raw = json_util.dumps(list(valores)).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, *tipos: Union[Type, Tuple[Type, ...]]) -> list:
+  """
+  Recupera os valores da chave de ordenação gravados em um cursor gerado por encode_cursor.
+  Cada valor precisa ser do tipo esperado para a sua posição: o cursor vem do cliente e os valores
+  entram direto no filtro, então um dict ({"$gt": ""}) viraria operador de consulta.
+  """
+  try:
+    padding = "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(cursor + padding)
+    valores = json_util.loads(raw)
+  except (binascii.Error, ValueError, UnicodeDecodeError):
+    raise BadRequestException("Cursor inválido.")
+
+  if not isinstance(valores, list) or len(valores) != len(tipos):
+    raise BadRequestException("Cursor inválido.")
+  if any(not isinstance(valor, tipo) for valor, tipo in zip(valores, tipos)):
+    raise BadRequestException("Cursor inválido.")
+
+  return valores
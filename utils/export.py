@@ -0,0 +1,43 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List
+
+def _valor_json(valor):
+  if isinstance(valor, datetime):
+    return valor.isoformat()
+  return str(valor)
+
+async def ndjson(linhas: AsyncIterator[dict], linhas_por_bloco: int = 500) -> AsyncIterator[str]:
+  """Converte as linhas em NDJSON, juntando várias linhas por bloco enviado."""
+  bloco = []
+  async for linha in linhas:
+    bloco.append(json.dumps(linha, default=_valor_json, ensure_ascii=False))
+    if len(bloco) >= linhas_por_bloco:
+      yield "\n".join(bloco) + "\n"
+      bloco = []
+  if bloco:
+    yield "\n".join(bloco) + "\n"
+
+async def csv_(linhas: AsyncIterator[dict], campos: List[str], linhas_por_bloco: int = 500) -> AsyncIterator[str]:
+  """Converte as linhas em CSV (com cabeçalho), juntando várias linhas por bloco enviado."""
+  buffer = io.StringIO()
+  writer = csv.DictWriter(buffer, fieldnames=campos, extrasaction="ignore")
+  writer.writeheader()
+
+  quantidade = 0
+  async for linha in linhas:
+    writer.writerow({
+      campo: valor.isoformat() if isinstance(valor, datetime) else valor
+      for campo, valor in linha.items()
+    })
+    quantidade += 1
+    if quantidade >= linhas_por_bloco:
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate(0)
+      quantidade = 0
+
+  if buffer.tell():
+    yield buffer.getvalue()
@@ -0,0 +1,23 @@
+import os
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel
+
+# Modo opcional de respostas rápidas (requer orjson): FAST_RESPONSES=true
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+def default_response_class():
+  return ORJSONResponse if FAST_RESPONSES else JSONResponse
+
+def resposta(conteudo):
+  """
+  No modo rápido devolve a resposta já serializada: os schemas de resposta, que já foram validados
+  ao serem montados no repositório, são convertidos direto para JSON pelo pydantic-core e os dicts
+  vão para o orjson, sem a nova validação e o jsonable_encoder do response_model.
+  Fora desse modo devolve o conteúdo como está e o FastAPI segue o caminho padrão.
+  """
+  if not FAST_RESPONSES:
+    return conteudo
+  if isinstance(conteudo, BaseModel):
+    return Response(conteudo.model_dump_json(), media_type="application/json")
+  return ORJSONResponse(conteudo)
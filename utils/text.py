@@ -0,0 +1,14 @@
+import re
+import unicodedata
+
+def normalize_nome(texto: str) -> str:
+  """Normaliza um nome para busca: sem acentos, minúsculo e com espaços simples."""
+  sem_acento = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+  return " ".join(sem_acento.lower().split())
+
+def nome_completo_busca(nome: str, sobrenome: str) -> str:
+  return normalize_nome(f"{nome} {sobrenome}")
+
+def prefix_regex(texto: str) -> dict:
+  """Filtro por prefixo ancorado e sensível a maiúsculas, que o MongoDB resolve com faixa do índice."""
+  return {"$regex": f"^{re.escape(normalize_nome(texto))}"}